@@ -0,0 +1,136 @@
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+STAGES = ["concat", "append", "newest"]
+
+def run_stage(stage: str, settings: str, sensors: str, files: list[str], library: str, out: str) -> dict:
+    """ Run one pipeline stage in a fresh process, so the peak memory belongs to this stage alone. """
+    from tools.get_config import AppConfig
+    from tools.processing import DataHandler
+    from tools.memory import peak_memory_mb
+    from tools.events import StageEvent
+    config = AppConfig(settings, sensors)
+    log = queue.Queue()
+    handler = DataHandler(log, config)
+    stime = time.perf_counter()
+    if stage == "concat":
+        handler.concat_sensor_files(files, os.path.join(out, "concat.csv"), sort=True, drop_duplicates=True)
+    elif stage == "append":
+        handler.append_sensor_files(files, os.path.join(out, "append.csv"), library, sort=True, drop_duplicates=True)
+    elif stage == "newest":
+        handler.get_newest_sensor_entries(library)
+    seconds = time.perf_counter() - stime
+    # Duration of the single steps from the stage events of DataHandler
+    steps = []
+    while not log.empty():
+        event = log.get()
+        if isinstance(event, StageEvent) and event.kind == "end":
+            steps.append({"step": event.stage, "seconds": event.duration, "rows": event.rows, "peak_rss_mb": event.memory_mb})
+    return {"seconds": seconds, "peak_rss_mb": peak_memory_mb(), "steps": steps}
+
+def git_version() -> str | None:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Generate synthetic sensor data and benchmark the processing pipeline.")
+    parser.add_argument("--settings", default="settings.toml", help="settings file (default: settings.toml)")
+    parser.add_argument("--sensors-file", default="sensors.toml", help="sensors file (default: sensors.toml)")
+    parser.add_argument("--sensors", type=int, default=4, help="number of sensors, taken from the sensors file")
+    parser.add_argument("--years", type=float, default=0.5, help="years of data in the new sensor files")
+    parser.add_argument("--library-years", type=float, default=2, help="years of data in the existing library")
+    parser.add_argument("--interval", type=int, default=10, help="sampling interval in minutes")
+    parser.add_argument("--days-per-file", type=int, default=30, help="days covered by one sensor file")
+    parser.add_argument("--duplicates", type=float, default=0.01, help="ratio of duplicated rows")
+    parser.add_argument("--shuffle", type=float, default=0.01, help="ratio of rows out of order")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=1, help="runs of every stage")
+    parser.add_argument("--data", help="folder for the generated data, kept after the run (default: temporary folder)")
+    parser.add_argument("--generate-only", action="store_true", help="only write the data to --data")
+    parser.add_argument("-o", "--output", help="result file (default: benchmarks/<date>_<version>.json)")
+    return parser
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    from tools.get_config import AppConfig
+    from tools.synthetic import generate_sensor_files, generate_library
+    from tools.xlsx import resolve_engine
+    config = AppConfig(args.settings, args.sensors_file)
+
+    tmp = None
+    if args.data is None:
+        if args.generate_only:
+            print("--generate-only requires --data")
+            return 2
+        tmp = tempfile.TemporaryDirectory()
+    data = args.data or tmp.name
+    os.makedirs(data, exist_ok=True)
+    from tools.library import library_extension
+    library = os.path.join(data, "all_data" + library_extension(config.library_format))
+
+    print(f"Generating data in {data}...")
+    # The library ends where the new files start, duplicates and shuffled rows are spread over both
+    library_start = datetime.date(2024, 1, 1) - datetime.timedelta(days=round(365.25 * args.library_years))
+    library_rows = generate_library(library, config, args.sensors, str(library_start), args.library_years, args.interval,
+                                    args.duplicates, args.shuffle, args.seed)
+    files, file_rows = generate_sensor_files(os.path.join(data, "new"), config, args.sensors, "2024-01-01", args.years,
+                                             args.interval, args.days_per_file, args.duplicates, args.shuffle, args.seed + 1)
+    print(f"{len(files)} sensor files with {file_rows} rows, library with {library_rows} rows")
+    if args.generate_only:
+        return 0
+
+    rows = {"concat": file_rows, "append": file_rows + library_rows, "newest": library_rows}
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for stage in args.stages:
+        for run in range(args.repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                res = pool.submit(run_stage, stage, args.settings, args.sensors_file, files, library, data).result()
+            res = {"stage": stage, "run": run + 1, "rows": rows[stage], **res, "rows_per_s": rows[stage] / res["seconds"]}
+            print(f"{stage:>8}: {res['seconds']:.2f}s, {res['rows_per_s']:.0f} rows/s, peak {res['peak_rss_mb'] or 0:.0f} MB")
+            results.append(res)
+
+    version = git_version()
+    report = {
+        "version": version,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "data", "generate_only")},
+        "settings": {
+            "workers": config.workers,
+            "xlsx_engine": resolve_engine(config.xlsx_engine),
+            "library_format": config.library_format,
+            "incremental": config.incremental,
+            "cache_enabled": config.cache_enabled,
+            "duplicate_key": config.duplicate_key,
+            "sort_ascending": config.sort_ascending_active
+        },
+        "data": {"sensor_files": len(files), "file_rows": file_rows, "library_rows": library_rows},
+        "stages": results
+    }
+    output = args.output or os.path.join("benchmarks", f"{datetime.date.today()}_{version or 'unknown'}.json")
+    if os.path.dirname(output): os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results saved to {output}")
+    if tmp is not None: tmp.cleanup()
+    return 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
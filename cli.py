@@ -0,0 +1,167 @@
+import argparse
+import datetime
+import multiprocessing
+import os
+import glob
+import sys
+import time
+from tools.get_config import AppConfig
+from tools.events import StageEvent
+
+class ConsoleLog:
+    """ Prints the messages a DataHandler puts into its log queue, used instead of the queue of the GUI. """
+    def put(self, message):
+        if isinstance(message, StageEvent):
+            if message.kind != "end": return
+            rows = f", {message.rows} {_("Zeilen")}" if message.rows is not None else ""
+            message = f"{message.label}: {message.duration:.2f}s{rows}"
+        elif message in ("COMPLETED", "CONCAT_COMPLETED"):
+            message = _("Prozess erfolgreich beendet.")
+        elif message == "ERROR":
+            message = _("Während dem Prozess ist ein Fehler aufgetreten.")
+        print(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {message}", flush=True)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Merge sensor files into a data library without the GUI.")
+    parser.add_argument("--settings", default="settings.toml", help="settings file (default: settings.toml)")
+    parser.add_argument("--sensors", default="sensors.toml", help="sensors file (default: sensors.toml)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # Options of the checkboxes in the GUI, with the same defaults
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument("--sort", action="store_true", help="sort the data")
+    options.add_argument("--keep-duplicates", action="store_true", help="do not remove duplicate data")
+    options.add_argument("--no-round", action="store_true", help="do not round the sensor values")
+    options.add_argument("--reingest", action="store_true", help="also merge files that are in the ledger of the library already")
+    options.add_argument("--delta", action="store_true", help="also write the added rows to a delta file next to the library ([deltas] write)")
+
+    merge = commands.add_parser("merge", parents=[options], help="append sensor files or folders to a library once")
+    merge.add_argument("files", nargs="*", help="sensor files, folders are searched for the sensor file pattern")
+    merge.add_argument("-l", "--library", help="existing library (optional)")
+    merge.add_argument("-o", "--output", help="save path, defaults to the library")
+
+    watch = commands.add_parser("watch", parents=[options], help="watch a folder and append arriving sensor files")
+    watch.add_argument("folder", help="folder searched for the sensor file pattern")
+    watch.add_argument("-l", "--library", required=True, help="library the files are appended to, created if missing")
+    watch.add_argument("--interval", type=float, help="seconds between two scans of the folder ([watch] poll_interval)")
+    watch.add_argument("--settle", type=float, help="seconds without new files before a batch is merged ([watch] settle_seconds)")
+    watch.add_argument("--include-existing", action="store_true", help="also merge the files already in the folder")
+
+    latest = commands.add_parser("latest", help="print the newest entry of every sensor in a library")
+    latest.add_argument("library", help="library file")
+
+    export = commands.add_parser("export", help="materialize a library, e.g. a partitioned one, as a single csv file")
+    export.add_argument("library", help="library file")
+    export.add_argument("output", help="csv file, .csv.gz and .csv.zst are compressed")
+
+    query = commands.add_parser("query", help="write the rows of some sensors, locations and a time range of a library to a csv file")
+    query.add_argument("library", help="library file")
+    query.add_argument("output", help="csv file, .csv.gz and .csv.zst are compressed")
+    query.add_argument("-s", "--sensor", action="append", help="sensor, can be given several times (default: all)")
+    query.add_argument("--location", action="append", help="location, can be given several times (default: all)")
+    query.add_argument("--start", help="first timestamp, e.g. 2024-03-01 (default: oldest entry)")
+    query.add_argument("--end", help="timestamp after the last one, e.g. 2024-04-01 (default: newest entry)")
+    return parser
+
+def find_sensor_files(paths: list[str], config: AppConfig) -> list[str]:
+    """ Expand folders to the sensor files they contain. """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, config.file_search_pattern))))
+        else:
+            files.append(path)
+    return files
+
+def append(handler, files: list[str] | None, library: str | None, save_path: str, args) -> bool:
+    """ Append files to the library like the apply button of the GUI, errors are logged. """
+    old_file = library if library is not None and os.path.isfile(library) else None
+    try:
+        handler.append_sensor_files(files, save_path, old_file, args.sort, not args.keep_duplicates, not args.no_round, args.reingest,
+                                    True if args.delta else None)
+        return True
+    except Exception as e:
+        handler.log(f"{_("Es ist ein Fehler aufgetreten:")} {e}")
+        handler.log("ERROR")
+        return False
+
+def run_merge(handler, config: AppConfig, args) -> int:
+    files = find_sensor_files(args.files, config) or None
+    save_path = args.output or args.library
+    if save_path is None:
+        handler.log(_("Bitte geben Sie eine Bibliothek oder einen Speicherort an."))
+        return 2
+    if files is None and (args.library is None or not os.path.isfile(args.library)):
+        handler.log(_("Keine Dateien ausgewählt. Bitte wählen Sie Dateien zum Bearbeiten aus."))
+        return 2
+    return 0 if append(handler, files, args.library, save_path, args) else 1
+
+def run_watch(handler, config: AppConfig, args) -> int:
+    from tools.watch import FolderWatcher
+    interval = args.interval if args.interval is not None else config.watch_interval
+    settle = args.settle if args.settle is not None else config.watch_settle_seconds
+    watcher = FolderWatcher(args.folder, config.file_search_pattern, settle, args.include_existing)
+    handler.log(f"{_("Überwache")} {os.path.join(args.folder, config.file_search_pattern)} ({_("Strg+C zum Beenden")})")
+    try:
+        while True:
+            batch = watcher.poll()
+            if batch:
+                handler.log(f"{len(batch)} {_("neue Datei(en) gefunden")}")
+                if append(handler, batch, args.library, args.library, args):
+                    watcher.done(batch)
+                else:
+                    handler.log(_("Die Dateien werden beim nächsten Durchlauf erneut zusammengeführt."))
+                    watcher.requeue(batch)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        handler.log(_("Überwachung beendet."))
+    return 0
+
+def run_latest(handler, args) -> int:
+    try:
+        for r in handler.get_newest_sensor_entries(args.library):
+            handler.log(f"Sensor: {r["name"]}, {_("letzter Eintrag:")} {r["latest"]}")
+    except Exception as e:
+        handler.log(f"{_("Es ist ein Fehler aufgetreten:")} {e}")
+        return 1
+    return 0
+
+def run_export(handler, args) -> int:
+    try:
+        handler.export_csv(args.library, args.output)
+    except Exception as e:
+        handler.log(f"{_("Es ist ein Fehler aufgetreten:")} {e}")
+        return 1
+    return 0
+
+def run_query(handler, config: AppConfig, args) -> int:
+    from tools.library import CsvStreamWriter
+    from tools.schema import LIBRARY_COLUMNS
+    try:
+        with CsvStreamWriter(args.output, LIBRARY_COLUMNS, config.write_chunk_rows, date_format=config.time_format) as writer:
+            for chunk in handler.iter_query(args.library, args.sensor, args.location, args.start, args.end):
+                writer.write_frame(chunk)
+        handler.log(f"{writer.rows_written} {_("Einträge gefunden")}")
+    except Exception as e:
+        handler.log(f"{_("Es ist ein Fehler aufgetreten:")} {e}")
+        return 1
+    return 0
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    config = AppConfig(args.settings, args.sensors)
+    from tools.processing import DataHandler
+    handler = DataHandler(ConsoleLog(), config)
+    if args.command == "merge":
+        return run_merge(handler, config, args)
+    if args.command == "watch":
+        return run_watch(handler, config, args)
+    if args.command == "export":
+        return run_export(handler, args)
+    if args.command == "query":
+        return run_query(handler, config, args)
+    return run_latest(handler, args)
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
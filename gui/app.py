@@ -1,14 +1,22 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import datetime
-import threading
 import queue
 import os
-from tools.processing import DataHandler
+import threading
+import time
+from tools.events import StageEvent
+from tools.jobs import JobController, JobCancelled
 import gettext
 
+# Lines kept in the info log, older lines are removed
+LOG_MAX_LINES = 5000
+# Messages taken from the process queue per update of the window, the rest follows in the next update
+QUEUE_BATCH = 1000
+
 class MainApp(tk.Tk):
-    def __init__(self, config):
+    def __init__(self, config, started: float | None = None):
+        """ started is the time.perf_counter() value at the start of the application, the time to the window is logged. """
         super().__init__()
 
         self.conf = config
@@ -27,6 +35,8 @@ class MainApp(tk.Tk):
                 print(_("icon.png konnte nicht gefunden werden, fahre ohne icon fort"))
 
         self.selected_files = []
+        self.selected_set = set() # Same paths as selected_files for checking duplicates
+        self.reingest_files = set() # Files merged into the library already, added again on purpose
         
         # Main window grid configuration
         self.grid_rowconfigure(0, weight=1)  # Top frame (options)
@@ -105,49 +115,125 @@ class MainApp(tk.Tk):
         scrollbar.grid(row=0, column=1, sticky="ns")
         self.info_text['yscrollcommand'] = scrollbar.set
 
-        # Apply button
+        # Progress of the current stage and apply button
         button_frame = ttk.Frame(main_frame, padding="10")
-        button_frame.grid(row=2, column=0, sticky="se")
-
+        button_frame.grid(row=2, column=0, sticky="ew")
+        button_frame.grid_columnconfigure(1, weight=1)
+
+        self.stage_var = tk.StringVar()
+        ttk.Label(button_frame, textvariable=self.stage_var, width=28).grid(row=0, column=0, sticky="w", padx=5)
+        self.progress_bar = ttk.Progressbar(button_frame, mode="determinate", maximum=1.0)
+        self.progress_bar.grid(row=0, column=1, sticky="ew", padx=5)
+
+        self.cancel_button = ttk.Button(button_frame, text=_("Abbrechen"), command=self.on_cancel_button_click, state="disabled")
+        self.cancel_button.grid(row=0, column=2, sticky="e", padx=5)
+        self.export_button = ttk.Button(button_frame, text=_("Als CSV exportieren"), command=self.on_export_button_click)
+        self.export_button.grid(row=0, column=3, sticky="e", padx=5)
         self.apply_button = ttk.Button(button_frame, text=_("Anwenden"), command=self.on_apply_button_click)
-        self.apply_button.pack()
+        self.apply_button.grid(row=0, column=4, sticky="e", padx=5)
 
-        # Set up process queue
+        # Set up process queue, the data processor is loaded in the background while the window is shown
         self.process_queue = queue.Queue()
-        self.data_processor = DataHandler(self.process_queue, self.conf)
+        self.data_processor = None
+        self.load_error = None
+        self.loader = threading.Thread(target=self.load_processor, daemon=True)
+        self.loader.start()
+        self.jobs = JobController()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.log_message(_("Bitte nehmen Sie Einstellungen vor und drücken Sie 'Anwenden'."))
+        if started is not None:
+            self.bind("<Map>", lambda event: self.log_startup(event, started))
+
+    def load_processor(self):
+        """ Imports pandas, the xlsx reader and the data processor, runs in a background thread at startup. """
+        try:
+            from tools.processing import DataHandler
+            from tools.xlsx import resolve_engine
+            if resolve_engine(self.conf.xlsx_engine) == "openpyxl": import openpyxl
+            self.data_processor = DataHandler(self.process_queue, self.conf)
+        except Exception as e:
+            self.load_error = e # Reported by the first job, see processor()
+
+    def processor(self):
+        """ The data processor, waits until load_processor is done if a job is started right after startup. """
+        self.loader.join()
+        if self.data_processor is None:
+            raise RuntimeError(f"{_("Die Datenverarbeitung konnte nicht geladen werden:")} {self.load_error}") from self.load_error
+        return self.data_processor
+
+    def log_startup(self, event, started: float):
+        """ Logs the time from the start of the application until the main window is shown for the first time. """
+        if event.widget is not self: return
+        self.unbind("<Map>")
+        self.log_message(f"{_("Fenster angezeigt nach")} {time.perf_counter() - started:.2f}s")
         
     def log_message(self, message):
         """ Inserts a message into the info text box safely. """
+        self.log_messages([message])
+
+    def log_messages(self, messages: list[str]):
+        """ Inserts several messages with one update of the info text box, only the last LOG_MAX_LINES lines are kept. """
+        if not messages: return
+        stamp = datetime.datetime.now().strftime('%H:%M:%S')
         self.info_text.configure(state="normal")
-        self.info_text.insert(tk.END, f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {message}\n")
+        self.info_text.insert(tk.END, "".join(f"[{stamp}] {message}\n" for message in messages))
+        lines = int(self.info_text.index("end-1c").split(".")[0]) - 1
+        if lines > LOG_MAX_LINES:
+            self.info_text.delete("1.0", f"{lines - LOG_MAX_LINES + 1}.0")
         self.info_text.configure(state="disabled")
         self.info_text.see(tk.END) # Auto-scroll to bottom
 
     def browse_lib_file(self):
         """ Opens a dialog to select a file. """
-        path = filedialog.askopenfilename(filetypes=[("CSV "+_("Dateien"), "*.csv")])
+        path = filedialog.askopenfilename(filetypes=self.library_filetypes())
         if path:
                 self.file_path_var.set(path)
                 self.log_message(f"{_("Datei ausgewählt")}: {path}")
                 self.start_processing_thread(0)
 
     def browse_save_as(self, initial_file=None):
-        path = filedialog.asksaveasfilename(filetypes=[("CSV "+_("Dateien"), "*.csv")], initialfile=initial_file)
+        from tools.library import library_extension
+        path = filedialog.asksaveasfilename(filetypes=self.library_filetypes(), initialfile=initial_file, defaultextension=library_extension(self.conf.library_format))
         return path
 
+    def library_filetypes(self):
+        """ File types for library dialogs, the configured library format first. """
+        filetypes = {
+            "csv": ("CSV "+_("Dateien"), "*.csv *.csv.gz *.csv.zst"),
+            "parquet": ("Parquet "+_("Dateien"), "*.parquet"),
+            "partitioned": (_("Partitionierte Bibliothek"), "*.json"),
+            "sqlite": ("SQLite "+_("Datenbank"), "*.sqlite")
+        }
+        default = filetypes.pop(self.conf.library_format)
+        return [default, *filetypes.values()]
+
     def add_files(self):
         """ Opens a dialog to select multiple files and adds them to the list. """
         paths = filedialog.askopenfilenames(filetypes=[("Excel "+_("Dateien"), "*.xlsx")])
         if paths:
-            count_added = 0
-            for path in paths:
-                if path not in self.selected_files:
-                    self.selected_files.append(path)
-                    self.file_listbox.insert(tk.END, path) # Add full path to listbox
-                    count_added += 1
-            self.log_message(f"{count_added} {_("Datei(en) hinzugefügt. Insgesamt:")} {len(self.selected_files)}")
+            paths = [p for p in dict.fromkeys(paths) if p not in self.selected_set]
+            known = self.known_files(paths)
+            if known:
+                if messagebox.askyesno(_("Bereits importiert"), f"{len(known)} {_("Datei(en) wurden bereits in die Bibliothek importiert. Erneut importieren?")}"):
+                    self.reingest_files.update(known)
+                else:
+                    paths = [p for p in paths if p not in known]
+                    self.log_message(f"{len(known)} {_("bereits importierte Datei(en) nicht hinzugefügt")}")
+            self.selected_files.extend(paths)
+            self.selected_set.update(paths)
+            if paths: self.file_listbox.insert(tk.END, *paths) # Add full paths to listbox in one call
+            self.log_message(f"{len(paths)} {_("Datei(en) hinzugefügt. Insgesamt:")} {len(self.selected_files)}")
             
+    def known_files(self, paths: list[str]) -> list[str]:
+        """ Files in the ledger of the chosen library, recognized by size and modification time or by their hash. """
+        lib_path = self.file_path_var.get()
+        if not self.conf.skip_known_files or not lib_path or not os.path.isfile(lib_path):
+            return []
+        from tools.ledger import IngestionLedger
+        ledger = IngestionLedger(lib_path)
+        sensors = {p: self.conf.sensor_name(p) for p in paths}
+        return [p for p in paths if sensors[p] is not None and ledger.known(p, sensors[p]) is not None]
+
     def remove_selected_files(self):
         """ Removes the selected file(s) from the listbox and the internal list. """
         selected_indices = self.file_listbox.curselection()
@@ -155,18 +241,24 @@ class MainApp(tk.Tk):
             self.log_message(_("Keine Datei zum Entfernen ausgewählt."))
             return
 
-        # Iterate in reverse order to avoid index shifting issues
-        for index in reversed(selected_indices):
-            file_path = self.file_listbox.get(index)
-            self.file_listbox.delete(index)
-            if file_path in self.selected_files:
-                self.selected_files.remove(file_path)
+        # The listbox shows selected_files in the same order, rebuild both instead of deleting entries one by one
+        removed = set(selected_indices)
+        for index in removed:
+            self.selected_set.discard(self.selected_files[index])
+            self.reingest_files.discard(self.selected_files[index])
+        self.selected_files = [path for index, path in enumerate(self.selected_files) if index not in removed]
+        view = self.file_listbox.yview()[0]
+        self.file_listbox.delete(0, tk.END)
+        if self.selected_files: self.file_listbox.insert(tk.END, *self.selected_files)
+        self.file_listbox.yview_moveto(view)
                 
         self.log_message(f"{len(selected_indices)} {_("Datei(en) entfernt. Übrig:")} {len(self.selected_files)}")
 
     def clear_inputs(self):
         self.file_listbox.delete(0, tk.END)
         self.selected_files = []
+        self.selected_set = set()
+        self.reingest_files = set()
         self.file_path_var.set("")
         
     def on_apply_button_click(self):
@@ -179,7 +271,8 @@ class MainApp(tk.Tk):
                 return
             else: messagebox.showinfo(_("Keine neuen Dateien"), _("Die Einstellungen werden auf die gewählte Bibliothek angewendet."))
         
-        initial_name = "all_data.csv"
+        from tools.library import library_extension
+        initial_name = "all_data" + library_extension(self.conf.library_format)
         path = self.browse_save_as(initial_name)
         
         if not path:
@@ -190,6 +283,58 @@ class MainApp(tk.Tk):
         self.log_message(f"{_("Die Datei wird gespeichert unter:")} {path}")
         self.start_processing_thread(1)
 
+    def on_export_button_click(self):
+        """ Export the chosen library, e.g. a partitioned one, as a single csv file. """
+        lib_path = self.file_path_var.get()
+        if not lib_path or not os.path.isfile(lib_path):
+            messagebox.showerror(_("Datei nicht existent"), _("Bitte wählen Sie eine existierende Datei."))
+            return
+        path = filedialog.asksaveasfilename(filetypes=[("CSV "+_("Dateien"), "*.csv *.csv.gz *.csv.zst")], initialfile="all_data.csv", defaultextension=".csv")
+        if not path:
+            self.log_message(_("Speichern abgebrochen."))
+            return
+        self.start_job(self.start_export, lib_path, path)
+
+    def on_cancel_button_click(self):
+        """ Asks the running job to stop, it is stopped before the next file or stage and its output is discarded. """
+        if self.jobs.running:
+            self.jobs.cancel()
+            self.cancel_button.configure(state="disabled")
+            self.log_message(_("Abbruch angefordert, der Prozess wird beim nächsten Schritt beendet..."))
+
+    def on_close(self):
+        """ Cancels a running job and waits shortly for it, so no temporary files are left behind. """
+        if self.jobs.running:
+            self.jobs.cancel()
+            self.jobs.thread.join(timeout=10)
+        self.destroy()
+
+    def set_running(self, running: bool):
+        """ Only the cancel button can be used while a job is running. """
+        self.apply_button.configure(state="disabled" if running else "normal")
+        self.export_button.configure(state="disabled" if running else "normal")
+        self.cancel_button.configure(state="normal" if running else "disabled")
+
+    def start_job(self, work, *args):
+        """ Runs work(*args) in the background, only one job can run at a time. """
+        if not self.jobs.start(self.run_job, work, *args):
+            return
+        self.set_running(True)
+        self.check_queue()
+
+    def run_job(self, token, work, *args):
+        """ Job thread routine, the data processor checks the token between files and stages. """
+        try:
+            self.processor().cancel_token = token
+            work(*args)
+        except JobCancelled:
+            self.process_queue.put("CANCELLED")
+        except Exception as e:
+            self.process_queue.put(f"{_("Es ist ein Fehler aufgetreten:")} {e}")
+            self.process_queue.put("ERROR")
+        finally:
+            if self.data_processor is not None: self.data_processor.cancel_token = None
+
     def start_processing_thread(self, task):
         """ Validates inputs and starts the background task in a new thread. """
         if task == 0:
@@ -199,18 +344,7 @@ class MainApp(tk.Tk):
                 return
             else:
                 # All inputs are valid
-                self.apply_button.configure(state="disabled")
-
-                # Start the queue checker
-                self.check_queue()
-
-                # Create and start the worker thread
-                self.get_latest_thread = threading.Thread(
-                    target=self.start_file_reading,
-                    args=(file_path,),
-                    daemon=True # Thread will exit when main app exits
-                )
-                self.get_latest_thread.start()
+                self.start_job(self.start_file_reading, file_path)
 
         elif task == 1:
             # File concatenation
@@ -233,55 +367,88 @@ class MainApp(tk.Tk):
                     return
             else: fpaths = self.selected_files
             self.log_message(_("Starte Prozess."))
-            self.check_queue()
-            self.concat_thread = threading.Thread(
-                target=self.start_concat_process,
-                args=(fpaths, save_file, old_file_path, sort, drop_duplicates),
-                daemon=True
-            )
-            self.concat_thread.start()
+            self.start_job(self.start_concat_process, fpaths, save_file, old_file_path, sort, drop_duplicates, list(self.reingest_files))
 
     def check_queue(self):
         """
-        Checks the queue for messages from the worker thread
-        and updates the GUI. Runs on the main thread.
+        Takes all messages the worker thread put into the queue since the last update (at most QUEUE_BATCH)
+        and updates the GUI once for them. Runs on the main thread.
         """
-        try:
-            message = self.process_queue.get_nowait()
-            if message == "COMPLETED":
-                self.log_message(_("Prozess erfolgreich beendet."))
-                self.apply_button.configure(state="normal")
-            elif message == "CONCAT_COMPLETED":
-                self.log_message(_("Prozess erfolgreich beendet."))
-                self.clear_inputs()
-                self.apply_button.configure(state="normal")
-            elif message == "ERROR":
-                self.log_message(_("Während dem Prozess ist ein Fehler aufgetreten."))
-                self.apply_button.configure(state="normal")
+        lines = []
+        progress = None # Only the latest progress of a stage is shown
+        finished = None
+        taken = 0
+        while taken < QUEUE_BATCH:
+            try: message = self.process_queue.get_nowait()
+            except queue.Empty: break
+            taken += 1
+            if isinstance(message, StageEvent):
+                if message.kind == "progress":
+                    progress = message
+                    continue
+                if progress is not None: self.show_event(progress)
+                progress = None
+                line = self.show_event(message)
+                if line is not None: lines.append(line)
+            elif message in ("COMPLETED", "CONCAT_COMPLETED", "ERROR", "CANCELLED"):
+                finished = message
+                break
             else:
-                self.log_message(message)
-                self.after(100, self.check_queue)
-        except queue.Empty:
-            self.after(100, self.check_queue)
+                lines.append(message)
+        if progress is not None: self.show_event(progress)
+        if finished in ("COMPLETED", "CONCAT_COMPLETED"):
+            lines.append(_("Prozess erfolgreich beendet."))
+        elif finished == "ERROR":
+            lines.append(_("Während dem Prozess ist ein Fehler aufgetreten."))
+        elif finished == "CANCELLED":
+            lines.append(_("Prozess abgebrochen, die Ausgabedatei wurde nicht verändert."))
+        self.log_messages(lines)
+        if finished is None:
+            # Continue right away if messages are left in the queue
+            self.after(1 if taken == QUEUE_BATCH else 100, self.check_queue)
+            return
+        if finished == "CONCAT_COMPLETED":
+            self.clear_inputs()
+        elif finished == "CANCELLED":
+            self.stage_var.set("")
+            self.progress_bar.stop()
+            self.progress_bar.configure(mode="determinate", value=0)
+        self.set_running(False)
+
+    def show_event(self, event: StageEvent) -> str | None:
+        """
+        Shows the current stage in the progress bar, stages without progress events are shown as running.
+        Returns the log line of finished stages.
+        """
+        if event.kind == "start":
+            self.stage_var.set(event.label)
+            self.progress_bar.configure(mode="indeterminate", value=0)
+            self.progress_bar.start(20)
+        elif event.kind == "progress" and event.total:
+            self.stage_var.set(f"{event.label} ({event.done}/{event.total})")
+            self.progress_bar.stop()
+            self.progress_bar.configure(mode="determinate", value=event.done / event.total)
+        elif event.kind in ("end", "failed"):
+            self.progress_bar.stop()
+            self.progress_bar.configure(mode="determinate", value=1.0 if event.kind == "end" else 0)
+            rows = f", {event.rows} {_("Zeilen")}" if event.rows is not None else ""
+            self.stage_var.set(f"{event.label}: {event.duration:.2f}s")
+            if event.kind == "end": return f"{event.label}: {event.duration:.2f}s{rows}"
+        return None
 
     def start_file_reading(self, file: str):
-        """ Subprocess routine triggered by the gui. """
-        try:
-            self.process_queue.put(f"{_("Lesen starten:")} {file}")
+        """ Job routine triggered by the gui. """
+        self.process_queue.put(f"{_("Lesen starten:")} {file}")
 
-            res = self.data_processor.get_newest_sensor_entries(file)
-            for r in res:
-                self.log_message(f"Sensor: {r["name"]}, {_("letzter Eintrag:")} {r["latest"]}")  
-            self.process_queue.put("COMPLETED")
+        res = self.data_processor.get_newest_sensor_entries(file)
+        for r in res:
+            self.process_queue.put(f"Sensor: {r["name"]}, {_("letzter Eintrag:")} {r["latest"]}")
+        self.process_queue.put("COMPLETED")
 
-        except Exception as e:
-            self.process_queue.put(f"{_("Es ist ein Fehler aufgetreten:")} {e}")
-            self.process_queue.put("ERROR")
+    def start_export(self, lib_path: str, path: str):
+        """ Job routine of the export button. """
+        self.data_processor.export_csv(lib_path, path)
 
-    def start_concat_process(self, fpaths: list[str] | None, savepath: str, oldfile=None, sort=True, drop_duplicates=True):
-        try:
-            self.process_queue.put(_("Prozess gestartet"))
-            self.data_processor.append_sensor_files(fpaths, savepath, oldfile, sort, drop_duplicates)
-        except Exception as e:
-            self.process_queue.put(f"{_("Es ist ein Fehler aufgetreten:")} {e}")
-            self.process_queue.put("ERROR")
\ No newline at end of file
+    def start_concat_process(self, fpaths: list[str] | None, savepath: str, oldfile=None, sort=True, drop_duplicates=True, reingest=None):
+        self.process_queue.put(_("Prozess gestartet"))
+        self.data_processor.append_sensor_files(fpaths, savepath, oldfile, sort, drop_duplicates, reingest=reingest or False)
\ No newline at end of file
@@ -1,7 +1,11 @@
+import time
+STARTED = time.perf_counter() # Before the other imports, for the time until the window is shown
+import multiprocessing
 import gui
 from tools.get_config import AppConfig
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Worker processes for reading files in the bundled .exe
     conf = AppConfig("settings.toml", "sensors.toml")
-    app = gui.MainApp(conf)
+    app = gui.MainApp(conf, STARTED)
     app.mainloop()
\ No newline at end of file
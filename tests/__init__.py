@@ -0,0 +1,27 @@
+import json
+import tomllib
+from tools.get_config import AppConfig
+
+def toml_value(value) -> str:
+    if isinstance(value, bool): return "true" if value else "false"
+    if isinstance(value, (int, float)): return repr(value)
+    if isinstance(value, list): return "[" + ", ".join(toml_value(v) for v in value) + "]"
+    return json.dumps(str(value)) # Basic TOML strings use the escapes of JSON
+
+def config_with(tmp_path, **sections) -> AppConfig:
+    """
+    AppConfig from settings.toml with single settings replaced per section, e.g. config_with(tmp_path, library={"incremental": True}).
+    The cache is placed in tmp_path unless another path is given.
+    """
+    with open("settings.toml", "rb") as f:
+        settings = tomllib.load(f)
+    settings.setdefault("cache", {})["path"] = str(tmp_path / "cache")
+    for section, values in sections.items():
+        settings.setdefault(section, {}).update(values)
+    lines = []
+    for section, values in settings.items():
+        lines.append(f"[{section}]")
+        lines.extend(f"{key} = {toml_value(value)}" for key, value in values.items())
+    settings_path = tmp_path / f"settings_{len(list(tmp_path.glob('settings_*.toml')))}.toml"
+    settings_path.write_text("\n".join(lines))
+    return AppConfig(str(settings_path), "sensors.toml")
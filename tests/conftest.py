@@ -0,0 +1,8 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def user_cache(tmp_path_factory, monkeypatch):
+    """Keep the cache of tests using settings.toml directly out of the user's cache folder."""
+    folder = str(tmp_path_factory.mktemp("user_cache"))
+    monkeypatch.setenv("XDG_CACHE_HOME", folder)
+    monkeypatch.setenv("LOCALAPPDATA", folder)
@@ -0,0 +1,43 @@
+import os
+import queue
+import glob
+import pandas as pd
+from tools.processing import DataHandler
+from tools.cache import FileCache, file_fingerprint
+from tests import config_with
+
+class TestCache:
+
+    def test_cached_files_match(self, tmp_path):
+        """test if files loaded from the cache give the same result as parsing them"""
+        config = config_with(tmp_path, cache={"path": str(tmp_path / "cache")}, processing={"workers": 1})
+        handler = DataHandler(queue.Queue(), config)
+        filepaths = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_*.xlsx"))
+        parsed = handler.concat_sensor_files(path_to_files=filepaths)
+        assert len(os.listdir(tmp_path / "cache")) == len(filepaths)
+        cached = handler.concat_sensor_files(path_to_files=filepaths)
+        pd.testing.assert_frame_equal(parsed, cached)
+
+    def test_cache_key(self, tmp_path):
+        """test if the cache key depends on the file and the settings used to read it"""
+        cache = FileCache(str(tmp_path), 1)
+        f1, f2 = "./tests/test_data/FGV_01_sensor_data_dummy_1.xlsx", "./tests/test_data/FGV_01_sensor_data_dummy_2.xlsx"
+        assert cache.key(f1, {"sort": True}) == cache.key(f1, {"sort": True})
+        assert cache.key(f1, {"sort": True}) != cache.key(f1, {"sort": False})
+        assert cache.key(f1, {"sort": True}) != cache.key(f2, {"sort": True})
+        assert file_fingerprint(f1, "hash") != file_fingerprint(f2, "hash")
+
+    def test_lru_eviction(self, tmp_path):
+        """test if least recently used entries are removed once the cache is too large"""
+        cache = FileCache(str(tmp_path), 1)
+        df = pd.DataFrame({"Temperatur": range(40000)})
+        for key in ("a", "b", "c"):
+            cache.put(key, df)
+            os.utime(tmp_path / f"{key}.pkl", (0, {"a": 1, "b": 2, "c": 3}[key]))
+        cache.get("a") # a becomes the most recently used entry
+        cache.put("d", df)
+        assert cache.size() <= 1024 * 1024
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        cache.clear()
+        assert cache.size() == 0
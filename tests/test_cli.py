@@ -0,0 +1,66 @@
+import os
+import shutil
+import pandas as pd
+import cli
+from tools.watch import FolderWatcher
+
+DATA = "./tests/test_data"
+
+class TestCli:
+
+    def test_merge(self, tmp_path):
+        """test if the command line appends a folder of sensor files to a library like the GUI"""
+        folder = tmp_path / "new"
+        folder.mkdir()
+        for name in ["FGV_01_sensor_data_dummy_1.xlsx", "FGV_02_sensor_data_dummy_1.xlsx"]:
+            shutil.copy(os.path.join(DATA, name), folder)
+        savep = str(tmp_path / "all_data.csv")
+        assert cli.main(["merge", str(folder), "-l", f"{DATA}/basic_lib_dummy.csv", "-o", savep, "--sort"]) == 0
+        total = pd.read_csv(f"{DATA}/basic_lib_dummy.csv").shape[0]
+        for f in folder.iterdir():
+            total += pd.read_excel(f).shape[0]
+        assert 0 < pd.read_csv(savep).shape[0] <= total
+
+    def test_merge_error(self, tmp_path):
+        """test if an unknown sensor gives a non-zero exit code"""
+        code = cli.main(["merge", f"{DATA}/FGV_00_bad_sensor.xlsx", "-o", str(tmp_path / "all_data.csv")])
+        assert code == 1
+        assert not os.path.exists(tmp_path / "all_data.csv")
+
+    def test_query(self, tmp_path):
+        """test if the command line writes the rows of a sensor and time range to a csv file"""
+        out = str(tmp_path / "query.csv")
+        assert cli.main(["query", f"{DATA}/basic_lib_dummy.csv", out, "-s", "FGV_01", "--start", "2024-03-01"]) == 0
+        lib = pd.read_csv(f"{DATA}/basic_lib_dummy.csv", parse_dates=["Datum"])
+        res = pd.read_csv(out, parse_dates=["Datum"])
+        assert res.shape[0] == ((lib["Sensor"] == "FGV_01") & (lib["Datum"] >= "2024-03-01")).sum()
+        assert list(res.columns) == list(lib.columns)
+
+    def test_watch_debounce(self, tmp_path):
+        """test if a burst of arriving files is returned as one batch once it settled"""
+        shutil.copy(f"{DATA}/FGV_01_sensor_data_dummy_1.xlsx", tmp_path)
+        watcher = FolderWatcher(str(tmp_path), "FGV_*.xlsx", settle_seconds=10)
+        assert watcher.poll(now=0) == [] # Files present at the start are ignored
+        shutil.copy(f"{DATA}/FGV_01_sensor_data_dummy_2.xlsx", tmp_path)
+        assert watcher.poll(now=1) == []
+        shutil.copy(f"{DATA}/FGV_02_sensor_data_dummy_1.xlsx", tmp_path)
+        assert watcher.poll(now=8) == [] # The burst is still going on
+        assert watcher.pending == 2
+        batch = watcher.poll(now=20)
+        assert [os.path.basename(f) for f in batch] == ["FGV_01_sensor_data_dummy_2.xlsx", "FGV_02_sensor_data_dummy_1.xlsx"]
+        assert watcher.poll(now=40) == []
+        watcher.done(batch)
+        assert watcher.poll(now=60) == []
+
+    def test_watch_requeue(self, tmp_path):
+        """test if the files of a failed append are returned again and only marked as seen once done"""
+        watcher = FolderWatcher(str(tmp_path), "FGV_*.xlsx", settle_seconds=10)
+        shutil.copy(f"{DATA}/FGV_01_sensor_data_dummy_1.xlsx", tmp_path)
+        assert watcher.poll(now=0) == []
+        batch = watcher.poll(now=20)
+        assert len(batch) == 1
+        watcher.requeue(batch)
+        assert watcher.poll(now=21) == [] # Settles again before the retry
+        assert watcher.poll(now=40) == batch
+        watcher.done(batch)
+        assert watcher.poll(now=60) == []
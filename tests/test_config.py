@@ -1,7 +1,7 @@
 import pytest
 import gettext
 import tomllib
-from tools.get_config import AppConfig
+from tools.get_config import AppConfig, user_cache_dir
 import os 
 
 class TestConfig:
@@ -25,6 +25,31 @@ class TestConfig:
         assert config.sensor_name_pattern == r"FGV_\d+"
         assert config.language == "en"
         assert config.decimal_points == 2
+        assert config.workers == 1
+        assert config.xlsx_engine == "auto"
+        assert config.memory_budget_mb == 0
+        assert config.transform_workers == 1
+        assert config.pipeline_queue_size == 4
+        assert config.library_format == "csv"
+        assert config.csv_export == True
+        assert config.incremental == False
+        assert config.query_index == False
+        assert config.write_chunk_rows == 100000
+        assert config.cache_enabled == True
+        assert config.cache_path == os.path.join(user_cache_dir(), "cache")
+        assert config.cache_max_size_mb == 500
+        assert config.cache_key == "mtime"
+        assert config.clear_cache == False
+        assert config.duplicate_key == "row"
+        assert config.duplicate_conflicts == "first"
+        assert config.save_keys == True
+        assert config.watch_interval == 5
+        assert config.watch_settle_seconds == 30
+        assert config.events_file is None
+        assert config.rollups_enabled == False
+        assert config.rollup_granularities == ["hour", "day"]
+        assert config.skip_known_files == True
+        assert config.write_deltas == False
 
     def test_settings_available(self):
         """test if the available settings get passed correctly"""
@@ -39,6 +64,38 @@ class TestConfig:
         assert config["language"]["lang"] == appconfig.language
         assert config["formats"]["time_format"] == appconfig.time_format
         assert config["formats"]["decimal_points"] == appconfig.decimal_points
+        assert config["processing"]["xlsx_engine"] == appconfig.xlsx_engine
+        assert config["processing"]["memory_budget_mb"] == appconfig.memory_budget_mb
+        assert config["processing"]["workers"] == appconfig.workers
+        assert config["processing"]["transform_workers"] == appconfig.transform_workers
+        assert config["processing"]["queue_size"] == appconfig.pipeline_queue_size
+        assert config["library"]["format"] == appconfig.library_format
+        assert config["library"]["csv_export"] == appconfig.csv_export
+        assert config["library"]["incremental"] == appconfig.incremental
+        assert config["library"]["query_index"] == appconfig.query_index
+        assert config["library"]["write_chunk_rows"] == appconfig.write_chunk_rows
+        assert config["cache"]["enabled"] == appconfig.cache_enabled
+        assert os.path.join(user_cache_dir(), config["cache"]["path"]) == appconfig.cache_path
+        assert config["cache"]["max_size_mb"] == appconfig.cache_max_size_mb
+        assert config["cache"]["key"] == appconfig.cache_key
+        assert config["cache"]["clear"] == appconfig.clear_cache
+        assert config["duplicates"]["key"] == appconfig.duplicate_key
+        assert config["duplicates"]["conflicts"] == appconfig.duplicate_conflicts
+        assert config["duplicates"]["save_keys"] == appconfig.save_keys
+        assert config["watch"]["poll_interval"] == appconfig.watch_interval
+        assert config["watch"]["settle_seconds"] == appconfig.watch_settle_seconds
+        assert config["rollups"]["update"] == appconfig.rollups_enabled
+        assert config["rollups"]["granularities"] == appconfig.rollup_granularities
+        assert config["ledger"]["skip_known"] == appconfig.skip_known_files
+        assert config["deltas"]["write"] == appconfig.write_deltas
+        if config["events"]["file"]:
+            assert os.path.abspath(config["events"]["file"]) == appconfig.events_file
+        else:
+            assert appconfig.events_file is None
+        if config["processing"]["workers"] > 0:
+            assert config["processing"]["workers"] == appconfig.workers
+        else:
+            assert appconfig.workers == os.cpu_count()
         # Sorting order
         order = config.get("sorting",{}).get("order")
         if order == "ascending": order = True
@@ -59,4 +116,14 @@ class TestConfig:
         config = AppConfig("settings.toml", "sensors.toml")
         actualpath = os.path.abspath(".")
         actualpath = os.path.join(actualpath, "test")
-        assert actualpath == config.get_resource_path("test")
\ No newline at end of file
+        assert actualpath == config.get_resource_path("test")
+
+    def test_sensor_lookups(self):
+        """test if sensor names and locations are found with the prepared pattern and location map"""
+        config = AppConfig("settings.toml", "sensors.toml")
+        with open("sensors.toml", "rb") as f:
+            sensors = tomllib.load(f)
+        sensor = next(iter(sensors))
+        assert config.sensor_name(f"./data/{sensor}_export_2024.xlsx") == sensor
+        assert config.sensor_name("./data/export_2024.xlsx") is None
+        assert config.sensor_loc(sensor) == sensors[sensor]["location"]
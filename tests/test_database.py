@@ -0,0 +1,66 @@
+import glob
+import queue
+import sqlite3
+import pytest
+import pandas as pd
+from tools.processing import DataHandler
+from tools.library import library_format, read_library
+from tools.database import SqliteLibrary
+from tests import config_with
+
+LIB = "./tests/test_data/basic_lib_dummy.csv"
+
+def read_sorted(path, config) -> pd.DataFrame:
+    df = read_library(path, config)
+    df = df.assign(Sensor=df["Sensor"].astype(str), Standort=df["Standort"].astype(str), Uhrzeit=df["Uhrzeit"].astype(str))
+    return df.sort_values(["Sensor", "Datum"], kind="stable").reset_index(drop=True)
+
+class TestDatabase:
+
+    def test_upsert_same_as_csv(self, tmp_path):
+        """test if upserting into a SQLite library gives the same readings as appending to a csv library"""
+        cfg = config_with(tmp_path, duplicates={"key": "reading"}, cache={"enabled": False})
+        handler = DataHandler(queue.Queue(), cfg)
+        dbp, csvp = str(tmp_path / "all_data.sqlite"), str(tmp_path / "all_data.csv")
+        assert library_format(dbp) == "sqlite"
+        for savep in (dbp, csvp):
+            handler.append_sensor_files(path_to_files=None, old_file=LIB, save_path=savep)
+            for new_files in (glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_1.xlsx"),
+                              glob.glob("./tests/test_data/FGV_*_sensor_data_duplicate_rows_1.xlsx")):
+                handler.append_sensor_files(path_to_files=sorted(new_files), old_file=savep, save_path=savep)
+        pd.testing.assert_frame_equal(read_sorted(dbp, cfg), read_sorted(csvp, cfg))
+        assert sorted(handler.get_newest_sensor_entries(dbp), key=lambda e: e["name"]) == sorted(handler.get_newest_sensor_entries(csvp), key=lambda e: e["name"])
+
+    def test_conflicts(self, tmp_path):
+        """test if readings with a stored key keep or replace the stored temperature depending on the policy"""
+        for policy, expected in (("first", 1.0), ("last", 2.0), ("report", 1.0)):
+            cfg = config_with(tmp_path, duplicates={"conflicts": policy})
+            library = SqliteLibrary(str(tmp_path / f"{policy}.sqlite"), cfg)
+            df = pd.DataFrame({"Temperatur": [1.0], "Datum": pd.to_datetime(["2024-01-01 10:00:00"]), "Sensor": ["FGV_01"], "Standort": ["Kurzach"]})
+            library.upsert(df, policy)
+            conflicts = library.upsert(df.assign(Temperatur=2.0), policy)
+            assert library.rows == 1
+            assert library.read()["Temperatur"].iloc[0] == expected
+            assert conflicts.shape[0] == (policy == "report")
+
+    def test_missing_library(self, tmp_path):
+        """test if reading a missing SQLite library fails without creating a database"""
+        library = SqliteLibrary(str(tmp_path / "missing.sqlite"), config_with(tmp_path))
+        for read in (library.read, library.latest, lambda: library.rows, lambda: list(library.iter_range(None, None, None, None))):
+            with pytest.raises(FileNotFoundError):
+                read()
+        assert not glob.glob(str(tmp_path / "missing.sqlite*"))
+
+    def test_export_csv(self, tmp_path):
+        """test if a SQLite library is exported in the layout of csv libraries"""
+        cfg = config_with(tmp_path)
+        handler = DataHandler(queue.Queue(), cfg)
+        dbp = str(tmp_path / "all_data.sqlite")
+        handler.append_sensor_files(path_to_files=None, old_file=LIB, save_path=dbp)
+        handler.export_csv(dbp, str(tmp_path / "export.csv"))
+        exported = pd.read_csv(str(tmp_path / "export.csv"))
+        assert list(exported.columns) == list(pd.read_csv(LIB).columns)
+        assert exported.shape[0] == pd.read_csv(LIB).drop_duplicates(["Sensor", "Datum"]).shape[0]
+        with sqlite3.connect(dbp) as con:
+            plan = con.execute("EXPLAIN QUERY PLAN SELECT MAX(Datum) FROM readings WHERE Sensor = ?", ("FGV_01",)).fetchall()
+        assert "PRIMARY KEY" in str(plan) or "INDEX" in str(plan)
@@ -0,0 +1,108 @@
+import os
+import glob
+import json
+import queue
+import pytest
+import pandas as pd
+from tools.processing import DataHandler
+from tools.library import read_library
+from tools.schema import LIBRARY_COLUMNS
+from tools.deltas import DeltaLog, delta_folder, manifest_path
+from tests import config_with
+
+FIRST = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_1.xlsx"))
+NEWER = ["./tests/test_data/FGV_01_sensor_data_dummy_2.xlsx"]
+OVERLAP = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_duplicate_rows_1.xlsx"))
+COLUMNS = ["Temperatur", "Datum", "Sensor", "Standort"]
+
+def comparable(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[COLUMNS].astype({"Sensor": str, "Standort": str, "Temperatur": "float64", "Datum": "datetime64[ns]"})
+    return df.sort_values(COLUMNS).reset_index(drop=True)
+
+def added_rows(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Rows of the library after an append that were not in it before."""
+    merged = comparable(after).merge(comparable(before).drop_duplicates(), how="left", indicator=True)
+    return merged[merged["_merge"] == "left_only"][COLUMNS].reset_index(drop=True)
+
+def read_delta(libp: str, entry: dict) -> pd.DataFrame:
+    df = pd.read_csv(os.path.join(delta_folder(libp), entry["file"]), parse_dates=["Datum"])
+    assert list(df.columns) == LIBRARY_COLUMNS
+    return comparable(df)
+
+class TestDeltas:
+
+    @pytest.mark.parametrize("name,settings", [
+        ("all_data.csv", {}),
+        ("all_data.csv", {"library": {"incremental": True}}),
+        ("all_data.csv", {"duplicates": {"key": "reading", "conflicts": "last"}}),
+        ("all_data.csv", {"duplicates": {"key": "reading", "save_keys": False}, "processing": {"memory_budget_mb": 1}}),
+        ("all_data.json", {}),
+        ("all_data.sqlite", {}),
+    ])
+    def test_deltas(self, tmp_path, name, settings):
+        """test if every append writes the rows it added to the library as delta and lists it in the manifest"""
+        cfg = config_with(tmp_path, deltas={"write": True}, cache={"enabled": False}, ledger={"skip_known": False}, **settings)
+        handler = DataHandler(queue.Queue(), cfg)
+        libp = str(tmp_path / name)
+        handler.append_sensor_files(path_to_files=FIRST, save_path=libp)
+        libraries = [read_library(libp, cfg)]
+        for new_files in (NEWER, OVERLAP):
+            handler.append_sensor_files(path_to_files=new_files, old_file=libp, save_path=libp)
+            libraries.append(read_library(libp, cfg))
+
+        # Appends that add no rows, e.g. of the rows in the library already, write no delta
+        added = [added_rows(before, after) for before, after in zip(libraries, libraries[1:])]
+        expected = [comparable(libraries[0])] + [rows for rows in added if not rows.empty]
+        deltas = DeltaLog(libp).deltas
+        assert len(deltas) == len(expected) > 1
+        assert len({d["run"] for d in deltas}) == len(deltas)
+        for entry, rows in zip(deltas, expected):
+            pd.testing.assert_frame_equal(read_delta(libp, entry), rows)
+            assert entry["rows"] == rows.shape[0]
+            assert pd.Timestamp(entry["latest"]) == rows["Datum"].max()
+        watermarks = [pd.Timestamp(d["watermark"]) for d in deltas]
+        assert watermarks == sorted(watermarks) and watermarks[-1] == libraries[-1]["Datum"].max()
+
+    def test_nothing_added(self, tmp_path):
+        """test if no delta is written if an append adds no rows"""
+        cfg = config_with(tmp_path, deltas={"write": True}, cache={"enabled": False}, ledger={"skip_known": False})
+        handler = DataHandler(queue.Queue(), cfg)
+        libp = str(tmp_path / "all_data.csv")
+        handler.append_sensor_files(path_to_files=FIRST, save_path=libp)
+        log = queue.Queue()
+        DataHandler(log, cfg).append_sensor_files(path_to_files=FIRST, old_file=libp, save_path=libp)
+        assert len(DeltaLog(libp).deltas) == 1
+        assert len(os.listdir(delta_folder(libp))) == 2 # First delta and manifest
+        assert any(isinstance(m, str) and m.startswith("Keine neuen Zeilen") for m in log.queue)
+
+    def test_deltas_disabled(self, tmp_path):
+        """test if deltas are only written if enabled in the settings or for the single append"""
+        cfg = config_with(tmp_path, cache={"enabled": False})
+        handler = DataHandler(queue.Queue(), cfg)
+        libp = str(tmp_path / "all_data.csv")
+        handler.append_sensor_files(path_to_files=FIRST, save_path=libp)
+        assert not os.path.exists(delta_folder(libp))
+        handler.append_sensor_files(path_to_files=NEWER, old_file=libp, save_path=libp, delta=True)
+        with open(manifest_path(libp), "r") as f:
+            manifest = json.load(f)
+        assert manifest["library"] == "all_data.csv"
+        assert [d["rows"] for d in manifest["deltas"]] == [read_delta(libp, manifest["deltas"][0]).shape[0]]
+
+    def test_failed_append(self, tmp_path, monkeypatch):
+        """test if the rows of a failed append are not written as delta by the next append, that skips all its files"""
+        cfg = config_with(tmp_path, cache={"enabled": False}, ledger={"skip_known": True})
+        handler = DataHandler(queue.Queue(), cfg)
+        libp = str(tmp_path / "all_data.csv")
+        handler.append_sensor_files(path_to_files=FIRST, save_path=libp)
+        def fail(*args, **kwargs): raise OSError("disk full")
+        with monkeypatch.context() as m:
+            m.setattr("tools.processing.write_library", fail)
+            with pytest.raises(OSError):
+                handler.append_sensor_files(path_to_files=NEWER, old_file=libp, save_path=libp, delta=True)
+        handler.append_sensor_files(path_to_files=FIRST, old_file=libp, save_path=libp, delta=False)
+        assert not os.path.exists(delta_folder(libp))
+
+    def test_delta_folder(self):
+        """test if deltas are placed next to compressed and partitioned libraries"""
+        assert delta_folder("lib/all_data.csv.gz") == "lib/all_data_deltas"
+        assert delta_folder("lib/all_data.json") == "lib/all_data_deltas"
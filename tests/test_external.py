@@ -0,0 +1,64 @@
+import os
+import queue
+import pytest
+import pandas as pd
+from tools.processing import DataHandler
+from tools.library import read_library_index
+from tools.synthetic import generate_sensor_files, generate_library
+from tools.external import ExternalMerge, SEQ
+from tools.schema import apply_schema
+from tests import config_with
+
+@pytest.fixture(scope="module")
+def sources(tmp_path_factory):
+    """A shuffled library with duplicates and sensor files overlapping it."""
+    folder = tmp_path_factory.mktemp("external")
+    config = config_with(folder)
+    libp = str(folder / "all_data.csv")
+    generate_library(libp, config, sensors=3, years=0.15, interval_minutes=10, duplicate_ratio=0.05, shuffle_ratio=0.05)
+    paths, _rows = generate_sensor_files(str(folder / "new"), config, sensors=2, start="2023-01-20", years=0.1,
+                                         interval_minutes=10, days_per_file=20, duplicate_ratio=0.05, shuffle_ratio=0.05, seed=1)
+    return libp, paths
+
+class TestExternal:
+
+    @pytest.mark.parametrize("settings,drop_duplicates", [
+        ({}, True),
+        ({}, False),
+        ({"duplicates": {"key": "reading", "conflicts": "last"}}, True),
+        ({"library": {"incremental": True}}, True),
+        ({"sorting": {"order": "ascending"}}, True),
+    ])
+    def test_same_as_in_memory(self, tmp_path, sources, settings, drop_duplicates):
+        """test if merging in sorted runs on disk writes the same library as merging in memory"""
+        libp, paths = sources
+        results = []
+        for budget in (0, 1):
+            cfg = config_with(tmp_path, processing={"memory_budget_mb": budget}, cache={"enabled": False}, **settings)
+            savep = str(tmp_path / f"lib_{budget}.csv")
+            log = queue.Queue()
+            DataHandler(log, cfg).append_sensor_files(path_to_files=paths, old_file=libp, save_path=savep, drop_duplicates=drop_duplicates)
+            runs = [e for e in log.queue if getattr(e, "stage", None) == "merge_runs" and e.kind == "end"]
+            assert len(runs) == (budget == 1)
+            with open(savep, "rb") as f:
+                results.append(f.read())
+            if settings.get("library", {}).get("incremental"):
+                index = read_library_index(savep)
+                assert index is not None and all(e["sorted"] for e in index["sensors"].values())
+        assert results[0] == results[1]
+        assert [f for f in os.listdir(tmp_path) if f.startswith(".merge_")] == []
+
+    def test_runs_keep_groups(self, tmp_path):
+        """test if rows with equal sensor and timestamp are merged in the order of their sequence numbers"""
+        datum = pd.to_datetime(["2024-01-01 00:00:00"] * 3 + ["2024-01-01 00:10:00"] * 2)
+        df = pd.DataFrame({"Temperatur": [1.0, 2.0, 3.0, 4.0, 5.0], "Datum": datum, "Sensor": ["FGV_01"] * 5, "Standort": ["Kurzach"] * 5})
+        df = apply_schema(df)
+        merger = ExternalMerge(str(tmp_path), ascending=True, chunk_rows=3, piece_rows=1)
+        merger.add(df.iloc[3:], 0)
+        merger.add(df.iloc[:3], 2)
+        merger.add(df.iloc[1:2], 10)
+        batches = list(merger.merge())
+        assert len(batches) == 2 # One batch per timestamp, pieces never split a group
+        res = pd.concat(batches)
+        assert res["Temperatur"].tolist() == [1.0, 2.0, 3.0, 2.0, 4.0, 5.0]
+        assert res[SEQ].tolist() == [2, 3, 4, 10, 0, 1]
@@ -0,0 +1,86 @@
+import os
+import glob
+import queue
+import threading
+import pytest
+from tools.processing import DataHandler
+from tools.get_config import AppConfig
+from tools.events import StageEvent
+from tools.jobs import CancelToken, JobCancelled, JobController
+from tests import config_with
+
+LIB = "./tests/test_data/basic_lib_dummy.csv"
+FILES = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_[0-9].xlsx"))
+
+class CancellingQueue(queue.Queue):
+    """Log queue that cancels the job once a given event arrives."""
+    def __init__(self, token: CancelToken, kind: str, stage: str, done: int | None = None):
+        super().__init__()
+        self.token, self.kind, self.stage, self.done = token, kind, stage, done
+
+    def put(self, item, *args, **kwargs):
+        super().put(item, *args, **kwargs)
+        if isinstance(item, StageEvent) and (item.kind, item.stage) == (self.kind, self.stage) and self.done in (None, item.done):
+            self.token.cancel()
+
+def handler_for(config, kind, stage, done=None) -> DataHandler:
+    token = CancelToken()
+    handler = DataHandler(CancellingQueue(token, kind, stage, done), config)
+    handler.cancel_token = token
+    return handler
+
+def snapshot(folder) -> dict:
+    return {p: open(p, "rb").read() for p in glob.glob(os.path.join(folder, "**", "*"), recursive=True) if os.path.isfile(p)}
+
+class TestJobs:
+
+    def test_cancel_between_files(self, tmp_path):
+        """test if a cancelled run stops after the current file and writes no output"""
+        handler = handler_for(config_with(tmp_path, cache={"enabled": False}), "progress", "read_files", done=1)
+        os.makedirs(tmp_path / "out")
+        with pytest.raises(JobCancelled):
+            handler.append_sensor_files(FILES, str(tmp_path / "out" / "all_data.csv"), LIB)
+        assert os.listdir(tmp_path / "out") == []
+        appends = [e.kind for e in handler.log_queue.queue if isinstance(e, StageEvent) and e.stage == "append"]
+        assert appends == ["start", "failed"]
+
+    def test_rollback_incremental(self, tmp_path):
+        """test if cancelling while merging sensor blocks keeps the indexed library unchanged"""
+        cfg = config_with(tmp_path, library={"incremental": True})
+        libp = str(tmp_path / "lib" / "all_data.csv")
+        os.makedirs(os.path.dirname(libp))
+        DataHandler(queue.Queue(), cfg).append_sensor_files(None, libp, LIB, sort=True)
+        before = snapshot(tmp_path / "lib")
+        handler = handler_for(cfg, "progress", "merge_blocks", done=1)
+        with pytest.raises(JobCancelled):
+            handler.append_sensor_files(FILES, libp, libp, sort=True)
+        assert snapshot(tmp_path / "lib") == before
+
+    def test_rollback_partitioned(self, tmp_path):
+        """test if cancelling while merging partitions keeps all partitions and the manifest unchanged"""
+        cfg = AppConfig("settings.toml", "sensors.toml")
+        libp = str(tmp_path / "all_data.json")
+        DataHandler(queue.Queue(), cfg).append_sensor_files(None, libp, LIB, sort=True)
+        before = snapshot(tmp_path)
+        handler = handler_for(cfg, "progress", "merge_partitions", done=2)
+        with pytest.raises(JobCancelled):
+            handler.append_sensor_files(FILES, libp, libp, sort=True)
+        assert snapshot(tmp_path) == before
+
+    def test_job_controller(self):
+        """test if only one job runs at a time and the job gets the cancel token"""
+        jobs = JobController()
+        started, release = threading.Event(), threading.Event()
+        def work(token, results):
+            started.set()
+            release.wait(5)
+            results.append(token.cancelled)
+        results = []
+        assert jobs.start(work, results)
+        started.wait(5)
+        assert not jobs.start(work, results)
+        jobs.cancel()
+        release.set()
+        jobs.thread.join(5)
+        assert results == [True]
+        assert not jobs.running
@@ -0,0 +1,68 @@
+import queue
+import glob
+import numpy as np
+import pandas as pd
+from tools.processing import DataHandler
+from tools.keys import KeyIndex, keys_path
+from tools.library import read_library
+from tests import config_with
+
+class TestKeys:
+
+    def __library(self, tmp_path, handler) -> str:
+        """Library of the first dummy files and a copy of FGV_01 with changed temperatures."""
+        libp = str(tmp_path / "lib.csv")
+        handler.append_sensor_files(path_to_files=sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_1.xlsx")), save_path=libp)
+        return libp
+
+    def __changed(self, tmp_path) -> str:
+        df = pd.read_excel("./tests/test_data/FGV_01_sensor_data_dummy_1.xlsx")
+        df[df.columns[2]] += 1.0
+        path = str(tmp_path / "FGV_01_changed.xlsx")
+        df.to_excel(path, index=False)
+        return path
+
+    def test_key_index(self):
+        """test if keys are found again and new sensors get new codes"""
+        df = pd.DataFrame({"Temperatur": [1.0, 2.0], "Datum": pd.to_datetime(["2024-01-01", "2024-01-02"]), "Sensor": ["FGV_02", "FGV_01"]})
+        index = KeyIndex.from_frame(df)
+        assert (index.lookup(index.keys_of(df)) >= 0).all()
+        other = pd.DataFrame({"Temperatur": [3.0], "Datum": pd.to_datetime(["2024-01-01"]), "Sensor": ["FGV_03"]})
+        assert (index.lookup(index.keys_of(other)) == -1).all()
+        assert index.sensors == ["FGV_01", "FGV_02", "FGV_03"]
+        index.add(index.keys_of(df), np.array([5.0, 6.0], dtype=np.float32))
+        assert len(index.keys) == 2
+        assert sorted(index.temperatures) == [5.0, 6.0]
+
+    def test_conflict_policies(self, tmp_path):
+        """test if readings with the same sensor and timestamp are resolved by the configured policy"""
+        changed = self.__changed(tmp_path)
+        results = {}
+        for policy in ("first", "last", "report"):
+            handler = DataHandler(queue.Queue(), config_with(tmp_path, duplicates={"key": "reading", "conflicts": policy}))
+            libp = self.__library(tmp_path, handler)
+            before = read_library(libp, handler._DataHandler__config)
+            savep = str(tmp_path / f"{policy}.csv")
+            handler.append_sensor_files(path_to_files=[changed], old_file=libp, save_path=savep)
+            results[policy] = read_library(savep, handler._DataHandler__config)
+            assert results[policy].shape[0] == before.shape[0] # Every reading only once
+            if policy == "report":
+                log = list(handler.log_queue.queue)
+                assert any("FGV_01" in str(msg) and "Sensor" in str(msg) for msg in log)
+        fgv01 = lambda df: df[df["Sensor"] == "FGV_01"]["Temperatur"].sort_values().to_numpy()
+        assert (fgv01(results["last"]) > fgv01(results["first"])).all()
+        assert (fgv01(results["report"]) == fgv01(results["first"])).all()
+
+    def test_known_readings_skipped(self, tmp_path):
+        """test if re-imported files are skipped with the saved keys in incremental mode"""
+        handler = DataHandler(queue.Queue(), config_with(tmp_path, duplicates={"key": "reading"}, library={"incremental": True}))
+        libp = self.__library(tmp_path, handler)
+        assert KeyIndex.load(libp) is not None
+        files = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_[0-9].xlsx"))
+        savep = str(tmp_path / "all.csv")
+        handler.append_sensor_files(path_to_files=files, old_file=libp, save_path=savep)
+        total = sum(pd.read_excel(f).shape[0] for f in files)
+        assert read_library(savep, handler._DataHandler__config).shape[0] == total
+        keys = KeyIndex.load(savep)
+        assert keys is not None and len(keys.keys) == total
+        assert (tmp_path / "all.csv.keys.npz").exists() and keys_path(savep).endswith(".keys.npz")
@@ -0,0 +1,90 @@
+import os
+import glob
+import queue
+import shutil
+from tools.processing import DataHandler
+from tools.events import StageEvent
+from tools.library import read_library
+from tools.ledger import IngestionLedger, ledger_path
+from tests import config_with
+
+FIRST = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_1.xlsx"))
+NEWER = ["./tests/test_data/FGV_01_sensor_data_dummy_2.xlsx"]
+
+def stages(log: queue.Queue) -> list[str]:
+    return [m.stage for m in log.queue if isinstance(m, StageEvent) and m.kind == "start"]
+
+class TestLedger:
+
+    def test_skip_known_files(self, tmp_path):
+        """test if files merged already are skipped without reading them and only new files are merged"""
+        cfg = config_with(tmp_path, ledger={"skip_known": True}, cache={"enabled": False})
+        libp = str(tmp_path / "all_data.csv")
+        DataHandler(queue.Queue(), cfg).append_sensor_files(path_to_files=FIRST, save_path=libp)
+        lib = read_library(libp, cfg)
+        ledger = IngestionLedger(libp)
+        assert sorted(entry["path"] for entry in ledger.files.values()) == sorted(os.path.abspath(f) for f in FIRST)
+        assert sum(entry["rows"] for entry in ledger.files.values()) == lib.shape[0]
+        assert {entry["sensor"] for entry in ledger.files.values()} == {"FGV_01", "FGV_02"}
+
+        log = queue.Queue()
+        DataHandler(log, cfg).append_sensor_files(path_to_files=FIRST, old_file=libp, save_path=libp)
+        assert "read_files" not in stages(log)
+        assert sum(isinstance(m, str) and m.startswith("Bereits importiert") for m in log.queue) == len(FIRST)
+        assert read_library(libp, cfg).equals(lib)
+
+        log = queue.Queue()
+        DataHandler(log, cfg).append_sensor_files(path_to_files=FIRST + NEWER, old_file=libp, save_path=libp)
+        assert "read_files" in stages(log)
+        assert read_library(libp, cfg).shape[0] > lib.shape[0]
+        assert len(IngestionLedger(libp).files) == len(FIRST) + len(NEWER)
+
+    def test_restored_library(self, tmp_path):
+        """test if the ledger is ignored once the library was replaced, so the files are merged again"""
+        cfg = config_with(tmp_path, ledger={"skip_known": True}, cache={"enabled": False})
+        libp, backup = str(tmp_path / "all_data.csv"), str(tmp_path / "backup.csv")
+        DataHandler(queue.Queue(), cfg).append_sensor_files(path_to_files=FIRST, save_path=libp)
+        shutil.copy(libp, backup)
+        DataHandler(queue.Queue(), cfg).append_sensor_files(path_to_files=NEWER, old_file=libp, save_path=libp)
+        expected = read_library(libp, cfg)
+        assert not IngestionLedger(libp).outdated
+
+        shutil.copy(backup, libp) # Restored without the newer file, the ledger still lists it
+        assert IngestionLedger(libp).outdated and IngestionLedger(libp).files == {}
+        log = queue.Queue()
+        DataHandler(log, cfg).append_sensor_files(path_to_files=FIRST + NEWER, old_file=libp, save_path=libp)
+        assert "read_files" in stages(log)
+        assert read_library(libp, cfg).shape[0] == expected.shape[0]
+        assert len(IngestionLedger(libp).files) == len(FIRST) + len(NEWER)
+
+    def test_copied_file(self, tmp_path):
+        """test if a copied and renamed file is recognized by its content"""
+        cfg = config_with(tmp_path, ledger={"skip_known": True}, cache={"enabled": False})
+        libp = str(tmp_path / "all_data.csv")
+        DataHandler(queue.Queue(), cfg).append_sensor_files(path_to_files=FIRST, save_path=libp)
+        copy = str(tmp_path / "FGV_01_export_copy.xlsx") # FGV_01 and FGV_02 of the test data have the same content
+        shutil.copy(FIRST[0], copy)
+        assert IngestionLedger(libp).known(copy, "FGV_01")["rows"] > 0
+        assert IngestionLedger(libp).known(copy, "FGV_03") is None # Same export of another sensor
+        assert IngestionLedger(libp).known(NEWER[0], "FGV_01") is None
+
+    def test_reingest(self, tmp_path):
+        """test if known files are merged again on purpose"""
+        cfg = config_with(tmp_path, ledger={"skip_known": True}, cache={"enabled": False})
+        libp = str(tmp_path / "all_data.csv")
+        DataHandler(queue.Queue(), cfg).append_sensor_files(path_to_files=FIRST, save_path=libp, drop_duplicates=False)
+        rows = read_library(libp, cfg).shape[0]
+        DataHandler(queue.Queue(), cfg).append_sensor_files(path_to_files=FIRST, old_file=libp, save_path=libp, drop_duplicates=False, reingest=FIRST[:1])
+        assert read_library(libp, cfg).shape[0] > rows
+        DataHandler(queue.Queue(), cfg).append_sensor_files(path_to_files=FIRST, old_file=libp, save_path=libp, drop_duplicates=False, reingest=True)
+        assert read_library(libp, cfg).shape[0] > 2 * rows
+
+    def test_ledger_disabled(self, tmp_path):
+        """test if no ledger is written and known files are merged again if disabled"""
+        cfg = config_with(tmp_path, ledger={"skip_known": False}, cache={"enabled": False})
+        libp = str(tmp_path / "all_data.csv")
+        DataHandler(queue.Queue(), cfg).append_sensor_files(path_to_files=FIRST, save_path=libp)
+        log = queue.Queue()
+        DataHandler(log, cfg).append_sensor_files(path_to_files=FIRST, old_file=libp, save_path=libp)
+        assert "read_files" in stages(log)
+        assert not os.path.exists(ledger_path(libp))
@@ -0,0 +1,172 @@
+import os
+import queue
+import glob
+import pandas as pd
+from tools.processing import DataHandler
+from tools.get_config import AppConfig
+from tools.library import library_format, read_library, read_library_index, write_library, CsvStreamWriter
+from tools.schema import apply_schema
+from tests import config_with
+
+def read_sorted(path, config) -> pd.DataFrame:
+    df = read_library(path, config)
+    return df.sort_values(["Sensor", "Datum"], kind="stable").reset_index(drop=True)
+
+class TestLibrary:
+
+    def __getHandler(self):
+        config = AppConfig("settings.toml", "sensors.toml")
+        return DataHandler(queue.Queue(), config), config
+
+    def test_library_format(self):
+        """test if the library format is chosen by file extension"""
+        assert library_format("all_data.csv") == "csv"
+        assert library_format("all_data.PARQUET") == "parquet"
+        assert library_format("all_data") == "csv"
+
+    def test_parquet_roundtrip(self, tmp_path):
+        """test if a csv library converted to parquet keeps all rows and gets typed columns"""
+        handler, cfg = self.__getHandler()
+        libp = "./tests/test_data/basic_lib_dummy.csv"
+        savep = str(tmp_path / "all_data.parquet")
+        handler.append_sensor_files(path_to_files=None, old_file=libp, save_path=savep)
+        res = read_library(savep, cfg)
+        cmp = pd.read_csv(libp)
+        assert res.shape[0] == cmp.shape[0]
+        assert pd.api.types.is_datetime64_any_dtype(res["Datum"])
+        assert isinstance(res["Sensor"].dtype, pd.CategoricalDtype)
+        assert isinstance(res["Standort"].dtype, pd.CategoricalDtype)
+        assert pd.api.types.is_float_dtype(res["Temperatur"])
+        # csv copy for Power BI
+        csv_copy = pd.read_csv(tmp_path / "all_data.export.csv")
+        assert not os.path.exists(tmp_path / "all_data.csv")
+        assert csv_copy.shape[0] == cmp.shape[0]
+        assert (csv_copy["Datum"].sort_values().values == cmp["Datum"].sort_values().values).all()
+
+    def test_append_to_parquet(self, tmp_path):
+        """test if new sensor files can be appended to an existing parquet library"""
+        handler, cfg = self.__getHandler()
+        filepaths = glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_[0-9].xlsx")
+        libp = str(tmp_path / "lib.parquet")
+        handler.append_sensor_files(path_to_files=None, old_file="./tests/test_data/basic_lib_dummy.csv", save_path=libp)
+        savep = str(tmp_path / "all_data.parquet")
+        handler.append_sensor_files(path_to_files=filepaths, old_file=libp, save_path=savep, drop_duplicates=False)
+        total_entries = read_library(libp, cfg).shape[0]
+        for f in filepaths:
+            total_entries += pd.read_excel(f).shape[0]
+        assert read_library(savep, cfg).shape[0] == total_entries
+
+    def test_incremental_append(self, tmp_path):
+        """test if appending to an indexed library gives the same result as processing the whole library"""
+        cfg = config_with(tmp_path, library={"incremental": True})
+        handler = DataHandler(queue.Queue(), cfg)
+        full_handler = DataHandler(queue.Queue(), config_with(tmp_path, library={"incremental": False}))
+        libp = str(tmp_path / "lib.csv")
+        handler.append_sensor_files(path_to_files=sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_1.xlsx")), save_path=libp)
+        index = read_library_index(libp)
+        assert index is not None
+        assert index["rows"] == read_library(libp, cfg).shape[0]
+
+        # Newer data for one sensor only, overlapping data for both sensors
+        for new_files in (["./tests/test_data/FGV_01_sensor_data_dummy_2.xlsx"],
+                          sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_duplicate_rows_1.xlsx"))):
+            inc_path, full_path = str(tmp_path / "inc.csv"), str(tmp_path / "full.csv")
+            handler.append_sensor_files(path_to_files=new_files, old_file=libp, save_path=inc_path)
+            full_handler.append_sensor_files(path_to_files=new_files, old_file=libp, save_path=full_path)
+            assert read_library_index(inc_path) is not None
+            pd.testing.assert_frame_equal(read_sorted(inc_path, cfg), read_sorted(full_path, cfg))
+            for sensor, entry in read_library_index(inc_path)["sensors"].items():
+                assert entry["sorted"]
+
+    def test_incremental_new_sensor(self, tmp_path):
+        """test if sensors new to an indexed library are written in sensor order like processing the whole library"""
+        cfg = config_with(tmp_path, library={"incremental": True})
+        full_handler = DataHandler(queue.Queue(), config_with(tmp_path, library={"incremental": False}))
+        libp, inc_path, full_path = (str(tmp_path / name) for name in ("lib.csv", "inc.csv", "full.csv"))
+        DataHandler(queue.Queue(), cfg).append_sensor_files(path_to_files=["./tests/test_data/FGV_02_sensor_data_dummy_1.xlsx"], save_path=libp)
+        new_files = ["./tests/test_data/FGV_01_sensor_data_dummy_1.xlsx"]
+        DataHandler(queue.Queue(), cfg).append_sensor_files(path_to_files=new_files, old_file=libp, save_path=inc_path)
+        full_handler.append_sensor_files(path_to_files=new_files, old_file=libp, save_path=full_path)
+        assert list(read_library_index(inc_path)["sensors"]) == ["FGV_01", "FGV_02"]
+        assert pd.read_csv(inc_path).equals(pd.read_csv(full_path))
+
+    def test_stale_index(self, tmp_path):
+        """test if an index is ignored once the library was changed by another program"""
+        cfg = config_with(tmp_path, library={"incremental": True})
+        handler = DataHandler(queue.Queue(), cfg)
+        libp = str(tmp_path / "lib.csv")
+        handler.append_sensor_files(path_to_files=sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_1.xlsx")), save_path=libp)
+        with open(libp, "a") as f:
+            f.write("1.0,2025-01-01 00:00:00,2025,1,1,00:00:00,FGV_01,Kurzach\n")
+        assert read_library_index(libp) is None
+
+    def test_newest_entries_all_formats(self, tmp_path):
+        """test if the latest entries are the same for csv, parquet and indexed csv libraries"""
+        cfg = config_with(tmp_path, library={"incremental": True})
+        handler = DataHandler(queue.Queue(), cfg)
+        libp = "./tests/test_data/basic_lib_dummy_shuffled.csv"
+        expected = handler.get_newest_sensor_entries(libp)
+        assert len(expected) == len(pd.read_csv(libp)["Sensor"].unique())
+        for savep in (str(tmp_path / "lib.parquet"), str(tmp_path / "lib.csv")):
+            handler.append_sensor_files(path_to_files=None, old_file=libp, save_path=savep)
+            res = handler.get_newest_sensor_entries(savep)
+            assert sorted(res, key=lambda r: r["name"]) == sorted(expected, key=lambda r: r["name"])
+        assert read_library_index(str(tmp_path / "lib.csv")) is not None
+
+    def test_compressed_library(self, tmp_path):
+        """test if a gzip compressed csv library holds the same rows as an uncompressed one"""
+        handler, cfg = self.__getHandler()
+        libp = "./tests/test_data/basic_lib_dummy.csv"
+        plainp, gzp = str(tmp_path / "all_data.csv"), str(tmp_path / "all_data.csv.gz")
+        handler.append_sensor_files(path_to_files=None, old_file=libp, save_path=plainp)
+        handler.append_sensor_files(path_to_files=None, old_file=libp, save_path=gzp)
+        assert library_format(gzp) == "csv"
+        assert pd.read_csv(gzp).equals(pd.read_csv(plainp))
+
+    def test_atomic_write(self, tmp_path):
+        """test if a failed write keeps the existing library and leaves no temporary file behind"""
+        _handler, cfg = self.__getHandler()
+        df = read_library("./tests/test_data/basic_lib_dummy.csv", cfg)
+        savep = str(tmp_path / "all_data.csv")
+        write_library(df, savep, cfg)
+        before = open(savep).read()
+        try:
+            with CsvStreamWriter(savep, list(df.columns), chunk_rows=10) as writer:
+                writer.write_frame(df)
+                raise RuntimeError("interrupted")
+        except RuntimeError:
+            pass
+        assert open(savep).read() == before
+        assert not os.path.exists(savep + ".tmp")
+
+    def test_write_progress(self, tmp_path):
+        """test if writing in chunks reports the progress once per chunk"""
+        _handler, cfg = self.__getHandler()
+        df = read_library("./tests/test_data/basic_lib_dummy.csv", cfg)
+        messages = []
+        with CsvStreamWriter(str(tmp_path / "all_data.csv"), list(df.columns), chunk_rows=10, log=messages.append) as writer:
+            writer.write_frame(df)
+        assert len(messages) == -(-df.shape[0] // 10)
+        assert pd.read_csv(tmp_path / "all_data.csv").shape[0] == df.shape[0]
+
+    def test_midnight_chunk(self, tmp_path):
+        """test if chunks whose timestamps are all at midnight keep the time and are read back in every csv layout"""
+        _handler, cfg = self.__getHandler()
+        datum = pd.to_datetime(["2025-02-28 23:00:00", "2025-02-28 23:30:00", "2025-03-01 00:00:00"])
+        df = apply_schema(pd.DataFrame({"Temperatur": [1.5, 1.6, 1.7], "Datum": datum, "Sensor": ["FGV_01"] * 3, "Standort": ["Kurzach"] * 3}))
+        for name, index in (("plain.csv", False), ("indexed.csv", True), ("all_data.json", False)):
+            libp = str(tmp_path / name)
+            with CsvStreamWriter(str(tmp_path / "chunks.csv"), list(df.columns), chunk_rows=2) as writer:
+                writer.write_frame(df)
+            write_library(df, libp, cfg, index=index)
+            assert read_library(libp, cfg)["Datum"].sort_values().tolist() == datum.tolist(), name
+        assert open(tmp_path / "chunks.csv").read().splitlines()[-1].startswith("1.7,2025-03-01 00:00:00,")
+
+    def test_date_only_timestamps(self, tmp_path):
+        """test if libraries with dates only at midnight, written by earlier versions, are read completely"""
+        _handler, cfg = self.__getHandler()
+        libp = tmp_path / "all_data.csv"
+        libp.write_text("Temperatur,Datum,Jahr,Monat,Tag,Uhrzeit,Sensor,Standort\n"
+                        "1.6,2025-02-28 23:30:00,2025,2,28,23:30:00,FGV_01,Kurzach\n"
+                        "1.7,2025-03-01,2025,3,1,00:00:00,FGV_01,Kurzach\n")
+        assert read_library(str(libp), cfg)["Datum"].tolist() == [pd.Timestamp("2025-02-28 23:30:00"), pd.Timestamp("2025-03-01")]
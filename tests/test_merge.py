@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+from tools.merge import merge_sorted_runs, MAX_RUNS
+
+def runs_frame(runs: int, rows: int, ascending: bool, seed=0) -> pd.DataFrame:
+    """Frame of sorted runs for two sensors with overlapping, partly duplicated timestamps."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(runs):
+        sensor = ["FGV_02", "FGV_01"][i % 2]
+        datum = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.sort(rng.integers(0, rows, rows)) * 600, unit="s")
+        df = pd.DataFrame({"Temperatur": rng.integers(0, 3, rows).astype("float32"), "Datum": datum, "Sensor": sensor})
+        frames.append(df.sort_values("Datum", ascending=ascending, kind="stable"))
+    return pd.concat(frames, ignore_index=True)
+
+class TestMerge:
+
+    def test_merge_matches_sort(self):
+        """test if merging presorted runs gives the same result as sorting and dropping duplicates"""
+        for ascending in (True, False):
+            for drop_duplicates in (True, False):
+                for runs in (1, 4, 2 * MAX_RUNS + 2):
+                    df = runs_frame(runs, 200, ascending)
+                    expected = df.drop_duplicates() if drop_duplicates else df
+                    expected = expected.sort_values(["Sensor", "Datum"], ascending=[True, ascending], kind="stable")
+                    res = merge_sorted_runs(df, ascending, drop_duplicates)
+                    pd.testing.assert_frame_equal(res, expected)
+
+    def test_merge_missing_timestamps(self):
+        """test if frames with missing timestamps are still sorted"""
+        df = runs_frame(2, 20, False)
+        df.loc[3, "Datum"] = pd.NaT
+        res = merge_sorted_runs(df, False, True)
+        assert res.shape[0] == df.drop_duplicates().shape[0]
+        assert res["Datum"].isna().sum() == 1
@@ -0,0 +1,62 @@
+import os
+import queue
+import glob
+import pandas as pd
+from tools.processing import DataHandler
+from tools.get_config import AppConfig
+from tools.library import library_format, read_library
+from tools.partitions import PartitionedLibrary
+
+LIB = "./tests/test_data/basic_lib_dummy.csv"
+
+def read_sorted(path, config) -> pd.DataFrame:
+    df = read_library(path, config)
+    return df.sort_values(["Sensor", "Datum", "Temperatur"], kind="stable").reset_index(drop=True)
+
+class TestPartitions:
+
+    def __getHandler(self):
+        config = AppConfig("settings.toml", "sensors.toml")
+        return DataHandler(queue.Queue(), config), config
+
+    def test_convert(self, tmp_path):
+        """test if a csv library converted to a partitioned one keeps all rows in one file per sensor and year"""
+        handler, cfg = self.__getHandler()
+        savep = str(tmp_path / "all_data.json")
+        handler.append_sensor_files(path_to_files=None, old_file=LIB, save_path=savep)
+        assert library_format(savep) == "partitioned"
+        library = PartitionedLibrary(savep, cfg)
+        cmp = pd.read_csv(LIB).drop_duplicates()
+        years = pd.to_datetime(cmp["Datum"]).dt.year
+        assert set(library.partitions) == {f"{s}/{y}" for s, y in zip(cmp["Sensor"], years)}
+        assert library.rows == cmp.shape[0]
+        assert read_library(savep, cfg).shape[0] == cmp.shape[0]
+
+    def test_append_touches_new_partitions(self, tmp_path):
+        """test if appending rewrites only touched partitions and gives the same rows as a flat library"""
+        handler, cfg = self.__getHandler()
+        savep = str(tmp_path / "all_data.json")
+        handler.append_sensor_files(path_to_files=None, old_file=LIB, save_path=savep)
+        library = PartitionedLibrary(savep, cfg)
+        mtimes = {key: os.stat(library.file_of(key)).st_mtime_ns for key in library.partitions}
+
+        filepaths = sorted(glob.glob("./tests/test_data/FGV_01_sensor_data_dummy_[0-9].xlsx"))
+        handler.append_sensor_files(filepaths, savep, savep, sort=True)
+        flatp = str(tmp_path / "all_data.csv")
+        handler.append_sensor_files(filepaths, flatp, LIB, sort=True)
+
+        library = PartitionedLibrary(savep, cfg)
+        for key, mtime in mtimes.items():
+            if not key.startswith("FGV_01/"):
+                assert os.stat(library.file_of(key)).st_mtime_ns == mtime
+        assert read_sorted(savep, cfg).equals(read_sorted(flatp, cfg))
+
+    def test_export_and_latest(self, tmp_path):
+        """test if the single csv export holds all rows and the newest entries are taken from the manifest"""
+        handler, cfg = self.__getHandler()
+        savep = str(tmp_path / "all_data.json")
+        handler.append_sensor_files(path_to_files=None, old_file=LIB, save_path=savep, sort=True)
+        exportp = str(tmp_path / "export.csv")
+        handler.export_csv(savep, exportp)
+        assert read_sorted(exportp, cfg).equals(read_sorted(savep, cfg))
+        assert handler.get_newest_sensor_entries(savep) == handler.get_newest_sensor_entries(LIB)
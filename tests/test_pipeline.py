@@ -0,0 +1,56 @@
+import glob
+import queue
+import threading
+import time
+import pytest
+from tools.pipeline import Pipeline, Stage
+from tools.processing import DataHandler
+from tests import config_with
+
+FILES = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_[0-9].xlsx"))
+
+class TestPipeline:
+
+    def test_stages(self):
+        """test if every item runs through all stages and stages can drop or split items"""
+        pipeline = Pipeline([
+            Stage("square", lambda x: [x * x], workers=3),
+            Stage("odd", lambda x: [x] if x % 2 else []),
+            Stage("split", lambda x: [x, -x], workers=2)
+        ], queue_size=2)
+        res = pipeline.run(range(100))
+        assert sorted(res) == sorted([x * x for x in range(100) if x % 2] + [-x * x for x in range(100) if x % 2])
+
+    def test_bounded(self):
+        """test if a slow stage holds back the stages before it by the queue size"""
+        started = []
+        lock = threading.Lock()
+        def read(x):
+            with lock: started.append(x)
+            return [x]
+        def slow(x):
+            time.sleep(0.01)
+            with lock: assert len(started) - x <= 2 * 2 + 3 # Items in both queues and in the stages
+            return [x]
+        assert Pipeline([Stage("read", read), Stage("slow", slow)], queue_size=2).run(range(30)) == list(range(30))
+
+    def test_error(self):
+        """test if the first error of a stage stops the pipeline and keeps its type"""
+        def fail(x):
+            if x == 5: raise IndexError("kaputt")
+            return [x]
+        with pytest.raises(IndexError):
+            Pipeline([Stage("fail", fail, workers=2), Stage("pass", lambda x: [x])], queue_size=1).run(range(1000))
+
+    @pytest.mark.parametrize("settings", [
+        {"processing": {"transform_workers": 3, "queue_size": 1}},
+        {"processing": {"workers": 2}, "library": {"incremental": True}},
+        {"duplicates": {"key": "reading"}, "sorting": {"order": "ascending"}}
+    ])
+    def test_same_library(self, tmp_path, settings):
+        """test if the pipeline settings do not change the written library"""
+        expected = str(tmp_path / "expected.csv")
+        res = str(tmp_path / "res.csv")
+        DataHandler(queue.Queue(), config_with(tmp_path, cache={"enabled": False}, **{**settings, "processing": {"workers": 1}})).concat_sensor_files(FILES, save_path=expected)
+        DataHandler(queue.Queue(), config_with(tmp_path, cache={"enabled": False}, **settings)).concat_sensor_files(FILES, save_path=res)
+        assert open(res, "rb").read() == open(expected, "rb").read()
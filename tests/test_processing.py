@@ -3,11 +3,19 @@ import queue
 import glob
 import pandas as pd
 import os
+import json
 from tools.processing import DataHandler
 from tools.get_config import AppConfig
+from tools.events import StageEvent
+from tests import config_with
 
 class TestProcessing:
 
+    def teardown_method(self):
+        # Ledger and index written next to the temporary result file
+        for sidecar in ("./test/test_data/temp.csv.ledger.json", "./test/test_data/temp.csv.idx.json"):
+            if os.path.exists(sidecar): os.remove(sidecar)
+
     def __getHandler(self, gc=False):
         config = AppConfig("settings.toml", "sensors.toml")
         q = queue.Queue()
@@ -209,3 +217,39 @@ class TestProcessing:
             res = pd.read_csv(f)
         assert res.shape[0] == total_entries
         os.remove("./test/test_data/temp.csv") # Delete temporary result file
+
+    def test_parallel_matches_sequential(self, tmp_path):
+        """test if reading files in a process pool gives the same result and chunk order as reading them one by one"""
+        results = []
+        for workers in (1, 2):
+            config = config_with(tmp_path, processing={"workers": workers}, cache={"enabled": False})
+            assert config.workers == workers
+            handler = DataHandler(queue.Queue(), config)
+            filepaths = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_*.xlsx"))
+            results.append(handler.concat_sensor_files(path_to_files=filepaths))
+        pd.testing.assert_frame_equal(results[0], results[1])
+
+    def test_parallel_bad_sensor_column(self, tmp_path):
+        """test if errors raised in worker processes keep their type"""
+        handler = DataHandler(queue.Queue(), config_with(tmp_path, processing={"workers": 2}, cache={"enabled": False}))
+        filepaths = ["./tests/test_data/FGV_01_bad_sensor_col.xlsx", "./tests/test_data/FGV_01_sensor_data_dummy_1.xlsx"]
+        with pytest.raises(IndexError):
+            handler.concat_sensor_files(path_to_files=filepaths, save_path=str(tmp_path / "temp.csv"))
+
+    def test_stage_events(self, tmp_path):
+        """test if every stage reports start and end, file progress and is written to the events file"""
+        events_file = tmp_path / "events.jsonl"
+        q = queue.Queue()
+        handler = DataHandler(q, config_with(tmp_path, events={"file": events_file.as_posix()}))
+        filepaths = glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_[0-9].xlsx")
+        handler.append_sensor_files(filepaths, str(tmp_path / "all_data.csv"), "./tests/test_data/basic_lib_dummy.csv")
+        events = [m for m in list(q.queue) if isinstance(m, StageEvent)]
+        ends = {e.stage: e for e in events if e.kind == "end"}
+        assert {"read_library", "read_files", "combine", "sort", "save", "append"} <= set(ends)
+        assert all(e.duration >= 0 for e in ends.values())
+        assert ends["save"].rows == pd.read_csv(tmp_path / "all_data.csv").shape[0]
+        progress = [e for e in events if e.kind == "progress" and e.stage == "read_files"]
+        assert (progress[-1].done, progress[-1].total) == (len(filepaths), len(filepaths))
+        lines = [json.loads(line) for line in events_file.read_text().splitlines()]
+        assert len(lines) == len(events)
+        assert lines[-1]["stage"] == "append" and lines[-1]["kind"] == "end"
@@ -0,0 +1,91 @@
+import os
+import glob
+import queue
+import pytest
+import pandas as pd
+from tools.processing import DataHandler
+from tools.library import read_library, read_library_index
+from tests import config_with
+
+FILES = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_[0-9].xlsx"))
+
+def expected_rows(df: pd.DataFrame, sensors=None, locations=None, start=None, end=None) -> pd.DataFrame:
+    """Query result filtered from the whole library."""
+    mask = pd.Series(True, index=df.index)
+    if sensors is not None: mask &= df["Sensor"].isin(sensors)
+    if locations is not None: mask &= df["Standort"].isin(locations)
+    if start is not None: mask &= df["Datum"] >= pd.Timestamp(start)
+    if end is not None: mask &= df["Datum"] < pd.Timestamp(end)
+    return df[mask]
+
+def comparable(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.astype({"Sensor": str, "Standort": str, "Uhrzeit": str})
+    return df.sort_values(["Sensor", "Datum", "Temperatur"]).reset_index(drop=True)
+
+class TestQuery:
+
+    @pytest.mark.parametrize("name,settings", [
+        ("all_data.csv", {}),
+        ("all_data.csv", {"library": {"query_index": True}}),
+        ("all_data.csv.gz", {}),
+        ("all_data.parquet", {"library": {"write_chunk_rows": 10}}),
+        ("all_data.json", {}),
+        ("all_data.sqlite", {}),
+    ])
+    def test_query_formats(self, tmp_path, name, settings):
+        """test if queries return the same rows as filtering the whole library for every library format"""
+        cfg = config_with(tmp_path, cache={"enabled": False}, **settings)
+        handler = DataHandler(queue.Queue(), cfg)
+        libp = str(tmp_path / name)
+        handler.append_sensor_files(path_to_files=FILES, save_path=libp)
+        lib = read_library(libp, cfg)
+        for query in (
+            {},
+            {"sensors": ["FGV_02"]},
+            {"locations": ["Kurzach"]},
+            {"start": "2025-01-01"},
+            {"sensors": ["FGV_01"], "start": "2024-04-01", "end": "2024-05-01"},
+            {"sensors": ["FGV_01", "FGV_02"], "end": "2025-02-06 10:00:00"},
+            {"sensors": ["FGV_03"]},
+        ):
+            res = handler.query(libp, **query)
+            pd.testing.assert_frame_equal(comparable(res), comparable(expected_rows(lib, **query)), check_dtype=False, check_categorical=False)
+            assert list(res.columns) == list(lib.columns)
+
+    def test_index_months(self, tmp_path):
+        """test if the index lists the byte range of every month and an incremental append keeps it"""
+        cfg = config_with(tmp_path, library={"incremental": True}, cache={"enabled": False})
+        handler = DataHandler(queue.Queue(), cfg)
+        libp = str(tmp_path / "all_data.csv")
+        handler.append_sensor_files(path_to_files=FILES[:1], save_path=libp)
+        handler.append_sensor_files(path_to_files=FILES[1:], old_file=libp, save_path=libp)
+        index = read_library_index(libp)
+        lib = read_library(libp, cfg)
+        for sensor, entry in index["sensors"].items():
+            rows = lib[lib["Sensor"] == sensor]
+            assert [m[0] for m in entry["months"]] == list(dict.fromkeys(rows["Datum"].dt.strftime("%Y-%m")))
+            assert sum(m[3] for m in entry["months"]) == entry["rows"]
+            assert entry["months"][0][1] == entry["start"] and entry["months"][-1][2] == entry["end"]
+
+    def test_reads_only_matching_months(self, tmp_path):
+        """test if a query of an indexed library does not read the blocks of other sensors and months"""
+        cfg = config_with(tmp_path, library={"query_index": True}, cache={"enabled": False})
+        handler = DataHandler(queue.Queue(), cfg)
+        libp = str(tmp_path / "all_data.csv")
+        handler.append_sensor_files(path_to_files=FILES, save_path=libp)
+        expected = expected_rows(read_library(libp, cfg), ["FGV_02"], None, "2025-02-01", "2025-03-01")
+        assert not expected.empty
+
+        # Overwrite everything else with invalid rows of the same size, keeping the modification time of the index
+        index = read_library_index(libp)
+        month = next(m for m in index["sensors"]["FGV_02"]["months"] if m[0] == "2025-02")
+        stat = os.stat(libp)
+        with open(libp, "r+b") as f:
+            for start, end in ((index["sensors"]["FGV_01"]["start"], month[1]), (month[2], stat.st_size)):
+                f.seek(start)
+                f.write(b"x" * (end - start))
+        os.utime(libp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert read_library_index(libp) is not None
+
+        res = handler.query(libp, sensors=["FGV_02"], start="2025-02-01", end="2025-03-01")
+        pd.testing.assert_frame_equal(comparable(res), comparable(expected), check_dtype=False, check_categorical=False)
@@ -0,0 +1,62 @@
+import glob
+import queue
+import pytest
+import pandas as pd
+from tools.processing import DataHandler
+from tools.library import read_library
+from tools.rollups import rollup_path, ROLLUP_COLUMNS
+from tests import config_with
+
+FIRST = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_1.xlsx"))
+NEWER = ["./tests/test_data/FGV_01_sensor_data_dummy_2.xlsx"]
+OVERLAP = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_duplicate_rows_1.xlsx"))
+
+def expected_rollup(df: pd.DataFrame, freq: str, decimals: int) -> pd.DataFrame:
+    """Rollup computed directly from the whole library."""
+    df = df.assign(Datum=df["Datum"].dt.floor(freq), Sensor=df["Sensor"].astype(str), Standort=df["Standort"].astype(str))
+    grouped = df.groupby(["Sensor", "Standort", "Datum"])["Temperatur"]
+    res = grouped.agg(Minimum="min", Maximum="max", Mittelwert="mean", Anzahl="count").reset_index()
+    res["Mittelwert"] = res["Mittelwert"].round(decimals)
+    return res
+
+def read_rollup(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype={"Sensor": str, "Standort": str})
+    df["Datum"] = pd.to_datetime(df["Datum"])
+    return df[["Sensor", "Standort", "Datum", "Minimum", "Maximum", "Mittelwert", "Anzahl"]]
+
+class TestRollups:
+
+    @pytest.mark.parametrize("name,settings", [
+        ("all_data.csv", {}),
+        ("all_data.csv", {"library": {"incremental": True}}),
+        ("all_data.json", {}),
+        ("all_data.sqlite", {}),
+    ])
+    def test_incremental_rollups(self, tmp_path, name, settings):
+        """test if rollups updated while appending equal rollups computed from the whole library"""
+        cfg = config_with(tmp_path, rollups={"update": True}, **settings)
+        handler = DataHandler(queue.Queue(), cfg)
+        libp = str(tmp_path / name)
+        handler.append_sensor_files(path_to_files=FIRST, save_path=libp)
+        for new_files in (NEWER, OVERLAP):
+            handler.append_sensor_files(path_to_files=new_files, old_file=libp, save_path=libp)
+        lib = read_library(libp, cfg)
+        for granularity, freq in (("hour", "h"), ("day", "D")):
+            path = rollup_path(libp, granularity)
+            assert list(pd.read_csv(path, nrows=0).columns) == ROLLUP_COLUMNS
+            res = read_rollup(path).sort_values(["Sensor", "Datum"]).reset_index(drop=True)
+            exp = expected_rollup(lib, freq, cfg.decimal_points).sort_values(["Sensor", "Datum"]).reset_index(drop=True)
+            pd.testing.assert_frame_equal(res, exp, check_dtype=False)
+            assert res["Anzahl"].sum() == lib["Temperatur"].notna().sum()
+
+    def test_rollups_disabled(self, tmp_path):
+        """test if no rollup tables are written by default"""
+        handler = DataHandler(queue.Queue(), config_with(tmp_path))
+        libp = str(tmp_path / "all_data.csv")
+        handler.append_sensor_files(path_to_files=FIRST, save_path=libp)
+        assert glob.glob(str(tmp_path / "all_data_*.csv")) == []
+
+    def test_rollup_path(self):
+        """test if rollup tables are placed next to compressed and partitioned libraries"""
+        assert rollup_path("lib/all_data.csv.gz", "day") == "lib/all_data_daily.csv"
+        assert rollup_path("lib/all_data.json", "hour") == "lib/all_data_hourly.csv"
@@ -0,0 +1,50 @@
+import queue
+import glob
+import pandas as pd
+from tools.processing import DataHandler
+from tools.get_config import AppConfig
+from tools.schema import LIBRARY_COLUMNS, apply_schema, concat_library, time_of_day
+from tools.memory import peak_memory_mb
+
+class TestSchema:
+
+    def test_transformed_schema(self):
+        """test if concatenated sensor files use the compact schema without object columns"""
+        handler = DataHandler(queue.Queue(), AppConfig("settings.toml", "sensors.toml"))
+        filepaths = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_dummy_[0-9].xlsx"))
+        res = handler.concat_sensor_files(path_to_files=filepaths)
+        assert list(res.columns) == LIBRARY_COLUMNS
+        assert res["Temperatur"].dtype == "float64"
+        assert res["Jahr"].dtype == "int16"
+        assert res["Monat"].dtype == "int8"
+        assert res["Tag"].dtype == "int8"
+        for col in ("Uhrzeit", "Sensor", "Standort"):
+            assert isinstance(res[col].dtype, pd.CategoricalDtype)
+        assert sorted(res["Sensor"].unique()) == ["FGV_01", "FGV_02"]
+        assert (res["Uhrzeit"].astype(str) == res["Datum"].dt.strftime("%H:%M:%S")).all()
+
+    def test_unrounded_temperatures(self, tmp_path):
+        """test if temperatures are written unchanged when they are not rounded"""
+        df = apply_schema(pd.DataFrame({"Temperatur": [21.3, 8.17], "Datum": ["2024-01-01 10:00:00"] * 2, "Sensor": ["FGV_01"] * 2, "Standort": ["Kurzach"] * 2}))
+        df.to_csv(tmp_path / "lib.csv", index=False)
+        assert pd.read_csv(tmp_path / "lib.csv", dtype={"Temperatur": str})["Temperatur"].tolist() == ["21.3", "8.17"]
+
+    def test_concat_keeps_categories(self):
+        """test if frames with different categories are concatenated without object columns"""
+        a = apply_schema(pd.DataFrame({"Temperatur": [1.0], "Datum": ["2024-01-01 10:00:00"], "Sensor": ["FGV_02"], "Standort": ["Bottwar"]}))
+        b = apply_schema(pd.DataFrame({"Temperatur": [2.0], "Datum": ["2024-01-01 11:30:15"], "Sensor": ["FGV_01"], "Standort": ["Kurzach"]}))
+        res = concat_library([a, b])
+        assert isinstance(res["Sensor"].dtype, pd.CategoricalDtype)
+        assert list(res["Sensor"].cat.categories) == ["FGV_01", "FGV_02"]
+        assert list(res["Uhrzeit"]) == ["10:00:00", "11:30:15"]
+
+    def test_time_of_day(self):
+        """test if the time of day is formatted like datetime.time"""
+        datum = pd.Series(pd.to_datetime(["2024-01-01 00:00:00", "2024-06-30 23:59:59", "2024-01-01 00:00:00"]))
+        res = time_of_day(datum)
+        assert list(res) == [t.strftime("%H:%M:%S") for t in datum.dt.time]
+        assert len(res.categories) == 2
+
+    def test_peak_memory(self):
+        """test if the peak memory of the process can be determined"""
+        assert peak_memory_mb() > 0
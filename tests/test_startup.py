@@ -0,0 +1,10 @@
+import sys
+import subprocess
+
+class TestStartup:
+
+    def test_gui_without_pandas(self):
+        """test if the GUI module can be imported without pandas, it is loaded in the background after the window is shown"""
+        code = "import sys, gui; print('pandas' in sys.modules, 'openpyxl' in sys.modules, 'tools.processing' in sys.modules)"
+        res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        assert res.stdout.split() == ["False", "False", "False"]
@@ -0,0 +1,29 @@
+import queue
+import pandas as pd
+from tools.processing import DataHandler
+from tools.get_config import AppConfig
+from tools.library import read_library
+from tools.synthetic import generate_sensor_files, generate_library
+
+class TestSynthetic:
+
+    def test_sensor_files(self, tmp_path):
+        """test if generated sensor files can be read and contain the requested duplicates"""
+        config = AppConfig("settings.toml", "sensors.toml")
+        paths, rows = generate_sensor_files(str(tmp_path), config, sensors=2, years=0.1, interval_minutes=60,
+                                            days_per_file=10, duplicate_ratio=0.1, shuffle_ratio=0.1)
+        assert len(paths) == 2 * 4
+        assert sum(pd.read_excel(p).shape[0] for p in paths) == rows
+        handler = DataHandler(queue.Queue(), config)
+        res = handler.concat_sensor_files(paths).drop_duplicates()
+        assert set(res["Sensor"]) == {"FGV_01", "FGV_02"}
+        assert res.shape[0] == 2 * 37 * 24 # 37 days of hourly readings per sensor
+
+    def test_library(self, tmp_path):
+        """test if a generated library can be read like a library written by the application"""
+        config = AppConfig("settings.toml", "sensors.toml")
+        path = str(tmp_path / "all_data.csv")
+        rows = generate_library(path, config, sensors=3, years=0.05, interval_minutes=30)
+        df = read_library(path, config)
+        assert df.shape[0] == rows
+        assert list(df["Standort"].unique()) == [config.sensor_loc(s) for s in ["FGV_01", "FGV_02", "FGV_03"]]
@@ -0,0 +1,86 @@
+import glob
+import queue
+import datetime
+import pytest
+import pandas as pd
+from tools.processing import DataHandler
+from tools.get_config import AppConfig
+from tools.library import read_library
+from tools.timestamps import parse_timestamps, fixed_width_layout
+from tests import config_with
+
+FORMAT = "%Y-%m-%d %H:%M:%S"
+
+class TestTimestamps:
+
+    def test_same_as_pandas(self):
+        """test if the fixed width fast path parses like pd.to_datetime"""
+        datum = pd.Series(pd.date_range("2023-12-31 22:00", periods=5000, freq="7min").strftime(FORMAT))
+        datum = pd.concat([datum, datum.iloc[::3]], ignore_index=True) # Repeated timestamps like in a library
+        res, invalid = parse_timestamps(datum, FORMAT)
+        pd.testing.assert_series_equal(res, pd.to_datetime(datum, format=FORMAT).astype("datetime64[ns]"))
+        assert len(invalid) == 0
+        other = pd.Series(["01.02.2024 10:00", "29.02.2024 23:59"])
+        assert fixed_width_layout("%d.%m.%Y %H:%M") is not None
+        pd.testing.assert_series_equal(parse_timestamps(other, "%d.%m.%Y %H:%M")[0], pd.to_datetime(other, format="%d.%m.%Y %H:%M").astype("datetime64[ns]"))
+
+    def test_invalid_values(self):
+        """test if invalid timestamps become NaT and are returned instead of raising"""
+        values = pd.Series(["2024-01-01 00:10:00", "2024-02-30 00:00:00", "kaputt", None, "2024-01-01 00:10:00x",
+                            "2024-1-01 00:10:00", datetime.datetime(2024, 5, 1), "1500-01-01 00:00:00"])
+        res, invalid = parse_timestamps(values, FORMAT)
+        assert invalid.tolist() == [1, 2, 4, 7]
+        assert res[0] == pd.Timestamp("2024-01-01 00:10:00")
+        assert res[5] == pd.Timestamp("2024-01-01 00:10:00") # Not fixed width, parsed by strptime
+        assert res[6] == pd.Timestamp("2024-05-01")
+        assert pd.isna(res[3])
+
+    def test_typed_column(self):
+        """test if typed columns are not parsed again"""
+        datum = pd.Series(pd.date_range("2024-01-01", periods=3, freq="h").astype("datetime64[us]"))
+        res, invalid = parse_timestamps(datum, FORMAT)
+        assert res.dtype == "datetime64[ns]" and len(invalid) == 0
+
+    def test_report_sensor_file(self, tmp_path):
+        """test if rows of a sensor file with invalid timestamps are skipped and reported with their row number"""
+        config = AppConfig("settings.toml", "sensors.toml")
+        df = pd.read_excel("./tests/test_data/FGV_01_sensor_data_dummy_1.xlsx")
+        timecol = [c for c in df.columns if config.timestamp in c][0]
+        df[timecol] = df[timecol].dt.strftime(config.time_format).astype(object)
+        df.loc[3, timecol] = "2024-13-01 00:00:00"
+        path = str(tmp_path / "FGV_01_bad_time.xlsx")
+        df.to_excel(path, index=False)
+        log = queue.Queue()
+        res = DataHandler(log, config_with(tmp_path, cache={"enabled": False})).concat_sensor_files([path])
+        assert res.shape[0] == df.shape[0] - 1
+        messages = [m for m in log.queue if isinstance(m, str)]
+        assert any(path in m for m in messages)
+        assert any(m.endswith("5: 2024-13-01 00:00:00") for m in messages) # Header is row 1
+
+    def test_invalid_library(self, tmp_path):
+        """test if a library row with an invalid timestamp fails appending instead of dropping the row"""
+        config = AppConfig("settings.toml", "sensors.toml")
+        libp = str(tmp_path / "lib.csv")
+        lines = pd.read_csv("./tests/test_data/basic_lib_dummy.csv").to_csv(index=False).splitlines()
+        fields = lines[2].split(",")
+        fields[1] = "gestern"
+        lines[2] = ",".join(fields)
+        open(libp, "w").write("\n".join(lines) + "\n")
+        log = queue.Queue()
+        savep = str(tmp_path / "out.csv")
+        with pytest.raises(ValueError, match="gestern"):
+            DataHandler(log, config).append_sensor_files(path_to_files=None, old_file=libp, save_path=savep, drop_duplicates=False)
+        assert not glob.glob(str(tmp_path / "out.csv*"))
+
+    def test_library_time_format(self, tmp_path):
+        """test if libraries are read in their own format when the sensor files use another time format"""
+        config = config_with(tmp_path, formats={"time_format": "%d.%m.%Y %H:%M:%S"}, cache={"enabled": False})
+        handler = DataHandler(queue.Queue(), config)
+        libp = str(tmp_path / "all_data.csv")
+        first, second = (sorted(glob.glob(f"./tests/test_data/FGV_0{n}_sensor_data_dummy_1.xlsx")) for n in (1, 2))
+        handler.append_sensor_files(path_to_files=first, save_path=libp)
+        rows = read_library(libp, config).shape[0]
+        handler.append_sensor_files(path_to_files=second, old_file=libp, save_path=libp)
+        lib = read_library(libp, config)
+        assert sorted(lib["Sensor"].unique()) == ["FGV_01", "FGV_02"]
+        assert lib.shape[0] == rows + pd.read_excel(second[0]).shape[0]
@@ -0,0 +1,55 @@
+import glob
+import datetime
+import queue
+import pandas as pd
+from tools.processing import DataHandler
+from tools.xlsx import read_xlsx, resolve_engine, calamine_available
+from tests import config_with
+
+class TestXlsx:
+
+    def test_engines_match_default(self):
+        """test if every reader engine returns the same frame as pd.read_excel"""
+        for f in glob.glob("./tests/test_data/*.xlsx"):
+            expected = pd.read_excel(f)
+            for engine in ["auto", "calamine", "openpyxl", "pandas"]:
+                res = read_xlsx(f, engine, "Temperature", "Date-Time")
+                assert res.equals(expected), (f, engine)
+                assert list(res.dtypes) == list(expected.dtypes), (f, engine)
+
+    def test_streaming_invalid_cells(self, tmp_path):
+        """test if the streaming reader types timestamps and reads invalid temperatures as NaN"""
+        from openpyxl import Workbook
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["#", "Date-Time (CEST)", "Temperature (°C) "])
+        ws.append([1, datetime.datetime(2024, 5, 1, 10), 12.5])
+        ws.append([2, datetime.datetime(2024, 5, 1, 11), "n/a"])
+        ws.append([3, None, 13])
+        wb.save(tmp_path / "FGV_01_invalid.xlsx")
+        res = read_xlsx(str(tmp_path / "FGV_01_invalid.xlsx"), "openpyxl", "Temperature", "Date-Time")
+        assert pd.api.types.is_datetime64_any_dtype(res["Date-Time (CEST)"])
+        assert res["Date-Time (CEST)"].isna().tolist() == [False, False, True]
+        assert res["Temperature (°C) "].tolist()[::2] == [12.5, 13.0] and pd.isna(res["Temperature (°C) "][1])
+
+        ws.append([4, "01.05.2024 12:00:00", 14])
+        wb.save(tmp_path / "FGV_01_invalid.xlsx")
+        res = read_xlsx(str(tmp_path / "FGV_01_invalid.xlsx"), "openpyxl", "Temperature", "Date-Time")
+        assert res["Date-Time (CEST)"].iloc[-1] == "01.05.2024 12:00:00" # Parsed with the time format later
+
+    def test_fallback(self):
+        """test if a missing calamine package falls back to the default reader"""
+        assert resolve_engine("openpyxl") == "openpyxl"
+        if calamine_available():
+            assert resolve_engine("auto") == resolve_engine("calamine") == "calamine"
+        else:
+            assert resolve_engine("auto") == "openpyxl"
+            assert resolve_engine("calamine") == "pandas"
+
+    def test_streaming_library(self, tmp_path):
+        """test if the streaming reader gives the same library as the default reader"""
+        filepaths = sorted(glob.glob("./tests/test_data/FGV_*_sensor_data_*.xlsx"))
+        for engine in ["openpyxl", "pandas"]:
+            handler = DataHandler(queue.Queue(), config_with(tmp_path, processing={"xlsx_engine": engine}, cache={"enabled": False}))
+            handler.concat_sensor_files(filepaths, save_path=str(tmp_path / f"{engine}.csv"), drop_duplicates=True)
+        assert pd.read_csv(tmp_path / "openpyxl.csv").equals(pd.read_csv(tmp_path / "pandas.csv"))
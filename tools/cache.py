@@ -0,0 +1,81 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+# Bump when the transformation of sensor files changes, so old cache entries are not used anymore
+CACHE_VERSION = 3
+
+def file_fingerprint(path: str, mode: str = "mtime") -> str:
+    """Identify a file by its size and modification time (mode="mtime") or by the sha256 of its content (mode="hash")."""
+    if mode == "hash":
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for buf in iter(lambda: f.read(1 << 20), b""):
+                h.update(buf)
+        return h.hexdigest()
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+class FileCache:
+    """
+    On-disk cache of transformed sensor files. Entries are keyed by the file fingerprint together with
+    the settings used for reading it, the least recently used entries are removed once max_size_mb is exceeded.
+    """
+    def __init__(self, path: str, max_size_mb: int, key_mode: str = "mtime"):
+        self.path = path
+        self.max_size = max_size_mb * 1024 * 1024
+        self.key_mode = key_mode
+        os.makedirs(path, mode=0o700, exist_ok=True) # Entries are unpickled, only the user may write them
+
+    def key(self, file: str, settings: dict) -> str:
+        """Cache key of a sensor file read with the given settings."""
+        settings = {"version": CACHE_VERSION, "file": file_fingerprint(file, self.key_mode), **settings}
+        return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        entry = self.__entry_path(key)
+        try:
+            df = pd.read_pickle(entry)
+        except Exception:
+            return None
+        os.utime(entry) # Mark as recently used
+        return df
+
+    def put(self, key: str, df: pd.DataFrame):
+        entry = self.__entry_path(key)
+        df.to_pickle(entry + ".tmp")
+        os.replace(entry + ".tmp", entry)
+        self.__evict()
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            if name.endswith(".pkl"):
+                os.remove(os.path.join(self.path, name))
+
+    def size(self) -> int:
+        """Total size of all cache entries in bytes."""
+        return sum(entry[1] for entry in self.__entries())
+
+    def __entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key + ".pkl")
+
+    def __entries(self) -> list[tuple[str, int, float]]:
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".pkl"): continue
+            path = os.path.join(self.path, name)
+            try: stat = os.stat(path)
+            except OSError: continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def __evict(self):
+        """Remove least recently used entries until the cache fits into max_size."""
+        entries = self.__entries()
+        total = sum(entry[1] for entry in entries)
+        for path, size, mtime in sorted(entries, key=lambda e: e[2]):
+            if total <= self.max_size: break
+            try: os.remove(path)
+            except OSError: continue
+            total -= size
@@ -0,0 +1,163 @@
+import os
+import errno
+import sqlite3
+from urllib.request import pathname2url
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from tools.get_config import AppConfig
+from tools.schema import LIBRARY_COLUMNS, apply_schema
+
+# Timestamps are stored as ISO text, so they compare and sort chronologically in SQL
+DB_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    Sensor TEXT NOT NULL,
+    Datum TEXT NOT NULL,
+    Temperatur REAL,
+    Standort TEXT,
+    PRIMARY KEY (Sensor, Datum)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sensors (Sensor TEXT PRIMARY KEY) WITHOUT ROWID;
+"""
+UPSERTS = {
+    "first": "INSERT INTO readings VALUES (?, ?, ?, ?) ON CONFLICT (Sensor, Datum) DO NOTHING",
+    "last": "INSERT INTO readings VALUES (?, ?, ?, ?) ON CONFLICT (Sensor, Datum) DO UPDATE SET Temperatur = excluded.Temperatur, Standort = excluded.Standort",
+}
+UPSERTS["report"] = UPSERTS["first"]
+DB_COLUMNS = ["Temperatur", "Datum", "Sensor", "Standort"]
+
+class SqliteLibrary:
+    """
+    Data library in a SQLite database with one row per reading, keyed by sensor and timestamp. New readings are
+    upserted, so an import only touches the new rows, and other programs can query the database while it is written
+    (write-ahead log). Date parts and time of day are derived when reading, the csv layout is restored by export_csv().
+    """
+    def __init__(self, path: str, config: AppConfig):
+        self.path = path
+        self.__config = config
+
+    def connect(self, readonly: bool = False) -> sqlite3.Connection:
+        """Open the database, read-only connections neither create the file nor change it and fail for missing libraries."""
+        if readonly:
+            if not os.path.isfile(self.path):
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), self.path)
+            return sqlite3.connect(f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro", uri=True, timeout=30)
+        con = sqlite3.connect(self.path, timeout=30)
+        con.execute("PRAGMA journal_mode=WAL") # Readers are not blocked by a running import
+        con.executescript(SCHEMA)
+        return con
+
+    def upsert(self, df: pd.DataFrame, conflicts: str = "first", progress=None) -> pd.DataFrame:
+        """
+        Insert readings in batches within one transaction. Readings whose sensor and timestamp are stored already keep
+        the stored value ("first", "report") or get the new one ("last"). Returns the new readings that differ from the
+        stored ones for "report", an empty frame otherwise. progress(done, total) is called after every batch and
+        may raise to roll the transaction back.
+        """
+        batch_rows = self.__config.write_chunk_rows
+        df = df[df["Datum"].notna()] # Readings without timestamp have no key
+        conflicting = []
+        with closing(self.connect()) as con, con:
+            con.executemany("INSERT OR IGNORE INTO sensors VALUES (?)", [(s,) for s in df["Sensor"].astype(str).unique()])
+            for start in range(0, df.shape[0], batch_rows):
+                records = self.__records(df.iloc[start:start+batch_rows])
+                if conflicts == "report":
+                    conflicting.append(self.__conflicts(con, records))
+                con.executemany(UPSERTS[conflicts], records)
+                if progress is not None: progress(min(start + batch_rows, df.shape[0]), df.shape[0])
+        return pd.concat(conflicting, ignore_index=True) if conflicting else pd.DataFrame(columns=["Sensor", "Datum", "Temperatur"])
+
+    def write(self, df: pd.DataFrame):
+        """Replace the whole library by df, the new database replaces the old one once it is complete."""
+        tmp = SqliteLibrary(self.path + ".tmp", self.__config)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(tmp.path + suffix): os.remove(tmp.path + suffix)
+        try:
+            tmp.upsert(df)
+        except BaseException:
+            if os.path.exists(tmp.path): os.remove(tmp.path)
+            raise
+        os.replace(tmp.path, self.path)
+
+    def iter_chunks(self, columns: list[str] | None = None, chunksize: int = 1_000_000, where: str = "", params: tuple = ()):
+        """Read the readings ordered like a sorted library in chunks, converted to the library schema."""
+        order = "ASC" if self.__config.sort_ascending_active else "DESC"
+        query = f"SELECT {', '.join(DB_COLUMNS)} FROM readings {where} ORDER BY Sensor, Datum {order}"
+        with closing(self.connect(readonly=True)) as con:
+            for chunk in pd.read_sql_query(query, con, params=params, chunksize=chunksize):
+                df = apply_schema(chunk)
+                yield df if columns is None else df[columns]
+
+    def read(self, columns: list[str] | None = None) -> pd.DataFrame:
+        frames = list(self.iter_chunks(columns))
+        if not frames:
+            empty = apply_schema(pd.DataFrame(columns=LIBRARY_COLUMNS))
+            return empty if columns is None else empty[columns]
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def read_range(self, sensor: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        """Readings of a sensor from start (inclusive) to end (exclusive), found with the primary key."""
+        frames = list(self.iter_chunks(where="WHERE Sensor = ? AND Datum >= ? AND Datum < ?",
+                                       params=(sensor, start.strftime(DB_TIME_FORMAT), end.strftime(DB_TIME_FORMAT))))
+        return pd.concat(frames, ignore_index=True) if frames else apply_schema(pd.DataFrame(columns=LIBRARY_COLUMNS))
+
+    def iter_range(self, sensors: list[str] | None, locations: list[str] | None, start: pd.Timestamp | None, end: pd.Timestamp | None, chunksize: int = 1_000_000):
+        """Readings of the given sensors and locations from start (inclusive) to end (exclusive) in chunks, None selects all."""
+        conditions, params = [], []
+        if sensors is not None:
+            conditions.append(f"Sensor IN ({', '.join('?' * len(sensors))})")
+            params.extend(sensors)
+        if locations is not None:
+            conditions.append(f"Standort IN ({', '.join('?' * len(locations))})")
+            params.extend(locations)
+        # Stored timestamps are whole seconds, bounds within a second are rounded up
+        if start is not None:
+            conditions.append("Datum >= ?")
+            params.append(start.ceil("s").strftime(DB_TIME_FORMAT))
+        if end is not None:
+            conditions.append("Datum < ?")
+            params.append(end.ceil("s").strftime(DB_TIME_FORMAT))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        yield from self.iter_chunks(chunksize=chunksize, where=where, params=tuple(params))
+
+    def latest(self) -> dict[str, pd.Timestamp]:
+        """Newest entry of every sensor, one lookup in the primary key per sensor."""
+        latest = {}
+        with closing(self.connect(readonly=True)) as con:
+            for (sensor,) in con.execute("SELECT Sensor FROM sensors ORDER BY Sensor").fetchall():
+                newest = con.execute("SELECT MAX(Datum) FROM readings WHERE Sensor = ?", (sensor,)).fetchone()[0]
+                if newest is not None: latest[sensor] = pd.Timestamp(newest)
+        return latest
+
+    @property
+    def rows(self) -> int:
+        with closing(self.connect(readonly=True)) as con:
+            return con.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+
+    def export_csv(self, path: str, log=None):
+        """Materialize the library as a single csv file in the layout of csv libraries."""
+        from tools.library import CsvStreamWriter
+        with CsvStreamWriter(path, LIBRARY_COLUMNS, self.__config.write_chunk_rows, log, date_format=self.__config.time_format) as writer:
+            for chunk in self.iter_chunks(chunksize=self.__config.write_chunk_rows):
+                writer.write_frame(chunk)
+
+    @staticmethod
+    def __records(df: pd.DataFrame) -> list[tuple]:
+        temperatures = df["Temperatur"].astype("float64").to_numpy()
+        return list(zip(
+            df["Sensor"].astype(str).tolist(),
+            df["Datum"].dt.strftime(DB_TIME_FORMAT).tolist(),
+            np.where(np.isnan(temperatures), None, temperatures).tolist(),
+            df["Standort"].astype(str).tolist()
+        ))
+
+    @staticmethod
+    def __conflicts(con: sqlite3.Connection, records: list[tuple]) -> pd.DataFrame:
+        """Records whose sensor and timestamp are stored already with a different temperature."""
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS new_readings (Sensor TEXT, Datum TEXT, Temperatur REAL, Standort TEXT)")
+        con.execute("DELETE FROM new_readings")
+        con.executemany("INSERT INTO new_readings VALUES (?, ?, ?, ?)", records)
+        return pd.read_sql_query(
+            "SELECT n.Sensor, n.Datum, n.Temperatur FROM new_readings n JOIN readings r "
+            "ON r.Sensor = n.Sensor AND r.Datum = n.Datum WHERE r.Temperatur IS NOT n.Temperatur", con)
@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import pandas as pd
+from tools.get_config import AppConfig
+from tools.schema import LIBRARY_COLUMNS
+
+DELTAS_VERSION = 1
+
+def delta_folder(library_path: str) -> str:
+    """Folder of the delta files of a library, next to it (all_data.csv -> all_data_deltas/)."""
+    stem, ext = os.path.splitext(library_path)
+    if ext.lower() in (".gz", ".zst"): stem = os.path.splitext(stem)[0]
+    return f"{stem}_deltas"
+
+def manifest_path(library_path: str) -> str:
+    return os.path.join(delta_folder(library_path), "manifest.json")
+
+class DeltaLog:
+    """
+    Delta files of a library for incremental refreshes, e.g. in Power BI. Every run that adds rows to the library
+    writes them to a csv file in the layout of csv libraries (all_data_deltas/delta_<run>.csv) and lists it in a
+    manifest (all_data_deltas/manifest.json) with its run ID, row count, oldest and latest reading and the watermark,
+    the newest reading delivered by this and all earlier deltas. Deltas are listed in the order of the runs.
+    """
+    def __init__(self, library_path: str):
+        self.library_path = library_path
+        self.folder = delta_folder(library_path)
+        self.deltas = []
+        if os.path.isfile(manifest_path(library_path)):
+            with open(manifest_path(library_path), "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != DELTAS_VERSION:
+                raise ValueError(f"{_("Nicht unterstützte Version der Bibliothek")}: {manifest_path(library_path)}")
+            self.deltas = manifest["deltas"]
+
+    @property
+    def watermark(self) -> pd.Timestamp | None:
+        """Newest reading delivered by all deltas, None before the first delta."""
+        return pd.Timestamp(self.deltas[-1]["watermark"]) if self.deltas and self.deltas[-1]["watermark"] else None
+
+    def new_run_id(self) -> str:
+        """Run ID from the current time, unique within the folder."""
+        run = base = time.strftime("%Y%m%d-%H%M%S")
+        known = {d["run"] for d in self.deltas}
+        n = 1
+        while run in known or os.path.exists(os.path.join(self.folder, f"delta_{run}.csv")):
+            n += 1
+            run = f"{base}-{n}"
+        return run
+
+    def write(self, frames, config: AppConfig, log=None) -> dict | None:
+        """
+        Write the rows of frames (in the library schema) as the delta of a new run and add it to the manifest.
+        Nothing is written if there are no rows, returns the manifest entry of the delta otherwise.
+        """
+        from tools.library import CsvStreamWriter
+        os.makedirs(self.folder, exist_ok=True)
+        run = self.new_run_id()
+        file = f"delta_{run}.csv"
+        oldest, latest = pd.NaT, pd.NaT
+        with CsvStreamWriter(os.path.join(self.folder, file), LIBRARY_COLUMNS, config.write_chunk_rows, log) as writer:
+            for df in frames:
+                if df.empty: continue
+                writer.write_frame(df)
+                datum = df["Datum"].dropna()
+                if not datum.empty:
+                    oldest = datum.min() if pd.isna(oldest) else min(oldest, datum.min())
+                    latest = datum.max() if pd.isna(latest) else max(latest, datum.max())
+        if writer.rows_written == 0:
+            os.remove(os.path.join(self.folder, file))
+            return None
+        newest = [t for t in (latest, self.watermark) if t is not None and not pd.isna(t)]
+        entry = {
+            "run": run,
+            "file": file,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "rows": writer.rows_written,
+            "oldest": str(oldest) if not pd.isna(oldest) else None,
+            "latest": str(latest) if not pd.isna(latest) else None,
+            "watermark": str(max(newest)) if newest else None
+        }
+        self.deltas.append(entry)
+        self.save()
+        return entry
+
+    def save(self):
+        manifest = {"version": DELTAS_VERSION, "library": os.path.basename(self.library_path), "deltas": self.deltas}
+        with open(manifest_path(self.library_path) + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(manifest_path(self.library_path) + ".tmp", manifest_path(self.library_path))
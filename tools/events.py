@@ -0,0 +1,59 @@
+import json
+import os
+import time
+
+# Names shown in the GUI for the stages of DataHandler, translated when displayed
+STAGE_LABELS = {
+    "concat": "Dateien zusammenfügen",
+    "append": "Bibliothek erweitern",
+    "read_files": "Dateien lesen",
+    "read_library": "Bibliothek lesen",
+    "combine": "Kombinieren",
+    "round": "Sensorwerte Runden",
+    "deduplicate": "Duplikate entfernen",
+    "sort": "Sortieren",
+    "merge_blocks": "Sensorblöcke zusammenführen",
+    "merge_partitions": "Partitionen zusammenführen",
+    "merge_runs": "Sortierte Blöcke zusammenführen",
+    "save": "Speichern",
+    "newest": "Letzte Einträge suchen",
+    "query": "Bibliothek abfragen",
+    "rollups": "Rollup-Tabellen aktualisieren",
+    "delta": "Delta-Datei",
+}
+
+class StageEvent:
+    """
+    Structured progress event of DataHandler, put into the log queue next to the text messages.
+    kind is "start" or "end" of a stage, "progress" (done of total items) or "failed".
+    """
+    def __init__(self, kind: str, stage: str, duration: float | None = None, rows: int | None = None,
+                 done: int | None = None, total: int | None = None, memory_mb: float | None = None):
+        self.kind = kind
+        self.stage = stage
+        self.time = time.time()
+        self.duration = duration
+        self.rows = rows
+        self.done = done
+        self.total = total
+        self.memory_mb = memory_mb
+
+    @property
+    def label(self) -> str:
+        return _(STAGE_LABELS.get(self.stage, self.stage))
+
+    def to_dict(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if v is not None}
+
+    def __repr__(self):
+        return f"StageEvent({self.to_dict()})"
+
+class EventFile:
+    """Append events to a JSON lines file, one object per line."""
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write(self, event: StageEvent):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event.to_dict()) + "\n")
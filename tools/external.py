@@ -0,0 +1,109 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from tools.schema import concat_library, frame_size_mb
+
+SEQ = "_seq" # Position of a row in the combined input (new rows first), keeps the order of rows with equal timestamps
+NAT_KEY = np.iinfo(np.int64).max # Missing timestamps are sorted last like sort_values does
+
+def chunk_rows_for_budget(sample: pd.DataFrame, budget_mb: int, copies: int = 3) -> int:
+    """
+    Rows per chunk so that about copies copies of a chunk fit into budget_mb. sample is a chunk as read from the
+    library, parsed csv chunks with string columns are the largest copy, the converted and sorted ones are smaller.
+    """
+    row_bytes = max(frame_size_mb(sample) * 1024**2 / max(sample.shape[0], 1), 1)
+    return max(int(budget_mb * 1024**2 / (row_bytes * copies)), 10_000)
+
+def sort_keys(df: pd.DataFrame, ascending: bool) -> np.ndarray:
+    """Integer keys ordering the rows of a sensor by Datum in the configured direction."""
+    datum = df["Datum"].to_numpy(dtype="datetime64[ns]")
+    keys = datum.view(np.int64)
+    if not ascending: keys = -keys
+    return np.where(np.isnat(datum), NAT_KEY, keys)
+
+def sensor_ranks(df: pd.DataFrame, sensors: list[str]) -> np.ndarray:
+    """Position of the sensor of every row in the sorted list sensors."""
+    sensor = df["Sensor"].astype("category")
+    return np.searchsorted(sensors, sensor.cat.categories.to_numpy(dtype=str))[sensor.cat.codes.to_numpy()]
+
+class ExternalMerge:
+    """
+    Sort a library larger than the available memory: chunks are sorted by Sensor and Datum and spilled to folder
+    as runs, merge() streams the merged rows in batches. Rows with equal keys keep the order of their SEQ column,
+    so the result equals a stable sort of all chunks. A run is saved in pieces that never split rows with the same
+    sensor and timestamp, so every batch contains all rows of such a group, e.g. to drop duplicates per batch.
+    While merging, about chunk_rows rows are held in memory, split evenly between the runs.
+    """
+    def __init__(self, folder: str, ascending: bool, chunk_rows: int, piece_rows: int | None = None):
+        self.folder = folder
+        self.ascending = ascending
+        self.chunk_rows = chunk_rows
+        self.piece_rows = piece_rows if piece_rows is not None else max(chunk_rows // 64, 1_000)
+        self.runs = []
+        self.rows = 0
+        self.sensors = set()
+
+    def add(self, df: pd.DataFrame, seq_start: int):
+        """Sort a chunk and spill it as a run, the rows get SEQ values from seq_start on."""
+        if df.empty: return
+        df = df.assign(**{SEQ: np.arange(seq_start, seq_start + df.shape[0], dtype=np.int64)})
+        names = sorted(df["Sensor"].astype("category").cat.categories.astype(str))
+        self.sensors.update(names)
+        sensor = sensor_ranks(df, names)
+        keys = sort_keys(df, self.ascending)
+        order = np.lexsort((keys, sensor)) # Stable, rows with equal keys keep their SEQ order
+        df, sensor, keys = df.iloc[order], sensor[order], keys[order]
+        group_start = np.r_[True, (sensor[1:] != sensor[:-1]) | (keys[1:] != keys[:-1])]
+        path = os.path.join(self.folder, f"run_{len(self.runs):05d}.pkl")
+        with open(path, "wb") as f:
+            start = 0
+            while start < df.shape[0]:
+                end = min(start + self.piece_rows, df.shape[0])
+                while end < df.shape[0] and not group_start[end]: end += 1
+                pickle.dump(df.iloc[start:end], f, protocol=pickle.HIGHEST_PROTOCOL)
+                start = end
+        self.runs.append(path)
+        self.rows += df.shape[0]
+
+    def merge(self):
+        """Yield the rows of all runs in sorted order in batches, rows with equal keys ordered by SEQ."""
+        ranks = sorted(self.sensors)
+        buffer_rows = max(self.chunk_rows // max(len(self.runs), 1), 1)
+        files = [open(path, "rb") for path in self.runs]
+        try:
+            buffers = [self.__load(f, ranks, buffer_rows) for f in files]
+            while any(b is not None for b in buffers):
+                # Every run holds all rows up to its last loaded key, so rows up to the smallest of them are complete
+                last = min((b[1][-1], b[2][-1]) for b in buffers if b is not None)
+                taken = []
+                for i, b in enumerate(buffers):
+                    if b is None: continue
+                    df, rank, keys = b
+                    upto = (rank < last[0]) | ((rank == last[0]) & (keys <= last[1]))
+                    n = int(upto.sum()) # Rows are sorted, the taken rows are a prefix
+                    if n == 0: continue
+                    taken.append((df.iloc[:n], rank[:n], keys[:n]))
+                    buffers[i] = (df.iloc[n:], rank[n:], keys[n:]) if n < df.shape[0] else self.__load(files[i], ranks, buffer_rows)
+                batch = concat_library([t[0] for t in taken])
+                rank = np.concatenate([t[1] for t in taken])
+                keys = np.concatenate([t[2] for t in taken])
+                yield batch.iloc[np.lexsort((batch[SEQ].to_numpy(), keys, rank))]
+        finally:
+            for f in files: f.close()
+
+    def __load(self, f, ranks: list[str], rows: int):
+        """
+        Next pieces of a run, at least rows rows unless the run ends, with the global rank of their sensors and their keys.
+        None once the run is exhausted.
+        """
+        pieces, loaded = [], 0
+        while loaded < rows:
+            try:
+                pieces.append(pickle.load(f))
+            except EOFError:
+                break
+            loaded += pieces[-1].shape[0]
+        if not pieces: return None
+        df = concat_library(pieces) if len(pieces) > 1 else pieces[0]
+        return df, sensor_ranks(df, ranks), sort_keys(df, self.ascending)
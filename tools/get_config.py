@@ -1,8 +1,17 @@
 import tomllib
 import os
+import re
 import sys
 import gettext
 
+def user_cache_dir() -> str:
+    """ Per-user cache folder of the application (%LOCALAPPDATA% on Windows, $XDG_CACHE_HOME or ~/.cache otherwise). """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(os.path.join("~", "AppData", "Local"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache"))
+    return os.path.join(base, "FGV-Sensordatentool")
+
 class AppConfig:
     __config = dict()
 
@@ -20,10 +29,17 @@ class AppConfig:
         except Exception as e:
             print("Error loading config file:", e)
 
+        # Looked up for every sensor file, prepared once
+        self.__sensor_pattern = re.compile(self.sensor_name_pattern)
+        self.__locations = {sensor: entry.get("location") for sensor, entry in getattr(self, "_AppConfig__sensors", {}).items()}
+        self.install_language()
+
+    def install_language(self):
+        """ Install the gettext translation for the configured language as builtin _(). """
         try: lang = gettext.translation("base", localedir=self.get_resource_path("locales"), languages=[self.language], fallback=True)
         except Exception as e: 
             print(f"Error getting translations for {self.language}:",e)
-            pass
+            lang = gettext.NullTranslations()
         lang.install()
 
 
@@ -33,8 +49,13 @@ class AppConfig:
             return self.__sensors.keys()
         
     def sensor_loc(self, sensor) -> str:
-        if self.__sensors:
-            return self.__sensors[sensor]["location"]
+        if self.__locations:
+            return self.__locations[sensor]
+
+    def sensor_name(self, path: str) -> str | None:
+        """ Sensor name in the path of a sensor file (sensor_name_pattern), None if there is none. """
+        match = self.__sensor_pattern.search(path)
+        return match.group() if match else None
 
     @property
     def timestamp(self) -> str:
@@ -78,6 +99,156 @@ class AppConfig:
     def decimal_points(self) -> int:
         return self.__config.get("formats",{}).get("decimal_points", 2)
 
+    @property
+    def workers(self) -> int:
+        """ Number of processes used for reading sensor files, 0 uses all available cores. """
+        workers = self.__config.get("processing",{}).get("workers", 1)
+        if workers < 1:
+            return os.cpu_count() or 1
+        return workers
+
+    @property
+    def transform_workers(self) -> int:
+        """ Threads transforming decoded sensor files into the library format while the next files are decoded. """
+        workers = self.__config.get("processing",{}).get("transform_workers", 1)
+        return workers if workers >= 1 else 1
+
+    @property
+    def pipeline_queue_size(self) -> int:
+        """ Files waiting at most between two processing stages, limits the memory used while reading. """
+        size = self.__config.get("processing",{}).get("queue_size", 4)
+        return size if size >= 1 else 4
+
+    @property
+    def memory_budget_mb(self) -> int:
+        """ Memory budget for merging libraries larger than the memory in sorted runs on disk, 0 = everything in memory. """
+        budget = self.__config.get("processing",{}).get("memory_budget_mb", 0)
+        return budget if budget > 0 else 0
+
+    @property
+    def xlsx_engine(self) -> str:
+        """ Reader of the sensor files: auto (default), calamine, openpyxl (streaming) or pandas (default reader of pandas). """
+        engine = self.__config.get("processing",{}).get("xlsx_engine", "auto")
+        if engine in ("auto", "calamine", "openpyxl", "pandas"):
+            return engine
+        return "auto"
+
+    @property
+    def library_format(self) -> str:
+        """ Default file format of new data libraries, csv, parquet, partitioned or sqlite. """
+        fmt = self.__config.get("library",{}).get("format", "csv")
+        if fmt in ("csv", "parquet", "partitioned", "sqlite"):
+            return fmt
+        return "csv"
+
+    @property
+    def csv_export(self) -> bool:
+        """ Write a csv copy (.export.csv) next to parquet libraries for Power BI. """
+        return self.__config.get("library",{}).get("csv_export", True)
+
+    @property
+    def incremental(self) -> bool:
+        """ Merge new files into indexed csv libraries without re-reading untouched sensors. """
+        return self.__config.get("library",{}).get("incremental", False)
+
+    @property
+    def query_index(self) -> bool:
+        """ Write the sidecar index also for sorted csv libraries that are not appended incrementally, for queries of a time range. """
+        return self.__config.get("library",{}).get("query_index", False)
+
+    @property
+    def write_chunk_rows(self) -> int:
+        """ Rows written to the library per chunk, progress is logged after every chunk. """
+        rows = self.__config.get("library",{}).get("write_chunk_rows", 100_000)
+        return rows if rows >= 1 else 100_000
+
+    @property
+    def watch_interval(self) -> float:
+        """ Seconds between two scans of a watched folder. """
+        return self.__config.get("watch",{}).get("poll_interval", 5)
+
+    @property
+    def watch_settle_seconds(self) -> float:
+        """ Seconds without new files before the files of a watched folder are merged. """
+        return self.__config.get("watch",{}).get("settle_seconds", 30)
+
+    @property
+    def events_file(self) -> str | None:
+        """ JSON lines file the processing events are appended to, None if disabled. """
+        path = self.__config.get("events",{}).get("file", "")
+        return os.path.abspath(path) if path else None
+
+    @property
+    def rollups_enabled(self) -> bool:
+        """ Maintain hourly and daily rollup tables next to the library when appending. """
+        return self.__config.get("rollups",{}).get("update", False)
+
+    @property
+    def rollup_granularities(self) -> list[str]:
+        """ Time buckets of the rollup tables, "hour" and/or "day". """
+        granularities = self.__config.get("rollups",{}).get("granularities", ["hour", "day"])
+        granularities = [g for g in granularities if g in ("hour", "day")]
+        return granularities if granularities else ["hour", "day"]
+
+    @property
+    def skip_known_files(self) -> bool:
+        """ Keep a ledger of the merged files next to the library and skip files that were merged already. """
+        return self.__config.get("ledger",{}).get("skip_known", True)
+
+    @property
+    def write_deltas(self) -> bool:
+        """ Write the rows added by every append to a delta file next to the library, listed in a manifest. """
+        return self.__config.get("deltas",{}).get("write", False)
+
+    @property
+    def cache_enabled(self) -> bool:
+        """ Cache transformed sensor files on disk. """
+        return self.__config.get("cache",{}).get("enabled", True)
+
+    @property
+    def cache_path(self) -> str:
+        """ Folder of the cache, relative paths are placed in the per-user cache folder. """
+        path = os.path.expanduser(self.__config.get("cache",{}).get("path", "cache"))
+        return os.path.abspath(os.path.join(user_cache_dir(), path))
+
+    @property
+    def cache_max_size_mb(self) -> int:
+        return self.__config.get("cache",{}).get("max_size_mb", 500)
+
+    @property
+    def cache_key(self) -> str:
+        """ Identify cached files by "mtime" (size and modification time) or "hash" (file content). """
+        key = self.__config.get("cache",{}).get("key", "mtime")
+        if key in ("mtime", "hash"):
+            return key
+        return "mtime"
+
+    @property
+    def clear_cache(self) -> bool:
+        """ Empty the cache when the application starts. """
+        return self.__config.get("cache",{}).get("clear", False)
+
+    @property
+    def duplicate_key(self) -> str:
+        """ "row": duplicates are identical in all columns, "reading": duplicates have the same sensor and timestamp. """
+        key = self.__config.get("duplicates",{}).get("key", "row")
+        if key in ("row", "reading"):
+            return key
+        return "row"
+
+    @property
+    def duplicate_conflicts(self) -> str:
+        """ Readings with the same key but different temperatures: keep "first", "last" or "report" and keep first. """
+        policy = self.__config.get("duplicates",{}).get("conflicts", "first")
+        if policy in ("first", "last", "report"):
+            return policy
+        return "first"
+
+    @property
+    def save_keys(self) -> bool:
+        """ Save the keys of all readings next to the library for detecting known readings. """
+        return self.__config.get("duplicates",{}).get("save_keys", True)
+
     def get_resource_path(self, relative_path) -> str:
         """ Get resource path for pyinstaller. """
         try:
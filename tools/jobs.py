@@ -0,0 +1,42 @@
+import threading
+
+class JobCancelled(Exception):
+    """Raised inside a job once it was cancelled, outputs written so far are rolled back."""
+
+class CancelToken:
+    """Cooperative cancellation flag, set by the GUI thread and checked by the job between files and stages."""
+    def __init__(self):
+        self.__event = threading.Event()
+
+    def cancel(self):
+        self.__event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__event.is_set()
+
+    def check(self):
+        if self.__event.is_set():
+            raise JobCancelled(_("Prozess abgebrochen."))
+
+class JobController:
+    """Runs one job at a time in a background thread, the job gets a CancelToken as its first argument."""
+    def __init__(self):
+        self.token = None
+        self.thread = None
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, target, *args) -> bool:
+        """Start target(token, *args), returns False if a job is still running."""
+        if self.running:
+            return False
+        self.token = CancelToken()
+        self.thread = threading.Thread(target=target, args=(self.token, *args), daemon=True)
+        self.thread.start()
+        return True
+
+    def cancel(self):
+        if self.running: self.token.cancel()
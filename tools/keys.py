@@ -0,0 +1,84 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Reading keys are sensor code * KEY_FACTOR + seconds since epoch
+KEY_FACTOR = 10**10
+
+def keys_path(path: str) -> str:
+    """Path of the reading keys saved next to a library."""
+    return path + ".keys.npz"
+
+def epoch_seconds(datum: pd.Series) -> np.ndarray:
+    return datum.to_numpy(dtype="datetime64[s]").view(np.int64)
+
+def duplicated_readings(keys: np.ndarray, keep: str) -> np.ndarray:
+    """Mask of readings with a key seen before (keep="first") or seen again later (keep="last")."""
+    return pd.Series(keys).duplicated(keep="last" if keep == "last" else "first").to_numpy()
+
+def conflicting_readings(keys: np.ndarray, temperatures: np.ndarray) -> np.ndarray:
+    """Mask of readings sharing their key with a reading of a different temperature."""
+    df = pd.DataFrame({"key": keys, "temp": temperatures})
+    return (df.groupby("key")["temp"].transform("nunique") > 1).to_numpy()
+
+class KeyIndex:
+    """
+    Sorted integer keys (sensor code and timestamp) and temperatures of all readings in a library.
+    Saved next to the library, it tells which new readings are already known without reading the library.
+    """
+    def __init__(self, sensors: list[str] | None = None, keys: np.ndarray | None = None, temperatures: np.ndarray | None = None):
+        self.sensors = list(sensors) if sensors is not None else []
+        self.keys = keys if keys is not None else np.empty(0, dtype=np.int64)
+        self.temperatures = temperatures if temperatures is not None else np.empty(0, dtype=np.float32)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "KeyIndex":
+        index = cls()
+        index.add(index.keys_of(df), df["Temperatur"].to_numpy(dtype=np.float32))
+        return index
+
+    @classmethod
+    def load(cls, path: str) -> "KeyIndex | None":
+        """Load the keys saved next to the library at path, None if missing or the library changed since."""
+        try:
+            with np.load(keys_path(path)) as data:
+                stat = os.stat(path)
+                if int(data["size"]) != stat.st_size or int(data["mtime_ns"]) != stat.st_mtime_ns:
+                    return None
+                return cls(data["sensors"].tolist(), data["keys"], data["temperatures"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, path: str):
+        """Save the keys next to the library at path, the library has to be written completely."""
+        stat = os.stat(path)
+        with open(keys_path(path) + ".tmp", "wb") as f:
+            np.savez(f, sensors=np.array(self.sensors, dtype=str), keys=self.keys, temperatures=self.temperatures,
+                     size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        os.replace(keys_path(path) + ".tmp", keys_path(path))
+
+    def keys_of(self, df: pd.DataFrame) -> np.ndarray:
+        """Keys of the readings in df, sensors not known yet get a new code."""
+        sensor = df["Sensor"].astype("category")
+        for name in sensor.cat.categories:
+            if name not in self.sensors: self.sensors.append(name)
+        codes = np.array([self.sensors.index(name) for name in sensor.cat.categories], dtype=np.int64)
+        return codes[sensor.cat.codes.to_numpy()] * KEY_FACTOR + epoch_seconds(df["Datum"])
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Position of every key in the index, -1 for unknown keys."""
+        pos = np.searchsorted(self.keys, keys)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == keys[found]
+        return np.where(found, pos, -1)
+
+    def add(self, keys: np.ndarray, temperatures: np.ndarray):
+        """Add readings, known keys get the new temperature."""
+        pos = self.lookup(keys)
+        known = pos >= 0
+        self.temperatures[pos[known]] = temperatures[known]
+        keys, temperatures = keys[~known], temperatures[~known]
+        keys, first = np.unique(keys, return_index=True)
+        pos = np.searchsorted(self.keys, keys)
+        self.keys = np.insert(self.keys, pos, keys)
+        self.temperatures = np.insert(self.temperatures, pos, temperatures[first])
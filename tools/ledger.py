@@ -0,0 +1,75 @@
+import os
+import json
+import time
+import pandas as pd
+from tools.cache import file_fingerprint
+
+LEDGER_VERSION = 2
+
+def ledger_path(path: str) -> str:
+    """Ledger of the files merged into a library, next to it (all_data.csv -> all_data.csv.ledger.json)."""
+    return path + ".ledger.json"
+
+def library_stamp(path: str) -> dict | None:
+    """Size and modification time of the library the ledger describes, None if it does not exist."""
+    if not os.path.isfile(path): return None
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+class IngestionLedger:
+    """
+    Record of every sensor file merged into a library with its path, size, modification time, content hash, sensor
+    and the range of its rows, saved next to the library. Files are looked up by path, size and modification time
+    first and by the sha256 of their content otherwise, so copied or renamed files are recognized without reading them.
+    Entries are keyed by sensor and hash, the sensor is part of the file name and not of the content.
+    The ledger stores the size and modification time of the library it was saved with. If the library was replaced or
+    restored since, the ledger is outdated and ignored, so no file is skipped whose data is missing in the library.
+    """
+    def __init__(self, path: str | None = None):
+        self.files = {}
+        self.outdated = False
+        self.__hashes = {} # Hashes computed in this run, by path, size and modification time
+        if path is not None and os.path.isfile(ledger_path(path)):
+            with open(ledger_path(path), "r") as f:
+                ledger = json.load(f)
+            if ledger.get("version") == LEDGER_VERSION and ledger.get("library") == library_stamp(path):
+                self.files = ledger["files"]
+            else:
+                self.outdated = True
+        self.__stats = {(e["path"], e["size"], e["mtime_ns"]): e["hash"] for e in self.files.values()}
+
+    def hash_of(self, file: str) -> str:
+        """Content hash of a file, only computed if the file is not in the ledger with the same size and modification time."""
+        stat = os.stat(file)
+        key = (os.path.abspath(file), stat.st_size, stat.st_mtime_ns)
+        if key in self.__stats: return self.__stats[key]
+        if key not in self.__hashes: self.__hashes[key] = file_fingerprint(file, "hash")
+        return self.__hashes[key]
+
+    def known(self, file: str, sensor: str) -> dict | None:
+        """Ledger entry of a file of sensor that was merged already, None for new files."""
+        return self.files.get(f"{sensor}:{self.hash_of(file)}")
+
+    def record(self, file: str, sensor: str, df: pd.DataFrame):
+        """Record a merged file with the range of its rows."""
+        stat = os.stat(file)
+        datum = df["Datum"].dropna() if "Datum" in df.columns else pd.Series(dtype="datetime64[ns]")
+        file_hash = self.hash_of(file)
+        self.files[f"{sensor}:{file_hash}"] = {
+            "path": os.path.abspath(file),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": file_hash,
+            "sensor": sensor,
+            "rows": int(df.shape[0]),
+            "oldest": str(datum.min()) if not datum.empty else None,
+            "latest": str(datum.max()) if not datum.empty else None,
+            "ingested": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self.__stats[(os.path.abspath(file), stat.st_size, stat.st_mtime_ns)] = file_hash
+
+    def save(self, path: str):
+        """Save the ledger next to the library at path, once the library is written."""
+        with open(ledger_path(path) + ".tmp", "w") as f:
+            json.dump({"version": LEDGER_VERSION, "library": library_stamp(path), "files": self.files}, f, indent=1)
+        os.replace(ledger_path(path) + ".tmp", ledger_path(path))
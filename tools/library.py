@@ -0,0 +1,365 @@
+import os
+import io
+import gzip
+import json
+import numpy as np
+import pandas as pd
+from tools.get_config import AppConfig
+from tools.schema import apply_schema, LIBRARY_TIME_FORMAT
+from tools.timestamps import overlaps
+from tools.partitions import PartitionedLibrary
+from tools.database import SqliteLibrary
+
+LIBRARY_FORMATS = {".csv": "csv", ".parquet": "parquet", ".json": "partitioned", ".sqlite": "sqlite"}
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd"}
+
+def library_compression(path: str) -> str | None:
+    """Compression of a csv library based on its extension (.csv.gz or .csv.zst), None if uncompressed."""
+    return COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+
+def library_format(path: str) -> str:
+    """Return the storage format of a library file based on its extension, csv is the default."""
+    if library_compression(path) is not None:
+        path = os.path.splitext(path)[0]
+    return LIBRARY_FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+
+def library_extension(fmt: str) -> str:
+    """File extension of new libraries in the given format, partitioned libraries are opened by their manifest."""
+    return {f: ext for ext, f in LIBRARY_FORMATS.items()}[fmt]
+
+def read_library(path: str, config: AppConfig, columns: list[str] | None = None) -> pd.DataFrame:
+    """Read a data library from csv, parquet, partitions or SQLite, complete libraries are converted to the compact library schema."""
+    if library_format(path) == "partitioned":
+        return PartitionedLibrary(path, config).read(columns)
+    if library_format(path) == "sqlite":
+        return SqliteLibrary(path, config).read(columns)
+    if library_format(path) == "parquet":
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        df = pd.read_csv(path, usecols=columns) # Compression is inferred from the extension
+    if columns is None:
+        df = apply_schema(df)
+    return df
+
+def iter_library(path: str, config: AppConfig, columns: list[str] | None = None, chunksize: int = 1_000_000):
+    """Read a data library in chunks of at most chunksize rows (one partition each for partitioned libraries), only the given columns are read."""
+    if library_format(path) == "partitioned":
+        yield from PartitionedLibrary(path, config).iter_partitions(columns)
+        return
+    if library_format(path) == "sqlite":
+        yield from SqliteLibrary(path, config).iter_chunks(columns, chunksize)
+        return
+    if library_format(path) == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    with pd.read_csv(path, usecols=columns, chunksize=chunksize) as reader:
+        yield from reader
+
+def iter_library_range(path: str, config: AppConfig, sensors: list[str] | None = None, locations: list[str] | None = None,
+                       start: pd.Timestamp | None = None, end: pd.Timestamp | None = None, chunksize: int = 1_000_000):
+    """
+    Read the rows of the given sensors and locations from start (inclusive) to end (exclusive) in chunks in the library
+    schema, None selects all. Only the parts of the library that may hold such rows are read: the months of the sidecar
+    index of csv libraries, row groups of parquet libraries by their statistics, partitions by the manifest and SQLite
+    libraries by their primary key. csv libraries without a valid index are scanned chunk by chunk.
+    """
+    fmt = library_format(path)
+    if fmt == "partitioned":
+        library = PartitionedLibrary(path, config)
+        chunks = (library.read_partition(key) for key in library.keys_in_range(sensors, start, end))
+    elif fmt == "sqlite":
+        chunks = SqliteLibrary(path, config).iter_range(sensors, locations, start, end, chunksize)
+    elif fmt == "parquet":
+        chunks = _iter_parquet_range(path, config, sensors, locations, start, end, chunksize)
+    else:
+        index = read_library_index(path) if library_compression(path) is None else None
+        if index is not None:
+            chunks = _iter_indexed_range(path, index, config, sensors, start, end)
+        else:
+            chunks = _iter_csv_range(path, config, sensors, locations, chunksize)
+    for chunk in chunks:
+        mask = np.ones(chunk.shape[0], dtype=bool)
+        if sensors is not None: mask &= chunk["Sensor"].isin(sensors).to_numpy()
+        if locations is not None: mask &= chunk["Standort"].isin(locations).to_numpy()
+        if start is not None: mask &= (chunk["Datum"] >= start).to_numpy()
+        if end is not None: mask &= (chunk["Datum"] < end).to_numpy()
+        if mask.any():
+            yield chunk if mask.all() else chunk[mask].reset_index(drop=True)
+
+def _iter_indexed_range(path: str, index: dict, config: AppConfig, sensors, start, end):
+    """Read the blocks of the selected sensors of an indexed csv library, only the months overlapping the range."""
+    with open(path, "rb") as src:
+        for sensor, entry in index["sensors"].items():
+            if (sensors is not None and sensor not in sensors) or entry["rows"] == 0: continue
+            if not overlaps(entry["oldest"], entry["latest"], start, end): continue
+            if entry.get("months") is None: # Written before months were indexed or unsorted
+                yield read_csv_block(src, entry, index["columns"], config)
+                continue
+            ranges = []
+            for month, first, last, _rows in entry["months"]:
+                begin = pd.Timestamp(month + "-01")
+                if not overlaps(begin, begin + pd.offsets.MonthBegin(1) - pd.Timedelta(1), start, end): continue
+                if ranges and ranges[-1]["end"] == first: ranges[-1]["end"] = last # Neighbouring months are read at once
+                else: ranges.append({"start": first, "end": last})
+            for block in ranges:
+                yield read_csv_block(src, block, index["columns"], config)
+
+def _iter_parquet_range(path: str, config: AppConfig, sensors, locations, start, end, chunksize: int):
+    """Read a parquet library with a filter, row groups whose statistics do not match are skipped."""
+    import pyarrow.dataset as ds
+    conditions = []
+    if sensors is not None: conditions.append(ds.field("Sensor").isin(sensors))
+    if locations is not None: conditions.append(ds.field("Standort").isin(locations))
+    if start is not None: conditions.append(ds.field("Datum") >= start)
+    if end is not None: conditions.append(ds.field("Datum") < end)
+    condition = None
+    for c in conditions: condition = c if condition is None else condition & c
+    for batch in ds.dataset(path, format="parquet").to_batches(filter=condition, batch_size=chunksize):
+        if batch.num_rows: yield apply_schema(batch.to_pandas())
+
+def _iter_csv_range(path: str, config: AppConfig, sensors, locations, chunksize: int):
+    """Scan a csv library, rows of other sensors and locations are dropped before their timestamps are parsed."""
+    for chunk in iter_library(path, config, chunksize=chunksize):
+        if sensors is not None: chunk = chunk[chunk["Sensor"].astype(str).isin(sensors)]
+        if locations is not None: chunk = chunk[chunk["Standort"].astype(str).isin(locations)]
+        if not chunk.empty: yield apply_schema(chunk.reset_index(drop=True))
+
+def csv_export_path(path: str) -> str:
+    """csv copy of a parquet library for Power BI (all_data.parquet -> all_data.export.csv), so it never replaces a csv library of the same name."""
+    return os.path.splitext(path)[0] + ".export.csv"
+
+def write_library(df: pd.DataFrame, path: str, config: AppConfig, index=False, log=None) -> None:
+    """
+    Write a data library as csv, parquet, partitions or SQLite, parquet libraries get a csv copy for Power BI if enabled.
+    With index=True uncompressed csv libraries are written sensor by sensor together with a sidecar index (see IndexedCsvWriter).
+    Files are written to a temporary file first and only replace path once they are complete.
+    """
+    if library_format(path) == "partitioned":
+        PartitionedLibrary(path, config).write(df)
+    elif library_format(path) == "sqlite":
+        SqliteLibrary(path, config).write(df)
+    elif library_format(path) == "parquet":
+        # Row groups of write_chunk_rows rows, so queries of a time range skip the groups outside of it
+        apply_schema(df).to_parquet(path + ".tmp", index=False, row_group_size=config.write_chunk_rows)
+        os.replace(path + ".tmp", path)
+        if config.csv_export:
+            with CsvStreamWriter(csv_export_path(path), list(df.columns), config.write_chunk_rows, log,
+                                 date_format=config.time_format) as writer:
+                writer.write_frame(df)
+    elif index and library_compression(path) is None:
+        with IndexedCsvWriter(path, list(df.columns), config.sort_ascending_active, config.write_chunk_rows, log) as writer:
+            for sensor, rows in df.groupby("Sensor", sort=False, observed=True):
+                writer.write_block(sensor, rows)
+    else:
+        with CsvStreamWriter(path, list(df.columns), config.write_chunk_rows, log) as writer:
+            writer.write_frame(df)
+
+class CsvStreamWriter:
+    """
+    Write a csv file in chunks of at most chunk_rows rows, gzip or zstd compressed for .gz/.zst paths.
+    Rows go to a temporary file that replaces path on close(), abort() removes it again. Used as a context manager
+    the file is only replaced if no exception occurred. Progress is reported through log after every chunk.
+    Timestamps are written in date_format, the format of libraries unless given. It is passed to every chunk,
+    otherwise pandas writes chunks whose timestamps are all at midnight without the time.
+    """
+    def __init__(self, path: str, columns: list[str], chunk_rows: int = 100_000, log=None, date_format: str = LIBRARY_TIME_FORMAT):
+        self.path = path
+        self.columns = columns
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0
+        self.date_format = date_format
+        self.__log = log
+        self.__chunks_logged = 0
+        self.__raw = open(path + ".tmp", "wb")
+        compression = library_compression(path)
+        if compression == "gzip":
+            stream = gzip.GzipFile(fileobj=self.__raw, mode="wb")
+        elif compression == "zstd":
+            try: import zstandard
+            except ImportError as e:
+                self.__raw.close()
+                os.remove(path + ".tmp")
+                raise ImportError(_("Für .zst Dateien muss das Paket zstandard installiert sein")) from e
+            stream = zstandard.ZstdCompressor().stream_writer(self.__raw, closefd=False)
+        else:
+            stream = self.__raw
+        self.__stream = stream
+        # Always UTF-8 like pd.read_csv reads it, independent of the locale encoding (cp1252 on Windows)
+        self.__text = io.TextIOWrapper(stream, encoding="utf-8", newline="", write_through=True)
+        self.__text.write(",".join(columns) + "\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None: self.close()
+        else: self.abort()
+
+    def write_frame(self, df: pd.DataFrame):
+        """Append rows in chunks of chunk_rows rows."""
+        df = df[self.columns]
+        for start in range(0, df.shape[0], self.chunk_rows):
+            df.iloc[start:start+self.chunk_rows].to_csv(self.__text, header=False, index=False, lineterminator="\n",
+                                                            date_format=self.date_format)
+            self.rows_written += min(self.chunk_rows, df.shape[0] - start)
+            if self.rows_written // self.chunk_rows > self.__chunks_logged:
+                # Small frames, e.g. single sensor blocks, are reported once a full chunk has been written
+                self.__chunks_logged = self.rows_written // self.chunk_rows
+                self.__progress()
+
+    def __progress(self):
+        if self.__log is not None:
+            self.__log(f"{_("Gespeichert")}: {self.rows_written} {_("Zeilen")}, {self.bytes_written() / 1024**2:.1f} MB")
+
+    def write_bytes(self, data: bytes):
+        """Append raw utf-8 encoded csv rows."""
+        self.__text.flush()
+        self.__stream.write(data)
+
+    def bytes_written(self) -> int:
+        """Bytes written to disk so far, compressed size for compressed files."""
+        self.__text.flush()
+        return self.__raw.tell()
+
+    def close(self):
+        """Finish the file and move it to its destination."""
+        if self.rows_written % self.chunk_rows: self.__progress()
+        self.__text.close()
+        self.__raw.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def abort(self):
+        """Discard everything written, an existing file at path stays untouched."""
+        try: self.__text.close()
+        except Exception: pass
+        self.__raw.close()
+        if os.path.exists(self.path + ".tmp"):
+            os.remove(self.path + ".tmp")
+
+def index_path(path: str) -> str:
+    """Path of the sidecar index of a csv library."""
+    return path + ".idx.json"
+
+def read_library_index(path: str) -> dict | None:
+    """Return the sidecar index of a csv library or None if there is none or the library changed since it was written."""
+    try:
+        with open(index_path(path), "r") as f:
+            index = json.load(f)
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    if index.get("size") != stat.st_size or index.get("mtime_ns") != stat.st_mtime_ns:
+        return None
+    return index
+
+def read_csv_block(src, entry: dict, columns: list[str], config: AppConfig) -> pd.DataFrame:
+    """Read the rows of one sensor block of an indexed csv library, src is the library opened in binary mode."""
+    src.seek(entry["start"])
+    df = pd.read_csv(io.BytesIO(src.read(entry["end"] - entry["start"])), header=None, names=columns)
+    return apply_schema(df)
+
+class IndexedCsvWriter(CsvStreamWriter):
+    """
+    Write an uncompressed csv library block by block, one contiguous block per sensor, and keep the byte range, 
+    row range and oldest/latest timestamp of every block in a sidecar index. Blocks also list the byte range and
+    rows of every month ([month, start, end, rows]), so queries of a time range only read the months they need.
+    Like all csv libraries it is written to a temporary file first, so the source library may be the destination at the same time.
+    """
+    def __init__(self, path: str, columns: list[str], ascending: bool, chunk_rows: int = 100_000, log=None):
+        super().__init__(path, columns, chunk_rows, log)
+        self.ascending = ascending
+        self.sensors = {}
+        self.__rows = 0
+        self.__current = None
+
+    def begin(self, sensor: str):
+        self.__current = {"start": self.bytes_written(), "first_row": self.__rows, "rows": 0, "oldest": None, "latest": None, "months": []}
+        self.sensors[sensor] = self.__current
+
+    def write_rows(self, df: pd.DataFrame):
+        """Append rows of the current sensor, Datum has to be a datetime column."""
+        if df.empty: return
+        datum = df["Datum"]
+        if self.__current["months"] is None or datum.isna().any():
+            self.__current["months"] = None # Rows without timestamp belong to no month, the block is read as a whole
+            self.write_frame(df)
+        else:
+            # One byte range per run of rows in the same month
+            months = (datum.dt.year * 100 + datum.dt.month).to_numpy()
+            bounds = [0, *(np.flatnonzero(months[1:] != months[:-1]) + 1), len(months)]
+            for first, last in zip(bounds[:-1], bounds[1:]):
+                start = self.bytes_written()
+                self.write_frame(df.iloc[first:last])
+                self.__month(f"{months[first] // 100:04d}-{months[first] % 100:02d}", start, self.bytes_written(), int(last - first))
+        self.__update(df.shape[0], datum.min(), datum.max())
+
+    def copy_rows(self, src, entry: dict):
+        """Copy a sensor block of another indexed library verbatim, src is opened in binary mode."""
+        if self.__current["months"] is not None and entry.get("months") is not None:
+            shift = self.bytes_written() - entry["start"]
+            for month, start, end, rows in entry["months"]:
+                self.__month(month, start + shift, end + shift, rows)
+        else:
+            self.__current["months"] = None
+        src.seek(entry["start"])
+        remaining = entry["end"] - entry["start"]
+        while remaining > 0:
+            buf = src.read(min(remaining, 1 << 20))
+            if not buf: break
+            self.write_bytes(buf)
+            remaining -= len(buf)
+        self.__update(entry["rows"], pd.Timestamp(entry["oldest"]), pd.Timestamp(entry["latest"]))
+
+    def end(self, sorted: bool):
+        self.__current["end"] = self.bytes_written()
+        months = self.__current["months"]
+        if months is not None and len({m[0] for m in months}) < len(months):
+            self.__current["months"] = None # A month in several places of an unsorted block
+        self.__current["sorted"] = sorted
+        self.__rows += self.__current["rows"]
+        self.__current = None
+
+    def write_block(self, sensor: str, df: pd.DataFrame):
+        """Write the complete block of a sensor."""
+        self.begin(sensor)
+        self.write_rows(df)
+        datum = df["Datum"]
+        self.end(datum.is_monotonic_increasing if self.ascending else datum.is_monotonic_decreasing)
+
+    def copy_block(self, sensor: str, src, entry: dict):
+        """Copy the complete block of a sensor that is not touched by new data."""
+        self.begin(sensor)
+        self.copy_rows(src, entry)
+        self.end(entry["sorted"])
+
+    def close(self):
+        """Move the written library to its destination and save the index next to it."""
+        super().close()
+        stat = os.stat(self.path)
+        index = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "rows": self.__rows,
+            "ascending": self.ascending,
+            "columns": self.columns,
+            "sensors": self.sensors
+        }
+        with open(index_path(self.path) + ".tmp", "w") as f:
+            json.dump(index, f, indent=1)
+        os.replace(index_path(self.path) + ".tmp", index_path(self.path))
+
+    def __month(self, month: str, start: int, end: int, rows: int):
+        months = self.__current["months"]
+        if months and months[-1][0] == month and months[-1][2] == start:
+            months[-1][2] = end
+            months[-1][3] += rows
+        else:
+            months.append([month, start, end, rows])
+
+    def __update(self, rows: int, oldest: pd.Timestamp, latest: pd.Timestamp):
+        cur = self.__current
+        cur["rows"] += rows
+        cur["oldest"] = str(oldest if cur["oldest"] is None else min(oldest, pd.Timestamp(cur["oldest"])))
+        cur["latest"] = str(latest if cur["latest"] is None else max(latest, pd.Timestamp(cur["latest"])))
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# Sensors split into more presorted runs than this are sorted directly, merging many tiny runs is slower
+MAX_RUNS = 64
+
+def _merge_two(ka: np.ndarray, ia: np.ndarray, kb: np.ndarray, ib: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Merge two sorted key arrays and their row ids in linear time, rows of a come first for equal keys."""
+    pos = np.searchsorted(ka, kb, side="right") + np.arange(len(kb))
+    mask = np.zeros(len(ka) + len(kb), dtype=bool)
+    mask[pos] = True
+    keys = np.empty(len(mask), dtype=ka.dtype)
+    ids = np.empty(len(mask), dtype=ia.dtype)
+    keys[pos], ids[pos] = kb, ib
+    keys[~mask], ids[~mask] = ka, ia
+    return keys, ids
+
+def _merge_runs(runs: list[tuple[np.ndarray, np.ndarray]]) -> tuple[np.ndarray, np.ndarray]:
+    """Merge sorted runs pairwise, neighbouring runs are merged first so earlier runs win ties."""
+    while len(runs) > 1:
+        runs = [_merge_two(*runs[i], *runs[i+1]) if i+1 < len(runs) else runs[i] for i in range(0, len(runs), 2)]
+    return runs[0]
+
+def merge_sorted_runs(df: pd.DataFrame, ascending: bool = False, drop_duplicates: bool = False) -> pd.DataFrame:
+    """
+    Sort a library frame by Sensor and Datum like sort_values(["Sensor", "Datum"]) by merging the presorted runs
+    of every sensor, e.g. the sorted library followed by sorted new files. Duplicate rows always share a timestamp,
+    so with drop_duplicates they are removed where equal timestamps meet during the merge, keeping the first row.
+    """
+    if df.empty: return df
+    datum = df["Datum"].to_numpy(dtype="datetime64[ns]")
+    if np.isnat(datum).any():
+        # Missing timestamps have no place in the runs
+        if drop_duplicates: df = df.drop_duplicates()
+        return df.sort_values(by=["Sensor", "Datum"], ascending=[True, ascending], kind="stable")
+
+    keys = datum.view(np.int64)
+    if not ascending: keys = -keys
+    codes = df["Sensor"].astype("category").cat.codes.to_numpy() # Categories are sorted by name
+
+    by_sensor = np.argsort(codes, kind="stable")
+    codes_s, keys_s = codes[by_sensor], keys[by_sensor]
+    sensor_bounds = np.flatnonzero(codes_s[1:] != codes_s[:-1]) + 1
+    run_bounds = np.flatnonzero((codes_s[1:] != codes_s[:-1]) | (keys_s[1:] < keys_s[:-1])) + 1
+
+    order = []
+    for start, end in zip(np.r_[0, sensor_bounds], np.r_[sensor_bounds, len(df)]):
+        bounds = run_bounds[(run_bounds > start) & (run_bounds < end)]
+        if len(bounds) + 1 > MAX_RUNS:
+            order.append(by_sensor[start:end][np.argsort(keys_s[start:end], kind="stable")])
+            continue
+        runs = [(keys_s[a:b], by_sensor[a:b]) for a, b in zip(np.r_[start, bounds], np.r_[bounds, end])]
+        order.append(_merge_runs(runs)[1])
+    order = np.concatenate(order)
+    result = df.iloc[order]
+
+    if drop_duplicates:
+        codes_m, keys_m = codes[order], keys[order]
+        tie = (codes_m[1:] == codes_m[:-1]) & (keys_m[1:] == keys_m[:-1])
+        in_tie = np.zeros(len(order), dtype=bool)
+        in_tie[1:] |= tie
+        in_tie[:-1] |= tie
+        if in_tie.any():
+            # Only rows sharing a timestamp with a neighbour can be duplicates
+            tied = np.flatnonzero(in_tie)
+            duplicated = np.zeros(len(order), dtype=bool)
+            duplicated[tied] = result.iloc[tied].duplicated().to_numpy()
+            result = result.iloc[~duplicated]
+    return result
@@ -0,0 +1,159 @@
+import os
+import json
+import pandas as pd
+from tools.get_config import AppConfig
+from tools.schema import LIBRARY_COLUMNS, apply_schema, concat_library, library_timestamps
+from tools.timestamps import overlaps
+
+MANIFEST_VERSION = 1
+
+def partition_folder(path: str) -> str:
+    """Folder of the partition files of a partitioned library, next to its manifest (all_data.json -> all_data/)."""
+    return os.path.splitext(path)[0]
+
+class PartitionedLibrary:
+    """
+    Data library stored as one csv file per sensor and year (all_data/FGV_01/2024.csv) and a manifest (all_data.json)
+    listing every partition with its row count and oldest/latest entry. New data only rewrites the partitions it touches,
+    Power BI can read the folder directly. Written partitions are staged next to the existing ones and only replace them
+    on commit(), followed by the manifest, so an aborted run leaves the library untouched after rollback().
+    """
+    def __init__(self, path: str, config: AppConfig):
+        self.path = path
+        self.folder = partition_folder(path)
+        self.__config = config
+        self.partitions = {}
+        self.columns = None
+        self.__staged = []
+        self.__removed = []
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"{_("Nicht unterstützte Version der Bibliothek")}: {path}")
+            self.partitions = manifest["partitions"]
+            self.columns = manifest["columns"]
+
+    @staticmethod
+    def key(sensor: str, year: int) -> str:
+        return f"{sensor}/{int(year)}"
+
+    def keys(self) -> list[str]:
+        """Partition keys ordered like the sorted library, by sensor and by year in the configured order."""
+        ascending = self.__config.sort_ascending_active
+        return sorted(self.partitions, key=lambda k: (self.partitions[k]["sensor"], self.partitions[k]["year"] * (1 if ascending else -1)))
+
+    def file_of(self, key: str) -> str:
+        return os.path.join(self.folder, self.partitions[key]["file"])
+
+    def read_partition(self, key: str, columns: list[str] | None = None) -> pd.DataFrame:
+        df = pd.read_csv(self.file_of(key), usecols=columns)
+        return apply_schema(df) if columns is None else df
+
+    def iter_partitions(self, columns: list[str] | None = None):
+        for key in self.keys():
+            yield self.read_partition(key, columns)
+
+    def keys_in_range(self, sensors: list[str] | None, start: pd.Timestamp | None, end: pd.Timestamp | None) -> list[str]:
+        """Keys of the partitions that may hold readings of sensors from start to end, selected by the manifest without reading them."""
+        return [key for key in self.keys()
+                if (sensors is None or self.partitions[key]["sensor"] in sensors)
+                and overlaps(self.partitions[key]["oldest"], self.partitions[key]["latest"], start, end)]
+
+    def read(self, columns: list[str] | None = None) -> pd.DataFrame:
+        """Read all partitions into one frame."""
+        frames = list(self.iter_partitions(columns))
+        if not frames:
+            empty = pd.DataFrame(columns=columns or self.columns or LIBRARY_COLUMNS)
+            return apply_schema(empty) if columns is None else empty
+        return concat_library(frames) if columns is None else pd.concat(frames, ignore_index=True)
+
+    def write_partition(self, sensor: str, year: int, df: pd.DataFrame):
+        """Stage the complete rows of a partition, it replaces the existing partition on commit()."""
+        from tools.library import CsvStreamWriter
+        key = self.key(sensor, year)
+        file = f"{sensor}/{int(year)}.csv"
+        os.makedirs(os.path.join(self.folder, sensor), exist_ok=True)
+        staged = os.path.join(self.folder, file) + ".new"
+        with CsvStreamWriter(staged, list(df.columns), self.__config.write_chunk_rows) as writer:
+            writer.write_frame(df)
+        self.__staged.append((staged, os.path.join(self.folder, file)))
+        self.columns = list(df.columns)
+        datum = library_timestamps(df["Datum"])
+        self.partitions[key] = {
+            "sensor": sensor,
+            "year": int(year),
+            "file": file,
+            "rows": int(df.shape[0]),
+            "oldest": str(datum.min()),
+            "latest": str(datum.max())
+        }
+
+    def remove_partition(self, key: str):
+        """Remove a partition from the manifest, its file is deleted on commit()."""
+        entry = self.partitions.pop(key)
+        self.__removed.append(os.path.join(self.folder, entry["file"]))
+
+    def write(self, df: pd.DataFrame):
+        """Replace the whole library by df, partitions not in df any more are removed."""
+        try:
+            written = set()
+            for (sensor, year), rows in df.groupby(["Sensor", "Jahr"], sort=False, observed=True):
+                self.write_partition(sensor, year, rows)
+                written.add(self.key(sensor, year))
+            for key in set(self.partitions) - written:
+                self.remove_partition(key)
+            self.columns = list(df.columns)
+            self.commit()
+        except BaseException:
+            self.rollback()
+            raise
+
+    def commit(self):
+        """Move all staged partitions in place, delete removed ones and save the manifest."""
+        for staged, path in self.__staged:
+            os.replace(staged, path)
+        for path in self.__removed:
+            if os.path.exists(path): os.remove(path)
+        self.__staged, self.__removed = [], []
+        self.save()
+
+    def rollback(self):
+        """Discard all staged partitions, the partition files and the manifest on disk stay as they were."""
+        for staged, _path in self.__staged:
+            if os.path.exists(staged): os.remove(staged)
+        self.__staged, self.__removed = [], []
+
+    def save(self):
+        manifest = {"version": MANIFEST_VERSION, "columns": self.columns, "partitions": self.partitions}
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(self.path + ".tmp", self.path)
+
+    @property
+    def rows(self) -> int:
+        return sum(entry["rows"] for entry in self.partitions.values())
+
+    def latest(self) -> dict[str, pd.Timestamp]:
+        """Newest entry of every sensor from the manifest, without reading any partition."""
+        latest = {}
+        for entry in self.partitions.values():
+            newest = pd.Timestamp(entry["latest"])
+            if entry["sensor"] not in latest or newest > latest[entry["sensor"]]:
+                latest[entry["sensor"]] = newest
+        return latest
+
+    def export_csv(self, path: str, log=None):
+        """
+        Materialize the library as a single csv file. The partition files are copied byte by byte without parsing,
+        only their header lines are skipped.
+        """
+        from tools.library import CsvStreamWriter
+        with CsvStreamWriter(path, self.columns, self.__config.write_chunk_rows, log) as writer:
+            for done, key in enumerate(self.keys(), start=1):
+                with open(self.file_of(key), "rb") as src:
+                    src.readline()
+                    while buf := src.read(1 << 20):
+                        writer.write_bytes(buf)
+                writer.rows_written += self.partitions[key]["rows"]
+                if log is not None: log(f"{_("Exportiert")}: {done}/{len(self.partitions)} {_("Partitionen")}, {writer.rows_written} {_("Zeilen")}")
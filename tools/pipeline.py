@@ -0,0 +1,96 @@
+import queue
+import threading
+
+# Marks the end of the items in a queue
+_END = object()
+# Seconds between two checks whether the pipeline was stopped while waiting for a queue
+_POLL = 0.1
+
+class Stage:
+    """
+    Step of a Pipeline. func(item) returns the items passed on to the next stage, e.g. [item] or [] to drop it.
+    workers threads run func concurrently, stages keeping state between items need workers=1.
+    """
+    def __init__(self, name: str, func, workers: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+class Pipeline:
+    """
+    Run stages in threads connected by queues of at most queue_size items, so the stages work on different items
+    at the same time and at most queue_size items wait between two stages. The first exception raised by a stage
+    stops all stages and is raised again by run(), with its original type.
+    """
+    def __init__(self, stages: list[Stage], queue_size: int = 4):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+
+    def run(self, source) -> list:
+        """Feed the items of source through all stages and return the items of the last stage in their order of completion."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _i in range(len(self.stages) + 1)]
+        stop = threading.Event()
+        errors = []
+        threads = [threading.Thread(target=self.__feed, args=(source, queues[0], stop, errors), daemon=True)]
+        for k, stage in enumerate(self.stages):
+            running = [stage.workers]
+            lock = threading.Lock()
+            for _w in range(stage.workers):
+                threads.append(threading.Thread(target=self.__work, args=(stage, queues[k], queues[k+1], stop, errors, running, lock),
+                                                name=f"pipeline-{stage.name}", daemon=True))
+        for thread in threads: thread.start()
+        results = []
+        try:
+            while True:
+                item = self.__get(queues[-1], stop)
+                if errors: raise errors[0]
+                if item is _END: break
+                results.append(item)
+        finally:
+            stop.set()
+            for thread in threads: thread.join()
+        return results
+
+    @staticmethod
+    def __put(q: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def __get(q: queue.Queue, stop: threading.Event):
+        while not stop.is_set():
+            try: return q.get(timeout=_POLL)
+            except queue.Empty: continue
+        return _END
+
+    def __feed(self, source, out: queue.Queue, stop: threading.Event, errors: list):
+        try:
+            for item in source:
+                if not self.__put(out, item, stop): return
+            self.__put(out, _END, stop)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def __work(self, stage: Stage, src: queue.Queue, out: queue.Queue, stop: threading.Event, errors: list, running: list, lock: threading.Lock):
+        try:
+            while True:
+                item = self.__get(src, stop)
+                if item is _END:
+                    try: src.put_nowait(_END) # For the other workers of the stage
+                    except queue.Full: pass # Only when stopped, the stage ends anyway
+                    break
+                for result in stage.func(item):
+                    if not self.__put(out, result, stop): return
+            with lock:
+                running[0] -= 1
+                last = running[0] == 0
+            if last: self.__put(out, _END, stop)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
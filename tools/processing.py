@@ -1,17 +1,80 @@
 import pandas as pd 
+import numpy as np
+import os
 import time
 import glob
-import re
+import multiprocessing
+import tempfile
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 from tools.get_config import AppConfig
+from tools.cache import FileCache
+from tools.memory import peak_memory_mb
+from tools.events import StageEvent, EventFile
+from tools.xlsx import read_xlsx, resolve_engine
+from tools.timestamps import parse_timestamps, unparseable_rows
+from tools.schema import apply_schema, concat_library, frame_size_mb, library_timestamps, LIBRARY_COLUMNS
+from tools.merge import merge_sorted_runs
+from tools.keys import KeyIndex, duplicated_readings, conflicting_readings
+from tools.partitions import PartitionedLibrary
+from tools.database import SqliteLibrary
+from tools.rollups import Rollups
+from tools.ledger import IngestionLedger
+from tools.deltas import DeltaLog
+from tools.pipeline import Pipeline, Stage
+from tools.external import ExternalMerge, SEQ, chunk_rows_for_budget
+from tools.library import library_format, library_compression, read_library, iter_library, iter_library_range, write_library, read_library_index, read_csv_block, CsvStreamWriter, IndexedCsvWriter
 
 class DataHandler:
     def __init__(self, log_queue, config: AppConfig):
         self.log_queue = log_queue
         self.__config = config
+        self.__cache = None
+        if config.cache_enabled:
+            self.__cache = FileCache(config.cache_path, config.cache_max_size_mb, config.cache_key)
+            if config.clear_cache: self.__cache.clear()
+        self.__events = EventFile(config.events_file) if config.events_file is not None else None
+        self.__ledger = None # Ledger of the library the running append merges into
+        self.__delta = None # Rows added by the running append, written as delta once it finished
+        self.__newRows = None # New files combined for the delta already, reused by the append
+        self.cancel_token = None # Set by the GUI to cancel a running job, see tools.jobs
 
     def log(self, msg):
         self.log_queue.put(msg)
 
+    def emit(self, event: StageEvent):
+        """Put a structured event into the log queue and write it to the events file if configured."""
+        self.log_queue.put(event)
+        if self.__events is not None: self.__events.write(event)
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the running job was cancelled, checked between files and stages."""
+        if self.cancel_token is not None: self.cancel_token.check()
+
+    @contextmanager
+    def stage(self, name: str, cancellable=True):
+        """
+        Emit start and end events of a processing stage, rows can be set on the yielded end event.
+        Stages after the library was saved are not cancellable, the saved library can not be rolled back anymore.
+        """
+        if cancellable: self.check_cancelled()
+        end = StageEvent("end", name)
+        self.emit(StageEvent("start", name))
+        stime = time.perf_counter()
+        try:
+            yield end
+        except BaseException:
+            self.emit(StageEvent("failed", name, duration=time.perf_counter()-stime))
+            raise
+        end.time = time.time()
+        end.duration = time.perf_counter() - stime
+        end.memory_mb = peak_memory_mb()
+        self.emit(end)
+
+    def progress(self, stage: str, done: int, total: int):
+        self.emit(StageEvent("progress", stage, done=done, total=total))
+        self.check_cancelled()
+
     def simulate_process(self, duration):
         self.log("Starting process...")
         time.sleep(duration)
@@ -26,68 +89,162 @@ class DataHandler:
             drop_duplicates=False,
             round_temperatures=True
             ) -> None | pd.DataFrame :
-        """Concatenate all given csv files collected from sensors into new ones."""
-        if type(path_to_files) is list: 
-            data_paths = path_to_files
-        else:
-            data_paths = glob.glob(path_to_files+self.__config.file_search_pattern, recursive=True)
-            self.log(f"{len(data_paths)} {_("Datei(en) gefunden")}")
+        """
+        Concatenate all given csv files collected from sensors into new ones.
+        The files run through stages connected by bounded queues (see tools.pipeline): decoding the workbooks,
+        transforming them into the library format, merging the files of every sensor and the output. Reading the next
+        file overlaps with transforming and writing the previous ones, csv libraries are written sensor by sensor.
+        """
+        data_paths = self.__findFiles(path_to_files)
 
-        sensors_chunks = {}
-        
+        jobs = []
         for file in data_paths:
-            try: sensor_name = re.search(self.__config.sensor_name_pattern, file).group()
-            except Exception as e:
-                self.log(f"{_("Fehler beim Lesen von")} {file}: {e}. {_("Stellen Sie sicher, dass alle Dateien der neuen Sensordaten beginnen mit")} 'FGV_[sensorid]'")
-            if sensor_name not in sensors_chunks.keys():
-                sensors_chunks[sensor_name] = []
+            sensor_name = self.__config.sensor_name(file)
+            if sensor_name is None:
+                self.log(f"{_("Fehler beim Lesen von")} {file}. {_("Stellen Sie sicher, dass alle Dateien der neuen Sensordaten beginnen mit")} 'FGV_[sensorid]'")
             if not sensor_name in self.__config.sensors:
                 raise(NameError(f"{_("Versuche Sensor")} {sensor_name} {_("zu lesen der nicht in sensors.toml definiert wurde. Bitte fügen Sie den neuen Sensor hinzu.")}"))
-            else: self.log(f"{_("Lese Daten für Sensor")} {sensor_name}")
-            df = pd.read_excel(file)
-
-            idxcol, timecol, tmpcol = None, None, None
-            for col in df.columns:
-                if self.__config.index in col:
-                    idxcol = col
-                elif self.__config.timestamp in col:
-                    timecol = col
-                elif self.__config.temperature in col:
-                    tmpcol = col
-                else: raise(IndexError(f"{_("Nicht bekannte Spalte in Daten gefunden")}: {col}"))
-
-            if sort and save_path is not None:
-                df[timecol] = pd.to_datetime(df[timecol], format=self.__config.time_format)
-                df.sort_values(timecol, ascending=self.__config.sort_ascending_active, inplace=True)
-            df.dropna()
-            if drop_duplicates: df.drop_duplicates(inplace=True)
-            df = self.__transformSensorFile({"df": df, "idxcol": idxcol, "timecol": timecol, "tmpcol": tmpcol}, sensor_name, datetime_col=True)["df"]
-            sensors_chunks[sensor_name].append(df)
-
-        if save_path is not None: self.log(f"{_("Kombiniere")}...")
-
-        # Use topmost entry
-        searchfunc = lambda x: x["Datum"].iloc[0]
-
-        for key in sensors_chunks.keys():
-            if sort and save_path is not None: 
-                # Sort chunks after newest newest entry
-                sensors_chunks[key].sort(key=searchfunc, reverse=not self.__config.sort_ascending_active) # Newest at top
-            sensors_chunks[key] = pd.concat(sensors_chunks[key])
-
-        all_sensors_chunks = [sensors_chunks[key] for key in sensors_chunks.keys()]
-        all_sensors_chunks = pd.concat(all_sensors_chunks)
+            jobs.append((file, sensor_name))
+
+        sort_files = sort and save_path is not None
+        # Sensors are merged and written one after another, sorted by name like the sorted library
+        sensor_order = list(dict.fromkeys(sensor_name for _file, sensor_name in jobs))
+        if sort_files: sensor_order.sort()
+        rank = {sensor_name: r for r, sensor_name in enumerate(sensor_order)}
+        jobs = sorted(jobs, key=lambda job: rank[job[1]])
+
+        items = [{"file": file, "sensor": sensor_name, "position": i, "df": None, "key": None} for i, (file, sensor_name) in enumerate(jobs)]
+        if self.__cache is not None:
+            for item in items:
+                item["key"] = self.__cache.key(item["file"], self.__readSettings(item["sensor"], sort_files, drop_duplicates))
+                item["df"] = self.__cache.get(item["key"])
+            cached = sum(item["df"] is not None for item in items)
+            if cached > 0: self.log(f"{cached} {_("Datei(en) aus dem Cache geladen")}")
+
+        for item in items: item["cached"] = item["df"] is not None
+        pending = sum(not item["cached"] for item in items)
+        workers = min(self.__config.workers, pending)
+        if pending and resolve_engine(self.__config.xlsx_engine) != self.__config.xlsx_engine and self.__config.xlsx_engine != "auto":
+            self.log(_("python-calamine ist nicht installiert, Dateien werden mit dem Standard-Leser gelesen"))
 
+        streaming = save_path is not None and library_format(save_path) == "csv"
+        indexed = sort and (self.__config.incremental or self.__config.query_index) and library_compression(save_path or "") is None
+        writer = None
+        keys = None
+        if streaming:
+            if indexed:
+                writer = IndexedCsvWriter(save_path, LIBRARY_COLUMNS, self.__config.sort_ascending_active, self.__config.write_chunk_rows, self.log)
+            else:
+                writer = CsvStreamWriter(save_path, LIBRARY_COLUMNS, self.__config.write_chunk_rows, self.log)
+            if self.__config.duplicate_key == "reading" and self.__config.save_keys: keys = KeyIndex()
+
+        expected = {sensor_name: 0 for sensor_name in sensor_order}
+        for _file, sensor_name in jobs: expected[sensor_name] += 1
+        merging = {sensor_name: {} for sensor_name in sensor_order}
+        state = {"next": 0, "done": len(items) - pending, "rows": 0}
+        executor = None
+
+        def decode(item):
+            if item["df"] is None:
+                self.log(f"{_("Lese Daten für Sensor")} {item["sensor"]}")
+                args = (item["file"], self.__config.xlsx_engine, self.__config.temperature, self.__config.timestamp)
+                item["raw"] = executor.submit(read_xlsx, *args).result() if executor is not None else read_xlsx(*args)
+            return [item]
+
+        def transform(item):
+            if item["df"] is None:
+                item["df"] = self.__transformDecodedFile(item.pop("raw"), item["sensor"], sort_files, drop_duplicates)
+                if self.__cache is not None: self.__cache.put(item["key"], item["df"])
+            return [item]
+
+        def merge(item):
+            # Files of a sensor are combined in the given order once all of them arrived
+            df = item["df"]
+            self.__reportUnparseable(item["file"], df)
+            if self.__ledger is not None: self.__ledger.record(item["file"], item["sensor"], df)
+            merging[item["sensor"]][item["position"]] = df
+            state["rows"] += df.shape[0]
+            if not item["cached"]:
+                state["done"] += 1
+                self.progress("read_files", state["done"], len(items))
+            blocks = []
+            while state["next"] < len(sensor_order) and len(merging[sensor_order[state["next"]]]) == expected[sensor_order[state["next"]]]:
+                sensor_name = sensor_order[state["next"]]
+                frames = merging.pop(sensor_name)
+                blocks.append((sensor_name, self.__combineSensor([frames[p] for p in sorted(frames)], save_path is not None, sort, drop_duplicates, round_temperatures)))
+                state["next"] += 1
+            return blocks
+
+        def output(block):
+            sensor_name, df = block
+            if writer is None: return [df]
+            if df.empty: return [0]
+            if indexed: writer.write_block(sensor_name, df)
+            else: writer.write_frame(df)
+            if keys is not None: keys.add(keys.keys_of(df), df["Temperatur"].to_numpy(dtype=np.float32))
+            return [df.shape[0]]
+
+        pipeline = Pipeline([
+            Stage("decode", decode, max(workers, 1)),
+            Stage("transform", transform, self.__config.transform_workers),
+            Stage("merge", merge),
+            Stage("output", output)
+        ], self.__config.pipeline_queue_size)
+        try:
+            with self.stage("read_files") as st:
+                self.progress("read_files", len(items) - pending, len(items))
+                if workers > 1:
+                    self.log(f"{_("Lese Dateien parallel mit")} {workers} {_("Prozessen")}...")
+                    # Spawn like on Windows, forking the multi-threaded GUI process is not safe
+                    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=self.__config.install_language)
+                try:
+                    outputs = pipeline.run(items)
+                finally:
+                    if executor is not None: executor.shutdown(wait=True, cancel_futures=True)
+                st.rows = state["rows"]
+            if writer is not None:
+                self.log(f"{_("Fertig. Speichern")}...")
+                with self.stage("save") as st:
+                    writer.close()
+                    if keys is not None: keys.save(save_path)
+                    st.rows = sum(outputs)
+        except BaseException:
+            if writer is not None: writer.abort()
+            raise
+        if writer is not None:
+            self.__updateRollups(save_path)
+            return
+
+        with self.stage("combine") as st:
+            all_sensors_chunks = concat_library(outputs)
+            st.rows = all_sensors_chunks.shape[0]
         if save_path is not None:
-            if round_temperatures: 
-                self.log(_("Sensorwerte Runden")+"...")
-                all_sensors_chunks["Temperatur"] = all_sensors_chunks["Temperatur"].round(self.__config.decimal_points)
             self.log(f"{_("Fertig. Speichern")}...")
-            with open(save_path, "w") as f:
-                all_sensors_chunks.to_csv(f, index=False)
+            with self.stage("save") as st:
+                write_library(all_sensors_chunks, save_path, self.__config, index=indexed, log=self.log)
+                self.__saveKeys(all_sensors_chunks, save_path)
+                st.rows = all_sensors_chunks.shape[0]
+            self.__updateRollups(save_path, full=all_sensors_chunks)
 
         else: return all_sensors_chunks
 
+    def __combineSensor(self, frames: list[pd.DataFrame], finalize: bool, sort: bool, drop_duplicates: bool, round_temperatures: bool) -> pd.DataFrame:
+        """
+        Combine the files of one sensor in their given order. With finalize the rows are merged, rounded and
+        deduplicated like the saved library, sensors are independent of each other for all of these steps.
+        """
+        df = concat_library(frames)
+        if not finalize: return df
+        if sort:
+            # Every file is sorted already, duplicates are dropped while merging them
+            df = merge_sorted_runs(df, self.__config.sort_ascending_active, drop_duplicates and self.__config.duplicate_key == "row")
+        if round_temperatures:
+            df["Temperatur"] = df["Temperatur"].round(self.__config.decimal_points)
+        if drop_duplicates and self.__config.duplicate_key == "reading":
+            df = df.dropna()
+            df = self.__dropDuplicateReadings(df, df.shape[0])
+        return df
+
     def append_sensor_files(
             self, 
             path_to_files: str | list[str] | None, 
@@ -95,33 +252,113 @@ class DataHandler:
             old_file=None,
             sort=True,
             drop_duplicates=True,
-            round_temperatures=True
+            round_temperatures=True,
+            reingest: bool | list[str] = False,
+            delta: bool | None = None
             ):
-        """Concatenate an existing file (old_file, optional) with new ones and save under save_path."""
+        """
+        Concatenate an existing file (old_file, optional) with new ones and save under save_path.
+        Files in the ledger of old_file are skipped, unless reingest is True or lists them.
+        With delta (default: [deltas] write) the rows added to the library are also written to a delta file (see tools.deltas).
+        """
         stime = time.perf_counter()
+        self.emit(StageEvent("start", "append"))
+        # State of an earlier run is dropped, also if it failed before writing it
+        self.__ledger, self.__delta, self.__newRows = None, None, None
+        try:
+            self.__appendFiles(stime, path_to_files, save_path, old_file, sort, drop_duplicates, round_temperatures, reingest, delta)
+        except BaseException:
+            self.emit(StageEvent("failed", "append", duration=time.perf_counter()-stime))
+            raise
+        finally:
+            self.__ledger, self.__delta, self.__newRows = None, None, None
+
+    def __appendFiles(self, stime: float, path_to_files, save_path: str, old_file, sort: bool, drop_duplicates: bool, round_temperatures: bool, reingest, delta):
+        if self.__config.skip_known_files:
+            self.__ledger = IngestionLedger(old_file)
+            if self.__ledger.outdated:
+                self.log(_("Die Bibliothek wurde seit dem letzten Import verändert, bekannte Dateien werden erneut zusammengeführt."))
+            if path_to_files is not None:
+                path_to_files = self.__skipKnownFiles(path_to_files, reingest)
+                if path_to_files is None and old_file is not None and os.path.abspath(old_file) == os.path.abspath(save_path):
+                    self.log(_("Keine neuen Dateien, die Bibliothek bleibt unverändert."))
+                    self.__logFinished(stime, save_path)
+                    return
+        if (self.__config.write_deltas if delta is None else delta) and path_to_files is not None:
+            if old_file is not None:
+                self.__delta = [self.__addedRows(path_to_files, old_file, save_path, sort, drop_duplicates, round_temperatures)]
+            else:
+                self.__delta = iter_library_range(save_path, self.__config) # All rows of the new library, read once it is written
+        incremental = sort and self.__config.incremental
+        index = sort and (incremental or self.__config.query_index)
+        if (incremental and old_file is not None and path_to_files is not None 
+            and library_format(old_file) == "csv" and library_format(save_path) == "csv"
+            and library_compression(save_path) is None
+            and self.__appendIncremental(path_to_files, save_path, old_file, drop_duplicates, round_temperatures)):
+            self.__logFinished(stime, save_path)
+            return
+        if library_format(save_path) == "sqlite" and (old_file is not None or path_to_files is not None):
+            self.__appendSqlite(path_to_files, save_path, old_file, drop_duplicates, round_temperatures)
+            self.__logFinished(stime, save_path)
+            return
+        if (library_format(save_path) == "partitioned" and old_file is not None and path_to_files is not None
+            and os.path.abspath(old_file) == os.path.abspath(save_path)):
+            self.__appendPartitioned(path_to_files, save_path, sort, drop_duplicates, round_temperatures)
+            self.__logFinished(stime, save_path)
+            return
+        if sort and old_file is not None and self.__config.memory_budget_mb > 0 and library_format(save_path) == "csv":
+            self.__appendExternal(path_to_files, save_path, old_file, drop_duplicates, round_temperatures, index)
+            self.__logFinished(stime, save_path)
+            return
         if old_file is not None:
             self.log(_("Lese existierende Bibliothek")+"...")
-            base = pd.read_csv(old_file)
+            with self.stage("read_library") as st:
+                base = read_library(old_file, self.__config)
+                if drop_duplicates: base.dropna(inplace=True)
+                st.rows = base.shape[0]
+            new_rows = 0
+            new = None
             if path_to_files is not None:
                 self.log(f"{_("Fertig")} ({time.perf_counter()-stime:.2f}s). {_("Kombiniere")} {_("neue Dateien")}...")
-                new = self.concat_sensor_files(path_to_files=path_to_files)
+                new = self.__combineNew(path_to_files)
+                if drop_duplicates: new.dropna(inplace=True)
+                new_rows = new.shape[0]
                 self.log(f"{_("Fertig")} ({time.perf_counter()-stime:.2f}s). {_("Kombiniere")}...")
-                base = pd.concat([new, base])
-            if drop_duplicates:
+                with self.stage("combine") as st:
+                    base = concat_library([new, base])
+                    st.rows = base.shape[0]
+            self.log(f"{_("Daten im Speicher")}: {frame_size_mb(base):.1f} MB")
+            if round_temperatures:
+                # Round first, so new readings match the already rounded readings of the library
+                self.log(_("Sensorwerte Runden")+"...")
+                with self.stage("round"):
+                    base["Temperatur"] = base["Temperatur"].round(self.__config.decimal_points)
+            drop_rows = drop_duplicates and self.__config.duplicate_key == "row"
+            if drop_duplicates and not drop_rows:
                 self.log(f"{_("Eliminiere Duplikate")}...")
-                base.dropna(inplace=True)
-                base.drop_duplicates(inplace=True)
+                with self.stage("deduplicate") as st:
+                    base = self.__dropDuplicateReadings(base, new_rows)
+                    st.rows = base.shape[0]
             if sort:
+                # Library and new files are sorted runs per sensor, duplicates are dropped while merging them
                 self.log(_("Sortiere")+"...")
-                base["Datum"] = pd.to_datetime(base["Datum"], format=self.__config.time_format)
-                base_sorted = base.sort_values(by=["Sensor", "Datum"], ascending=[True, self.__config.sort_ascending_active])
-                base = base_sorted
-            if round_temperatures:
-                self.log(_("Sensorwerte Runden")+"...")
-                base["Temperatur"] = base["Temperatur"].round(self.__config.decimal_points)
+                with self.stage("sort") as st:
+                    base = merge_sorted_runs(base, self.__config.sort_ascending_active, drop_rows)
+                    st.rows = base.shape[0]
+            elif drop_rows:
+                self.log(f"{_("Eliminiere Duplikate")}...")
+                with self.stage("deduplicate") as st:
+                    base.drop_duplicates(inplace=True)
+                    st.rows = base.shape[0]
             self.log(f"{_("Fertig")} ({time.perf_counter()-stime:.2f}s). {_("Speichern")}...")
-            with open(save_path, "w") as f:
-                base.to_csv(f, index=False)
+            with self.stage("save") as st:
+                write_library(base, save_path, self.__config, index=index, log=self.log)
+                self.__saveKeys(base, save_path)
+                st.rows = base.shape[0]
+            if new is not None and os.path.abspath(old_file) == os.path.abspath(save_path):
+                self.__updateRollups(save_path, full=base, replaced=[(base, new)])
+            else:
+                self.__updateRollups(save_path, full=base)
         else: 
             self.log(_("Kombiniere")+" "+_("Dateien")+"...")
             self.concat_sensor_files(
@@ -132,35 +369,592 @@ class DataHandler:
                 round_temperatures=round_temperatures
                 )
 
-        self.log(f"{_("Verarbeitung fertig. Dauer")}: {time.perf_counter()-stime:.2f}s")
+        self.__logFinished(stime, save_path)
+
+    def __logFinished(self, stime: float, save_path: str):
+        if self.__ledger is not None:
+            # Only a successful run records its files, a cancelled or failed one is merged again next time
+            self.__ledger.save(save_path)
+            self.__ledger = None
+        if self.__delta is not None:
+            with self.stage("delta", cancellable=False) as st:
+                entry = DeltaLog(save_path).write(self.__delta, self.__config, self.log)
+                st.rows = entry["rows"] if entry is not None else 0
+            self.__delta = None
+            if entry is None: self.log(_("Keine neuen Zeilen, es wurde keine Delta-Datei geschrieben."))
+            else: self.log(f"{_("Delta gespeichert")}: {entry["file"]} ({entry["rows"]} {_("Zeilen")}, Watermark {entry["watermark"]})")
+        duration = time.perf_counter() - stime
+        self.log(f"{_("Verarbeitung fertig. Dauer")}: {duration:.2f}s")
+        peak = peak_memory_mb()
+        if peak is not None: self.log(f"{_("Maximaler Speicherverbrauch")}: {peak:.0f} MB")
+        self.emit(StageEvent("end", "append", duration=duration, memory_mb=peak))
         self.log("CONCAT_COMPLETED")
 
+    def __combineNew(self, path_to_files: str | list[str]) -> pd.DataFrame:
+        """New files combined into one frame, taken from the delta export if it read them already."""
+        new, self.__newRows = self.__newRows, None
+        return new if new is not None else self.concat_sensor_files(path_to_files=path_to_files)
+
+    def __addedRows(self, path_to_files: str | list[str], old_file: str, save_path: str, sort: bool, drop_duplicates: bool, round_temperatures: bool) -> pd.DataFrame:
+        """
+        Rows of the new files that the append adds to old_file, following the duplicate settings like the append itself.
+        Only the sensors and time range of the new rows are read from the library (see iter_library_range), or nothing
+        at all if the keys of its readings are saved.
+        """
+        self.__newRows = self.concat_sensor_files(path_to_files=path_to_files)
+        rows = self.__newRows.copy()
+        with self.stage("delta") as st:
+            if round_temperatures: rows["Temperatur"] = rows["Temperatur"].round(self.__config.decimal_points)
+            readings = library_format(save_path) == "sqlite" or (drop_duplicates and self.__config.duplicate_key == "reading")
+            if drop_duplicates: rows = rows.dropna()
+            if readings:
+                rows = rows[~duplicated_readings(KeyIndex().keys_of(rows), self.__config.duplicate_conflicts)]
+            elif drop_duplicates:
+                rows = rows.drop_duplicates()
+            if (readings or drop_duplicates) and not rows.empty:
+                known_keys = KeyIndex.load(old_file) if readings and self.__config.save_keys else None
+                old = None
+                if known_keys is None:
+                    datum = rows["Datum"].dropna()
+                    start, end = (datum.min(), datum.max() + pd.Timedelta(1)) if not datum.empty else (None, None)
+                    old = list(iter_library_range(old_file, self.__config, list(rows["Sensor"].astype(str).unique()), start=start, end=end))
+                    old = concat_library(old) if old else rows.iloc[:0]
+                    if round_temperatures: old = old.assign(Temperatur=old["Temperatur"].round(self.__config.decimal_points))
+                if readings:
+                    rows = rows[~self.__knownReadings(rows, known_keys if known_keys is not None else KeyIndex.from_frame(old))[0]]
+                else:
+                    columns = ["Temperatur", "Datum", "Sensor", "Standort"]
+                    known = rows[columns].astype({"Sensor": str, "Standort": str}).merge(
+                        old[columns].astype({"Sensor": str, "Standort": str}).drop_duplicates(), how="left", indicator=True)
+                    rows = rows[(known["_merge"] != "both").to_numpy()]
+            if sort:
+                rows = rows.sort_values(["Sensor", "Datum"], ascending=[True, self.__config.sort_ascending_active], kind="stable")
+            st.rows = rows.shape[0]
+        return rows.reset_index(drop=True)
+
+    def __findFiles(self, path_to_files: str | list[str]) -> list[str]:
+        """Given files, or the sensor files found in a folder."""
+        if type(path_to_files) is list:
+            return path_to_files
+        data_paths = glob.glob(path_to_files+self.__config.file_search_pattern, recursive=True)
+        self.log(f"{len(data_paths)} {_("Datei(en) gefunden")}")
+        return data_paths
+
+    def __skipKnownFiles(self, path_to_files: str | list[str], reingest: bool | list[str]) -> list[str] | None:
+        """Files that are not in the ledger yet or are merged again on purpose, None if all files are known."""
+        new_files = []
+        for file in self.__findFiles(path_to_files):
+            sensor_name = self.__config.sensor_name(file)
+            if sensor_name is None or reingest is True or file in (reingest or []):
+                entry = None # Files without sensor name are reported when reading them
+            else:
+                entry = self.__ledger.known(file, sensor_name)
+            if entry is None:
+                new_files.append(file)
+            else:
+                self.log(f"{_("Bereits importiert, übersprungen")}: {file} ({entry["sensor"]}, {entry["oldest"]} - {entry["latest"]})")
+        return new_files if new_files else None
+
+    def __appendIncremental(self, path_to_files: str | list[str], save_path: str, old_file: str, drop_duplicates: bool, round_temperatures: bool) -> bool:
+        """
+        Merge new sensor files into a sorted csv library using its sidecar index. Blocks of sensors without new data 
+        are copied without parsing, blocks that only get newer readings are extended, only overlapping blocks are read.
+        Returns False if the library has no valid index and has to be processed completely.
+        """
+        index = read_library_index(old_file)
+        ascending = self.__config.sort_ascending_active
+        if index is None or index["ascending"] != ascending:
+            self.log(_("Kein gültiger Index für die Bibliothek gefunden, die gesamte Bibliothek wird eingelesen")+"...")
+            return False
+
+        self.log(f"{_("Kombiniere")} {_("neue Dateien")}...")
+        new = self.__combineNew(path_to_files)
+        if round_temperatures:
+            with self.stage("round"):
+                new["Temperatur"] = new["Temperatur"].round(self.__config.decimal_points)
+        known_keys = None
+        drop_readings = drop_duplicates and self.__config.duplicate_key == "reading"
+        if drop_duplicates:
+            with self.stage("deduplicate") as st:
+                new.dropna(inplace=True)
+                if drop_readings:
+                    new = self.__dropDuplicateReadings(new, new.shape[0])
+                    known_keys = KeyIndex.load(old_file) if self.__config.save_keys else None
+                    if known_keys is not None: new = self.__dropKnownReadings(new, known_keys)
+                else:
+                    new.drop_duplicates(inplace=True)
+                st.rows = new.shape[0]
+        new_sensors = {sensor: rows for sensor, rows in new.groupby("Sensor", sort=False, observed=True)}
+
+        columns = index["columns"]
+        writer = IndexedCsvWriter(save_path, columns, ascending, self.__config.write_chunk_rows, self.log)
+        total = len(index["sensors"]) + len(set(new_sensors) - set(index["sensors"]))
+        rollups = {"replaced": [], "added": []}
+        try:
+            self.__mergeBlocks(writer, index, new_sensors, old_file, total, drop_duplicates, drop_readings, rollups)
+            self.log(f"{_("Speichern")}...")
+            with self.stage("save"):
+                writer.close()
+        except BaseException:
+            writer.abort() # The library stays as it was
+            raise
+        if known_keys is not None:
+            known_keys.add(known_keys.keys_of(new), new["Temperatur"].to_numpy())
+            known_keys.save(save_path)
+        if os.path.abspath(old_file) == os.path.abspath(save_path):
+            self.__updateRollups(save_path, **rollups)
+        else:
+            self.__updateRollups(save_path)
+        return True
+
+    def __mergeBlocks(self, writer: IndexedCsvWriter, index: dict, new_sensors: dict, old_file: str, total: int, drop_duplicates: bool, drop_readings: bool, rollups: dict):
+        """
+        Write the blocks of all sensors, untouched blocks are copied and touched ones merged with the new rows.
+        Sensors that are new to the library are written between the existing blocks in sensor order, like a full write.
+        The rows for updating the rollup tables are collected in rollups, see __updateRollups.
+        """
+        ascending = self.__config.sort_ascending_active
+        columns = index["columns"]
+        added = sorted((sensor for sensor in new_sensors if sensor not in index["sensors"]), reverse=True)
+        done = 0
+
+        def write_added(before: str | None):
+            """Write the new sensors that sort before the existing sensor before, all remaining ones for None."""
+            nonlocal done
+            while added and (before is None or added[-1] < before):
+                sensor = added.pop()
+                rows = new_sensors.pop(sensor)
+                done += 1
+                self.progress("merge_blocks", done, total)
+                self.log(f"Sensor {sensor}: {rows.shape[0]} {_("neue Einträge angehängt")}")
+                writer.write_block(sensor, rows.sort_values("Datum", ascending=ascending))
+                rollups["added"].append(rows)
+
+        with self.stage("merge_blocks"):
+            with open(old_file, "rb") as src:
+                for sensor, entry in index["sensors"].items():
+                    write_added(sensor)
+                    done += 1
+                    self.progress("merge_blocks", done, total)
+                    if sensor not in new_sensors:
+                        writer.copy_block(sensor, src, entry)
+                        continue
+                    rows = new_sensors.pop(sensor).sort_values("Datum", ascending=ascending)
+                    if entry["sorted"] and rows["Datum"].min() > pd.Timestamp(entry["latest"]):
+                        # All readings are newer than the library, the existing block stays untouched
+                        self.log(f"Sensor {sensor}: {rows.shape[0]} {_("neue Einträge angehängt")}")
+                        writer.begin(sensor)
+                        if ascending:
+                            writer.copy_rows(src, entry)
+                            writer.write_rows(rows)
+                        else:
+                            writer.write_rows(rows)
+                            writer.copy_rows(src, entry)
+                        writer.end(sorted=True)
+                        rollups["added"].append(rows)
+                    else:
+                        self.log(f"Sensor {sensor}: {_("Überschneidung mit der Bibliothek, Block wird neu geschrieben")}")
+                        block = read_csv_block(src, entry, columns, self.__config)
+                        block = concat_library([rows, block])
+                        if drop_readings: block = self.__dropDuplicateReadings(block, rows.shape[0])
+                        block = merge_sorted_runs(block, ascending, drop_duplicates and not drop_readings)
+                        writer.write_block(sensor, block)
+                        rollups["replaced"].append((block, rows))
+                write_added(None)
+
+    def __appendPartitioned(self, path_to_files: str | list[str], save_path: str, sort: bool, drop_duplicates: bool, round_temperatures: bool):
+        """
+        Merge new sensor files into a partitioned library in place. Only the partitions (sensor and year) that receive
+        new rows are read and rewritten, duplicates always share a partition. The manifest is saved at the end.
+        """
+        library = PartitionedLibrary(save_path, self.__config)
+        self.log(f"{_("Kombiniere")} {_("neue Dateien")}...")
+        new = self.__combineNew(path_to_files)
+        if round_temperatures:
+            with self.stage("round"):
+                new["Temperatur"] = new["Temperatur"].round(self.__config.decimal_points)
+        if drop_duplicates: new.dropna(inplace=True)
+        drop_readings = drop_duplicates and self.__config.duplicate_key == "reading"
+        groups = new.groupby(["Sensor", "Jahr"], sort=True, observed=True)
+        replaced = []
+        try:
+            self.__mergePartitions(library, groups, sort, drop_duplicates, drop_readings, replaced)
+            with self.stage("save"):
+                library.commit()
+        except BaseException:
+            library.rollback() # Partitions are only replaced by commit()
+            raise
+        self.__updateRollups(save_path, replaced=replaced)
+
+    def __mergePartitions(self, library: PartitionedLibrary, groups, sort: bool, drop_duplicates: bool, drop_readings: bool, replaced: list):
+        """Merge the new rows of every touched partition with its existing rows and stage the result, collected in replaced for the rollups."""
+        with self.stage("merge_partitions") as st:
+            for done, ((sensor, year), rows) in enumerate(groups, start=1):
+                self.progress("merge_partitions", done, groups.ngroups)
+                key = library.key(sensor, year)
+                block = rows
+                if key in library.partitions:
+                    block = concat_library([rows, library.read_partition(key)])
+                if drop_readings:
+                    block = self.__dropDuplicateReadings(block, rows.shape[0])
+                if sort:
+                    block = merge_sorted_runs(block, self.__config.sort_ascending_active, drop_duplicates and not drop_readings)
+                elif drop_duplicates and not drop_readings:
+                    block = block.drop_duplicates()
+                self.log(f"Sensor {sensor}, {int(year)}: {block.shape[0]} {_("Zeilen")}")
+                library.write_partition(sensor, year, block)
+                replaced.append((block, rows))
+            st.rows = groups.ngroups
+        self.log(f"{groups.ngroups} {_("von")} {len(library.partitions)} {_("Partitionen neu geschrieben")}")
+
+    def __appendSqlite(self, path_to_files: str | list[str] | None, save_path: str, old_file: str | None, drop_duplicates: bool, round_temperatures: bool):
+        """
+        Upsert new sensor files into a SQLite library. Appending to the same database only inserts the new readings
+        in one transaction, any other library given as old_file is copied into a new database first.
+        Readings are keyed by sensor and timestamp, duplicates are resolved by the configured conflict policy.
+        """
+        same = old_file is not None and os.path.abspath(old_file) == os.path.abspath(save_path)
+        library = SqliteLibrary(save_path if same else save_path + ".tmp", self.__config)
+        if not same:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(library.path + suffix): os.remove(library.path + suffix)
+        try:
+            if old_file is not None and not same:
+                self.log(_("Lese existierende Bibliothek")+"...")
+                with self.stage("read_library") as st:
+                    st.rows = 0
+                    for chunk in iter_library(old_file, self.__config, chunksize=self.__config.write_chunk_rows):
+                        chunk = apply_schema(chunk)
+                        if drop_duplicates: chunk = chunk.dropna()
+                        if round_temperatures: chunk["Temperatur"] = chunk["Temperatur"].round(self.__config.decimal_points)
+                        library.upsert(chunk)
+                        st.rows += chunk.shape[0]
+                        self.check_cancelled()
+            new = None
+            if path_to_files is not None:
+                self.log(f"{_("Kombiniere")} {_("neue Dateien")}...")
+                new = self.__combineNew(path_to_files)
+                if round_temperatures:
+                    with self.stage("round"):
+                        new["Temperatur"] = new["Temperatur"].round(self.__config.decimal_points)
+                if drop_duplicates: new.dropna(inplace=True)
+                with self.stage("deduplicate") as st:
+                    new = self.__dropDuplicateReadings(new, new.shape[0])
+                    st.rows = new.shape[0]
+                self.log(f"{_("Speichern")}...")
+                with self.stage("save") as st:
+                    conflicts = library.upsert(new, self.__config.duplicate_conflicts, lambda done, total: self.progress("save", done, total))
+                    self.__reportConflicts(conflicts)
+                    st.rows = new.shape[0]
+            if not same:
+                for suffix in ("-wal", "-shm"):
+                    if os.path.exists(save_path + suffix): os.remove(save_path + suffix)
+                os.replace(library.path, save_path)
+        except BaseException:
+            if not same and os.path.exists(library.path): os.remove(library.path) # The library stays as it was
+            raise
+        if same and new is not None and self.__config.rollups_enabled:
+            self.__updateRollups(save_path, replaced=self.__touchedReadings(SqliteLibrary(save_path, self.__config), new))
+        else:
+            self.__updateRollups(save_path)
+
+    def __touchedReadings(self, library: SqliteLibrary, new: pd.DataFrame) -> list:
+        """All stored readings of the days touched by new readings per sensor, paired with them for the rollups."""
+        touched = []
+        for sensor, rows in new.groupby("Sensor", sort=False, observed=True):
+            start, end = rows["Datum"].min().floor("D"), rows["Datum"].max().floor("D") + pd.Timedelta(days=1)
+            touched.append((library.read_range(str(sensor), start, end), rows))
+        return touched
+
+    def __updateRollups(self, save_path: str, full: pd.DataFrame | None = None, replaced: list | None = None, added: list | None = None):
+        """
+        Update the rollup tables of a saved library if enabled. replaced holds (rows, new) pairs where rows contains all
+        readings of the time buckets touched by new, added holds new readings that are not part of the tables yet.
+        The tables are computed from full (or by reading the library) if neither is given or they do not exist yet.
+        """
+        if not self.__config.rollups_enabled: return
+        rollups = Rollups(save_path, self.__config)
+        with self.stage("rollups", cancellable=False) as st:
+            if (replaced is not None or added is not None) and rollups.exists():
+                for rows, new in replaced or []: rollups.replace(rows, new)
+                for rows in added or []: rollups.add(rows)
+                st.rows = sum(new.shape[0] for _rows, new in replaced or []) + sum(rows.shape[0] for rows in added or [])
+            else:
+                self.log(_("Berechne Rollup-Tabellen")+"...")
+                rollups.rebuild(full if full is not None else iter_library(save_path, self.__config, columns=["Temperatur", "Datum", "Sensor", "Standort"]))
+            rollups.save()
+
+    def __appendExternal(self, path_to_files: str | list[str] | None, save_path: str, old_file: str, drop_duplicates: bool, round_temperatures: bool, index: bool):
+        """
+        Merge new sensor files into a library within the configured memory budget. The new rows and chunks of the
+        library are sorted and spilled to a temporary folder next to save_path, the sorted runs are merged and written
+        batch by batch. The result is the same as processing the whole library in memory.
+        """
+        budget = self.__config.memory_budget_mb
+        drop_readings = drop_duplicates and self.__config.duplicate_key == "reading"
+        drop_rows = drop_duplicates and not drop_readings
+        sample = next(iter_library(old_file, self.__config, chunksize=10_000), None)
+        chunk_rows = chunk_rows_for_budget(sample, budget) if sample is not None else 100_000
+        self.log(f"{_("Speicherbegrenztes Zusammenführen")} ({budget} MB, {chunk_rows} {_("Zeilen pro Block")})...")
+
+        new_rows = 0
+        if path_to_files is not None:
+            self.log(f"{_("Kombiniere")} {_("neue Dateien")}...")
+            new = self.__combineNew(path_to_files)
+            if drop_duplicates: new.dropna(inplace=True)
+            new_rows = new.shape[0]
+
+        with tempfile.TemporaryDirectory(prefix=".merge_", dir=os.path.dirname(os.path.abspath(save_path))) as folder:
+            merger = ExternalMerge(folder, self.__config.sort_ascending_active, chunk_rows)
+            self.log(_("Lese existierende Bibliothek")+"...")
+            with self.stage("read_library") as st:
+                if new_rows > 0:
+                    for start in range(0, new_rows, chunk_rows):
+                        merger.add(self.__prepareChunk(new.iloc[start:start+chunk_rows], False, round_temperatures), start)
+                    del new
+                for chunk in iter_library(old_file, self.__config, chunksize=chunk_rows):
+                    self.check_cancelled()
+                    chunk = self.__prepareChunk(chunk, drop_duplicates, round_temperatures)
+                    merger.add(chunk, new_rows + merger.rows)
+                st.rows = merger.rows
+            self.log(f"{len(merger.runs)} {_("sortierte Blöcke ausgelagert")}. {_("Speichern")}...")
+
+            if index and library_compression(save_path) is None:
+                writer = IndexedCsvWriter(save_path, LIBRARY_COLUMNS, self.__config.sort_ascending_active, self.__config.write_chunk_rows, self.log)
+            else:
+                writer = CsvStreamWriter(save_path, LIBRARY_COLUMNS, self.__config.write_chunk_rows, self.log)
+            keys, temperatures, block = KeyIndex(), ([], []), {}
+            try:
+                with self.stage("merge_runs") as st:
+                    st.rows = 0
+                    for batch in merger.merge():
+                        self.check_cancelled()
+                        if drop_readings:
+                            order = np.argsort(batch[SEQ].to_numpy(), kind="stable") # New rows first like in memory
+                            duplicated = np.empty(batch.shape[0], dtype=bool)
+                            duplicated[order] = self.__duplicateReadings(batch.iloc[order], int((batch[SEQ] < new_rows).sum()))
+                            batch = batch[~duplicated]
+                        elif drop_rows:
+                            batch = batch[~batch[LIBRARY_COLUMNS].duplicated().to_numpy()]
+                        batch = batch[LIBRARY_COLUMNS]
+                        self.__writeSorted(writer, batch, block)
+                        if drop_readings and self.__config.save_keys:
+                            temperatures[0].append(keys.keys_of(batch))
+                            temperatures[1].append(batch["Temperatur"].to_numpy(dtype=np.float32))
+                        st.rows += batch.shape[0]
+                    if block.get("sensor") is not None: writer.end(sorted=block["sorted"])
+                if drop_readings and merger.rows > st.rows:
+                    self.log(f"{merger.rows - st.rows} {_("doppelte Messwerte entfernt")}")
+                with self.stage("save"):
+                    writer.close()
+            except BaseException:
+                writer.abort() # The library stays as it was
+                raise
+        if drop_readings and self.__config.save_keys:
+            if temperatures[0]: keys.add(np.concatenate(temperatures[0]), np.concatenate(temperatures[1]))
+            keys.save(save_path)
+        self.__updateRollups(save_path)
+
+    def __prepareChunk(self, chunk: pd.DataFrame, dropna: bool, round_temperatures: bool) -> pd.DataFrame:
+        """Convert a chunk of the library to the library schema, drop incomplete rows and round like the in-memory path."""
+        chunk = apply_schema(chunk.copy())
+        if dropna: chunk = chunk.dropna()
+        if round_temperatures: chunk["Temperatur"] = chunk["Temperatur"].round(self.__config.decimal_points)
+        return chunk
+
+    def __writeSorted(self, writer: CsvStreamWriter, batch: pd.DataFrame, block: dict):
+        """
+        Write a sorted batch, indexed libraries get one block per sensor that may span several batches.
+        block holds the sensor and sort state of the open block, it is ended by the next sensor or by end=True.
+        """
+        if not isinstance(writer, IndexedCsvWriter):
+            writer.write_frame(batch)
+            return
+        for sensor, rows in batch.groupby("Sensor", sort=False, observed=True):
+            if block.get("sensor") != sensor:
+                if block.get("sensor") is not None: writer.end(sorted=block["sorted"])
+                writer.begin(sensor)
+                block.update(sensor=sensor, sorted=True)
+            block["sorted"] &= not rows["Datum"].isna().any()
+            writer.write_rows(rows)
+
+    def export_csv(self, path_to_file: str, save_path: str):
+        """Materialize a library as a single csv file, partitioned libraries are copied without parsing, SQLite libraries streamed."""
+        stime = time.perf_counter()
+        with self.stage("save") as st:
+            if library_format(path_to_file) in ("partitioned", "sqlite"):
+                library = PartitionedLibrary(path_to_file, self.__config) if library_format(path_to_file) == "partitioned" else SqliteLibrary(path_to_file, self.__config)
+                library.export_csv(save_path, self.log)
+                st.rows = library.rows
+            else:
+                df = read_library(path_to_file, self.__config)
+                write_library(df, save_path, self.__config, log=self.log)
+                st.rows = df.shape[0]
+        self.log(f"{_("Exportiert nach")} {save_path} ({time.perf_counter()-stime:.2f}s)")
+        self.log("COMPLETED")
+
+    def __dropDuplicateReadings(self, df: pd.DataFrame, new_rows: int) -> pd.DataFrame:
+        """
+        Drop readings with the same sensor and timestamp. The first new_rows rows of df are new, the others come 
+        from the library. Conflicting temperatures are resolved by the configured policy, "first" keeps the library value.
+        """
+        duplicated = self.__duplicateReadings(df, new_rows)
+        if duplicated.any(): self.log(f"{duplicated.sum()} {_("doppelte Messwerte entfernt")}")
+        return df[~duplicated]
+
+    def __duplicateReadings(self, df: pd.DataFrame, new_rows: int) -> np.ndarray:
+        """Mask of the readings dropped by __dropDuplicateReadings, conflicts are reported if configured."""
+        keys = KeyIndex().keys_of(df)
+        order = np.r_[np.arange(new_rows, df.shape[0]), np.arange(new_rows)] # Library rows first
+        if self.__config.duplicate_conflicts == "report":
+            conflicts = conflicting_readings(keys[order], df["Temperatur"].to_numpy()[order])
+            self.__reportConflicts(df.iloc[order[conflicts]])
+        duplicated = np.empty(df.shape[0], dtype=bool)
+        duplicated[order] = duplicated_readings(keys[order], self.__config.duplicate_conflicts)
+        return duplicated
+
+    def __dropKnownReadings(self, new: pd.DataFrame, keys: KeyIndex) -> pd.DataFrame:
+        """Drop new readings whose keys are saved for the library already, without reading the library."""
+        if len(keys.keys) == 0: return new
+        known, conflicts = self.__knownReadings(new, keys)
+        if self.__config.duplicate_conflicts == "report" and conflicts.any():
+            self.__reportConflicts(new[conflicts])
+        if known.any(): self.log(f"{known.sum()} {_("Messwerte sind bereits in der Bibliothek")}")
+        return new[~known]
+
+    def __knownReadings(self, new: pd.DataFrame, keys: KeyIndex) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Masks of the new readings that are in keys already and of those with a different temperature there.
+        Readings with a different temperature replace the library value for conflicts = "last" and are not known then.
+        """
+        pos = keys.lookup(keys.keys_of(new))
+        known = pos >= 0
+        if len(keys.keys) == 0: return known, known.copy()
+        # The key index stores temperatures as float32, new readings are compared at the same precision
+        conflicts = known & (keys.temperatures[np.where(known, pos, 0)] != new["Temperatur"].to_numpy(dtype=np.float32))
+        if self.__config.duplicate_conflicts == "last":
+            known &= ~conflicts # Replace the values in the library
+        return known, conflicts
+
+    def __reportConflicts(self, conflicts: pd.DataFrame):
+        """Log readings with the same sensor and timestamp but different temperatures."""
+        if conflicts.empty: return
+        self.log(f"{conflicts.shape[0]} {_("widersprüchliche Messwerte gefunden")}:")
+        for row in conflicts.head(20).itertuples():
+            self.log(f"Sensor {row.Sensor}, {row.Datum}: {row.Temperatur}")
+
+    def __reportUnparseable(self, source: str, df: pd.DataFrame):
+        """
+        Log the rows of a sensor file whose timestamp could not be parsed and were dropped (see tools.timestamps).
+        Row numbers count the header as row 1 like Excel. Rows of the library are never dropped, see library_timestamps.
+        """
+        rows = df.attrs.pop("unparseable", [])
+        if not rows: return
+        self.log(f"{len(rows)} {_("Zeile(n) mit ungültigem Zeitstempel übersprungen in")} {source}:")
+        for label, value in rows[:20]:
+            self.log(f"{_("Zeile")} {label + 2}: {value}")
+
+    def __saveKeys(self, df: pd.DataFrame, save_path: str):
+        """Save the reading keys of a completely written library for the next incremental append."""
+        if self.__config.duplicate_key == "reading" and self.__config.save_keys:
+            KeyIndex.from_frame(df).save(save_path)
+
+    def __transformDecodedFile(self, df: pd.DataFrame, sensor_name: str, sort: bool, drop_duplicates: bool) -> pd.DataFrame:
+        """Transform a decoded sensor file (see tools.xlsx.read_xlsx) into the library format."""
+        idxcol, timecol, tmpcol = None, None, None
+        for col in df.columns:
+            if self.__config.index in col:
+                idxcol = col
+            elif self.__config.timestamp in col:
+                timecol = col
+            elif self.__config.temperature in col:
+                tmpcol = col
+            else: raise(IndexError(f"{_("Nicht bekannte Spalte in Daten gefunden")}: {col}"))
+
+        # Rows with invalid timestamps are dropped and reported by the main process, see __reportUnparseable
+        datum, invalid = parse_timestamps(df[timecol], self.__config.time_format)
+        unparseable = unparseable_rows(df[timecol], invalid)
+        df[timecol] = datum
+        if unparseable: df = df.iloc[np.setdiff1d(np.arange(df.shape[0]), invalid)]
+        if sort:
+            df = df.sort_values(timecol, ascending=self.__config.sort_ascending_active)
+        df.dropna()
+        if drop_duplicates: df = df.drop_duplicates()
+        df = self.__transformSensorFile({"df": df, "idxcol": idxcol, "timecol": timecol, "tmpcol": tmpcol}, sensor_name, datetime_col=True)["df"]
+        if unparseable: df.attrs["unparseable"] = unparseable
+        return df
+
+    def __readSettings(self, sensor_name: str, sort: bool, drop_duplicates: bool) -> dict:
+        """All settings that change the result of __transformDecodedFile, used for the cache key."""
+        return {
+            "sensor": sensor_name,
+            "location": self.__config.sensor_loc(sensor_name),
+            "sort": sort,
+            "ascending": self.__config.sort_ascending_active,
+            "drop_duplicates": drop_duplicates,
+            "columns": [self.__config.index, self.__config.timestamp, self.__config.temperature],
+            "time_format": self.__config.time_format
+        }
+
     def __transformSensorFile(self, df_dict: dict, sensor_name: str, datetime_col=False):
-        """Split the three existing columns into eight with sensor info, location and separate columns for time data."""
-        df_dict["df"].drop(df_dict["idxcol"], axis=1, inplace=True)
-        if not datetime_col: df_dict["df"]["Datum"] = df_dict["df"][df_dict["timecol"]].dt.date
-        else: df_dict["df"]["Datum"] = df_dict["df"][df_dict["timecol"]]
-        df_dict["df"]["Jahr"] = df_dict["df"][df_dict["timecol"]].dt.year
-        df_dict["df"]["Monat"] = df_dict["df"][df_dict["timecol"]].dt.month
-        df_dict["df"]["Tag"] = df_dict["df"][df_dict["timecol"]].dt.day
-        df_dict["df"]["Uhrzeit"] = df_dict["df"][df_dict["timecol"]].dt.time
-        df_dict["df"]["Sensor"] = sensor_name
-        df_dict["df"]["Standort"] = self.__config.sensor_loc(sensor_name)
-        df_dict["df"].drop(df_dict["timecol"], axis=1, inplace=True)
-        df_dict["df"].rename(columns={df_dict["tmpcol"]: "Temperatur"}, inplace=True)
+        """
+        Split the three existing columns into eight with sensor info, location and separate columns for time data.
+        The result uses the compact library schema (see tools.schema.apply_schema).
+        """
+        df = df_dict["df"]
+        constant = np.zeros(df.shape[0], dtype="int8") # Sensor and location are the same for the whole file
+        transformed = pd.DataFrame({
+            "Temperatur": df[df_dict["tmpcol"]],
+            "Datum": df[df_dict["timecol"]], # Parsed by __transformDecodedFile
+            "Sensor": pd.Categorical.from_codes(constant, categories=[sensor_name]),
+            "Standort": pd.Categorical.from_codes(constant, categories=[self.__config.sensor_loc(sensor_name)])
+        }, index=df.index)
+        transformed = apply_schema(transformed)
+        if not datetime_col: transformed["Datum"] = transformed["Datum"].dt.normalize()
+        df_dict["df"] = transformed
         return df_dict
     
     def get_newest_sensor_entries(self, path_to_file: str):
-        """Read the given csv file and return latest entries for unique sensors."""
-        with open(path_to_file, "r") as f:
-            df = pd.read_csv(f)
+        """Return latest entries for unique sensors of the given library, only the sensor and timestamp columns are read."""
+        with self.stage("newest"):
+            index = read_library_index(path_to_file) if library_format(path_to_file) == "csv" else None
+            if library_format(path_to_file) == "partitioned":
+                latest = PartitionedLibrary(path_to_file, self.__config).latest()
+            elif library_format(path_to_file) == "sqlite":
+                latest = SqliteLibrary(path_to_file, self.__config).latest()
+            elif index is not None:
+                latest = {sensor: pd.Timestamp(entry["latest"]) for sensor, entry in index["sensors"].items()}
+            else:
+                latest = {}
+                for chunk in iter_library(path_to_file, self.__config, columns=["Sensor", "Datum"]):
+                    chunk["Datum"] = library_timestamps(chunk["Datum"])
+                    for sensor, newest in chunk.groupby("Sensor", sort=False, observed=True)["Datum"].max().items():
+                        if sensor not in latest or newest > latest[sensor]:
+                            latest[sensor] = newest
 
-        sensors = df["Sensor"].unique()
-        self.log(f"{len(sensors)} {_("Sensor(en) in der Datei gefunden")}")
+        self.log(f"{len(latest)} {_("Sensor(en) in der Datei gefunden")}")
+        return [{"name": sensor, "latest": newest.strftime(self.__config.time_format)} for sensor, newest in latest.items()]
 
-        results = []
-        for sensor in sensors:
-            sensor_time_min = df.query("Sensor == @sensor")["Datum"].max()
-            results.append({"name": sensor, "latest": sensor_time_min})
+    def iter_query(self, path_to_file: str, sensors: list[str] | None = None, locations: list[str] | None = None, start=None, end=None):
+        """
+        Stream the rows of a library from the given sensors and locations from start (inclusive) to end (exclusive) in
+        chunks, None selects all. Only the parts of the library that may hold matching rows are read (see iter_library_range),
+        so the time depends on the size of the result and not of the library.
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        for chunk in iter_library_range(path_to_file, self.__config, sensors, locations, start, end, self.__config.write_chunk_rows):
+            self.check_cancelled()
+            yield chunk
 
-        return results
\ No newline at end of file
+    def query(self, path_to_file: str, sensors: list[str] | None = None, locations: list[str] | None = None, start=None, end=None) -> pd.DataFrame:
+        """Rows of a library from the given sensors and locations from start (inclusive) to end (exclusive) as one frame, see iter_query."""
+        with self.stage("query") as st:
+            frames = list(self.iter_query(path_to_file, sensors, locations, start, end))
+            if frames:
+                df = concat_library(frames).reset_index(drop=True) if len(frames) > 1 else frames[0]
+            else:
+                df = apply_schema(pd.DataFrame(columns=LIBRARY_COLUMNS))
+            st.rows = df.shape[0]
+        self.log(f"{df.shape[0]} {_("Einträge gefunden")}")
+        return df
@@ -0,0 +1,104 @@
+import os
+import pandas as pd
+from tools.get_config import AppConfig
+from tools.schema import library_timestamps
+
+# Granularity -> (pandas frequency, file suffix)
+GRANULARITIES = {"hour": ("h", "hourly"), "day": ("D", "daily")}
+KEY_COLUMNS = ["Sensor", "Standort", "Datum"]
+ROLLUP_COLUMNS = KEY_COLUMNS + ["Minimum", "Maximum", "Mittelwert", "Anzahl", "Summe"]
+STORED_COLUMNS = [c for c in ROLLUP_COLUMNS if c != "Mittelwert"] # The mean is derived from sum and count
+
+def rollup_path(library_path: str, granularity: str) -> str:
+    """Path of a rollup table next to its library, e.g. all_data.csv -> all_data_daily.csv."""
+    stem, ext = os.path.splitext(library_path)
+    if ext.lower() in (".gz", ".zst"): stem = os.path.splitext(stem)[0]
+    return f"{stem}_{GRANULARITIES[granularity][1]}.csv"
+
+def aggregate(df: pd.DataFrame, granularity: str) -> pd.DataFrame:
+    """Minimum, maximum, sum and count of the temperatures per sensor, location and time bucket, Datum has to be parsed."""
+    df = df[df["Datum"].notna()]
+    grouped = pd.DataFrame({
+        "Sensor": df["Sensor"].astype(str),
+        "Standort": df["Standort"].astype(str),
+        "Datum": df["Datum"].dt.floor(GRANULARITIES[granularity][0]),
+        "Temperatur": df["Temperatur"].astype("float64")
+    }).groupby(KEY_COLUMNS, sort=False)["Temperatur"]
+    return pd.DataFrame({
+        "Minimum": grouped.min(),
+        "Maximum": grouped.max(),
+        "Anzahl": grouped.count(),
+        "Summe": grouped.sum()
+    }).reset_index()
+
+def combine(tables: list[pd.DataFrame]) -> pd.DataFrame:
+    """Combine aggregates of disjoint sets of readings, e.g. of library chunks or of new readings."""
+    tables = [t for t in tables if not t.empty]
+    if not tables: return pd.DataFrame(columns=STORED_COLUMNS)
+    grouped = pd.concat(tables, ignore_index=True).groupby(KEY_COLUMNS, sort=False)
+    return grouped.agg(Minimum=("Minimum", "min"), Maximum=("Maximum", "max"), Anzahl=("Anzahl", "sum"), Summe=("Summe", "sum")).reset_index()
+
+def bucket_keys(df: pd.DataFrame, granularity: str) -> pd.MultiIndex:
+    return pd.MultiIndex.from_arrays([
+        df["Sensor"].astype(str).to_numpy(),
+        df["Datum"].dt.floor(GRANULARITIES[granularity][0]).to_numpy()
+    ])
+
+class Rollups:
+    """
+    Hourly and daily minimum, maximum, mean and count of the temperatures per sensor and location, saved as csv tables
+    next to the library for Power BI. Only the time buckets touched by new readings are recomputed.
+    """
+    def __init__(self, library_path: str, config: AppConfig):
+        self.library_path = library_path
+        self.granularities = config.rollup_granularities
+        self.__config = config
+        self.__tables = {}
+
+    def exists(self) -> bool:
+        return all(os.path.isfile(rollup_path(self.library_path, g)) for g in self.granularities)
+
+    def table(self, granularity: str) -> pd.DataFrame:
+        if granularity not in self.__tables:
+            df = pd.read_csv(rollup_path(self.library_path, granularity), dtype={"Sensor": str, "Standort": str})
+            df["Datum"] = pd.to_datetime(df["Datum"], format=self.__config.time_format)
+            self.__tables[granularity] = df[STORED_COLUMNS]
+        return self.__tables[granularity]
+
+    def __parsed(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Rows with a datetime Datum column, chunks read from csv libraries hold strings."""
+        if pd.api.types.is_datetime64_any_dtype(df["Datum"]): return df
+        return df.assign(Datum=library_timestamps(df["Datum"]))
+
+    def rebuild(self, chunks):
+        """Compute all tables from scratch from the library, given as one frame or as chunks of disjoint rows."""
+        parts = {g: [] for g in self.granularities}
+        for chunk in ([chunks] if isinstance(chunks, pd.DataFrame) else chunks):
+            chunk = self.__parsed(chunk)
+            for g in self.granularities:
+                parts[g].append(aggregate(chunk, g))
+        self.__tables = {g: combine(parts[g]) for g in self.granularities}
+
+    def replace(self, rows: pd.DataFrame, touched: pd.DataFrame):
+        """Recompute the buckets of the touched readings from rows, which has to contain all readings of these buckets."""
+        rows, touched = self.__parsed(rows), self.__parsed(touched)
+        for g in self.granularities:
+            keys = bucket_keys(touched, g).unique()
+            current = self.table(g)
+            keep = ~bucket_keys(current, g).isin(keys)
+            fresh = aggregate(rows[bucket_keys(rows, g).isin(keys)], g)
+            self.__tables[g] = pd.concat([current[keep], fresh], ignore_index=True) if not fresh.empty else current[keep]
+
+    def add(self, rows: pd.DataFrame):
+        """Add readings that are not part of the tables yet, e.g. readings newer than everything in the library."""
+        rows = self.__parsed(rows)
+        for g in self.granularities:
+            self.__tables[g] = combine([self.table(g), aggregate(rows, g)])
+
+    def save(self):
+        from tools.library import CsvStreamWriter
+        for g, df in self.__tables.items():
+            df = df.sort_values(["Sensor", "Datum"], kind="stable")
+            df.insert(ROLLUP_COLUMNS.index("Mittelwert"), "Mittelwert", (df["Summe"] / df["Anzahl"]).round(self.__config.decimal_points))
+            with CsvStreamWriter(rollup_path(self.library_path, g), ROLLUP_COLUMNS, date_format=self.__config.time_format) as writer:
+                writer.write_frame(df)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from tools.timestamps import parse_timestamps
+
+# Timestamps in libraries are always written and read in this format, the time format of the settings is only used
+# for the sensor files and exports
+LIBRARY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Column order of data libraries
+LIBRARY_COLUMNS = ["Temperatur", "Datum", "Jahr", "Monat", "Tag", "Uhrzeit", "Sensor", "Standort"]
+CATEGORICAL_COLUMNS = ["Uhrzeit", "Sensor", "Standort"]
+
+def time_of_day(datum: pd.Series) -> pd.Categorical:
+    """Time of day as "HH:MM:SS" categorical, only the distinct times are formatted as strings."""
+    values = datum.to_numpy(dtype="datetime64[s]")
+    seconds = values.astype(np.int64) % 86400
+    uniques, codes = np.unique(seconds, return_inverse=True)
+    categories = [f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}" for s in uniques]
+    codes[np.isnat(values)] = -1
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def library_timestamps(values: pd.Series) -> pd.Series:
+    """
+    Parse the Datum column of a library in LIBRARY_TIME_FORMAT. Unlike rows of sensor files, rows of the library are
+    never dropped, so values that are not timestamps raise a ValueError and the library is not saved over.
+    """
+    datum, invalid = parse_timestamps(values, LIBRARY_TIME_FORMAT)
+    if len(invalid) > 0:
+        # Earlier versions wrote chunks whose timestamps were all at midnight as dates only (2025-03-01)
+        dates = pd.to_datetime(values.iloc[invalid], format="%Y-%m-%d", errors="coerce")
+        datum.iloc[invalid] = dates.to_numpy(dtype="datetime64[ns]")
+        invalid = invalid[dates.isna().to_numpy()]
+    if len(invalid) > 0:
+        examples = ", ".join(str(v) for v in values.iloc[invalid[:5]])
+        raise ValueError(f"{len(invalid)} {_("ungültige Zeitstempel in der Bibliothek")}: {examples}")
+    return datum
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a library frame to the compact schema: datetime Datum, small integers for the date parts,
+    categoricals for time of day, sensor and location. Temperatures stay float64, so written values are not changed
+    by the conversion when they are not rounded. Date parts are derived from Datum, see library_timestamps.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(df["Datum"]):
+        df["Datum"] = library_timestamps(df["Datum"])
+    df["Datum"] = df["Datum"].astype("datetime64[ns]")
+    df["Jahr"] = df["Datum"].dt.year.astype("int16")
+    df["Monat"] = df["Datum"].dt.month.astype("int8")
+    df["Tag"] = df["Datum"].dt.day.astype("int8")
+    df["Uhrzeit"] = time_of_day(df["Datum"])
+    df["Sensor"] = df["Sensor"].astype("category")
+    df["Standort"] = df["Standort"].astype("category")
+    df["Temperatur"] = df["Temperatur"].astype("float64")
+    df = df[LIBRARY_COLUMNS]
+    return df
+
+def concat_library(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate library frames without falling back to object columns for categoricals with different categories."""
+    for col in CATEGORICAL_COLUMNS:
+        if all(isinstance(df[col].dtype, pd.CategoricalDtype) for df in frames):
+            categories = sorted(set().union(*(df[col].cat.categories for df in frames)))
+            frames = [df.assign(**{col: df[col].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames)
+
+def frame_size_mb(df: pd.DataFrame) -> float:
+    """Memory used by a frame in MB."""
+    return df.memory_usage(deep=True).sum() / 1024**2
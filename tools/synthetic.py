@@ -0,0 +1,100 @@
+import os
+import numpy as np
+import pandas as pd
+from tools.get_config import AppConfig
+from tools.library import write_library
+
+def sensor_readings(start: pd.Timestamp, end: pd.Timestamp, interval_minutes: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Timestamps and temperatures of one sensor with a yearly and a daily cycle plus noise, rounded like the exports."""
+    datum = pd.date_range(start, end, freq=f"{interval_minutes}min", inclusive="left")
+    day = (datum.dayofyear.to_numpy() - 1) / 365.25
+    hour = (datum.hour.to_numpy() + datum.minute.to_numpy() / 60) / 24
+    temperature = (10 + rng.uniform(-2, 2)
+                   - 9 * np.cos(2 * np.pi * day)
+                   - 3 * np.cos(2 * np.pi * hour)
+                   + rng.normal(0, 0.4, len(datum)))
+    # Sensors measure in steps of about 0.043 K
+    return pd.DataFrame({"Datum": datum, "Temperatur": np.round(temperature / 0.0429, 0) * 0.0429})
+
+def disorder(df: pd.DataFrame, duplicate_ratio: float, shuffle_ratio: float, rng: np.random.Generator) -> pd.DataFrame:
+    """Repeat duplicate_ratio of the rows at random positions and move shuffle_ratio of the rows out of order."""
+    if duplicate_ratio > 0:
+        repeated = rng.choice(len(df), size=int(len(df) * duplicate_ratio), replace=False)
+        positions = np.sort(np.r_[np.arange(len(df)), repeated])
+        df = df.iloc[positions]
+    if shuffle_ratio > 0:
+        order = np.arange(len(df))
+        moved = rng.choice(len(df), size=int(len(df) * shuffle_ratio), replace=False)
+        order[moved] = order[rng.permutation(moved)]
+        df = df.iloc[order]
+    return df.reset_index(drop=True)
+
+def generate_sensor_files(
+        folder: str,
+        config: AppConfig,
+        sensors: int = 4,
+        start: str = "2024-01-01",
+        years: float = 1,
+        interval_minutes: int = 10,
+        days_per_file: int = 30,
+        duplicate_ratio: float = 0.0,
+        shuffle_ratio: float = 0.0,
+        seed: int = 0
+        ) -> tuple[list[str], int]:
+    """
+    Write sensor exports FGV_NN_<n>.xlsx like the ones downloaded from the sensors, one file per days_per_file days
+    for the first sensors of sensors.toml. Return the paths and the number of rows written.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+    start = pd.Timestamp(start)
+    end = start + pd.Timedelta(days=round(365.25 * years))
+    columns = {"Datum": f"{config.timestamp} (CEST)", "Temperatur": f"{config.temperature} (°C)"}
+    paths, rows = [], 0
+    for sensor in list(config.sensors)[:sensors]:
+        readings = sensor_readings(start, end, interval_minutes, rng)
+        bounds = pd.date_range(start, end + pd.Timedelta(days=days_per_file), freq=f"{days_per_file}D")
+        for n, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+            part = readings[(readings["Datum"] >= a) & (readings["Datum"] < b)]
+            if part.empty: continue
+            part = disorder(part, duplicate_ratio, shuffle_ratio, rng).rename(columns=columns)
+            part.insert(0, config.index, np.arange(1, len(part) + 1))
+            path = os.path.join(folder, f"{sensor}_{n+1:03d}.xlsx")
+            part.to_excel(path, index=False)
+            paths.append(path)
+            rows += len(part)
+    return paths, rows
+
+def generate_library(
+        path: str,
+        config: AppConfig,
+        sensors: int = 4,
+        start: str = "2023-01-01",
+        years: float = 1,
+        interval_minutes: int = 10,
+        duplicate_ratio: float = 0.0,
+        shuffle_ratio: float = 0.0,
+        seed: int = 0
+        ) -> int:
+    """Write a data library (e.g. all_data.csv) in the format of the application, return the number of rows."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start)
+    end = start + pd.Timedelta(days=round(365.25 * years))
+    frames = []
+    for sensor in list(config.sensors)[:sensors]:
+        df = sensor_readings(start, end, interval_minutes, rng)
+        df = df.sort_values("Datum", ascending=config.sort_ascending_active)
+        datum = df["Datum"].dt
+        frames.append(pd.DataFrame({
+            "Temperatur": df["Temperatur"].round(config.decimal_points),
+            "Datum": df["Datum"],
+            "Jahr": datum.year,
+            "Monat": datum.month,
+            "Tag": datum.day,
+            "Uhrzeit": datum.strftime("%H:%M:%S"),
+            "Sensor": sensor,
+            "Standort": config.sensor_loc(sensor)
+        }))
+    df = disorder(pd.concat(frames, ignore_index=True), duplicate_ratio, shuffle_ratio, rng)
+    write_library(df, path, config)
+    return len(df)
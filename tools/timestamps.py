@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# strftime directives of fixed width numbers, parsed without strptime
+FIXED_WIDTH = {"%Y": 4, "%m": 2, "%d": 2, "%H": 2, "%M": 2, "%S": 2}
+# Years that fit into datetime64[ns]
+MIN_YEAR, MAX_YEAR = 1678, 2261
+
+def fixed_width_layout(time_format: str) -> tuple[dict, dict, int] | None:
+    """
+    Position and width of every field of a format made of fixed width numbers and literal characters,
+    e.g. "%Y-%m-%d %H:%M:%S", the positions of the literals and the total width. None for other formats.
+    """
+    fields, literals, pos, i = {}, {}, 0, 0
+    while i < len(time_format):
+        if time_format[i] == "%":
+            directive = time_format[i:i+2]
+            if directive not in FIXED_WIDTH or directive in fields: return None
+            fields[directive] = (pos, FIXED_WIDTH[directive])
+            pos += FIXED_WIDTH[directive]
+            i += 2
+        else:
+            if not time_format[i].isascii(): return None
+            literals[pos] = ord(time_format[i])
+            pos += 1
+            i += 1
+    if not {"%Y", "%m", "%d"} <= set(fields): return None
+    return fields, literals, pos
+
+def parse_fixed_width(values: np.ndarray, layout: tuple[dict, dict, int]) -> np.ndarray:
+    """
+    Parse strings of a fixed width format with vectorized digit arithmetic, see fixed_width_layout.
+    Values that do not match the layout or are no valid date become NaT.
+    """
+    fields, literals, width = layout
+    result = np.full(len(values), np.datetime64("NaT", "ns"), dtype="datetime64[ns]")
+    candidate = np.fromiter((isinstance(v, str) and v.isascii() for v in values), dtype=bool, count=len(values))
+    if not candidate.any(): return result
+    # One byte more than the format, longer values are detected by it, shorter ones fail the digit checks
+    raw = values[candidate].astype(f"S{width+1}").view(np.uint8).reshape(-1, width + 1)
+    ok = raw[:, width] == 0
+    for pos, char in literals.items():
+        ok &= raw[:, pos] == char
+    numbers = {}
+    for directive, (pos, size) in fields.items():
+        digits = raw[:, pos:pos+size].astype(np.int64) - ord("0")
+        ok &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+        numbers[directive] = digits @ (10 ** np.arange(size - 1, -1, -1))
+    year, month, day = numbers["%Y"], numbers["%m"], numbers["%d"]
+    hour, minute, second = (numbers.get(d, np.zeros_like(year)) for d in ("%H", "%M", "%S"))
+    ok &= (year >= MIN_YEAR) & (year <= MAX_YEAR) & (month >= 1) & (month <= 12) & (day >= 1)
+    ok &= (hour < 24) & (minute < 60) & (second < 60)
+    months = np.where(ok, (year - 1970) * 12 + month - 1, 0).astype("datetime64[M]")
+    days = months.astype("datetime64[D]") + np.where(ok, day - 1, 0).astype("timedelta64[D]")
+    ok &= days.astype("datetime64[M]") == months # e.g. 2024-02-30
+    seconds = hour * 3600 + minute * 60 + second
+    parsed = days.astype("datetime64[ns]") + seconds.astype("timedelta64[s]")
+    result[np.flatnonzero(candidate)[ok]] = parsed[ok]
+    return result
+
+def to_ns(parsed: pd.Series) -> np.ndarray:
+    """datetime64[ns] values of a parsed column, timestamps out of its range become NaT."""
+    values = parsed.to_numpy()
+    if values.dtype == object: values = values.astype("datetime64[us]")
+    inside = (values >= np.datetime64(f"{MIN_YEAR}-01-01")) & (values < np.datetime64(f"{MAX_YEAR+1}-01-01"))
+    return np.where(inside, values, np.array("NaT", dtype=values.dtype)).astype("datetime64[ns]")
+
+def parse_timestamps(values: pd.Series, time_format: str) -> tuple[pd.Series, np.ndarray]:
+    """
+    Parse a timestamp column like pd.to_datetime(values, format=time_format) without failing on invalid values.
+    Columns that are typed already (xlsx cells, parquet) are only converted to datetime64[ns]. Strings are parsed
+    once per distinct value, e.g. timestamps repeated for every sensor of a library, with a vectorized fast path
+    for fixed width formats and strptime for all other values.
+    Returns the parsed column and the positions of the values that could not be parsed, they are NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype("datetime64[ns]"), np.empty(0, dtype=np.int64)
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    uniques = np.asarray(uniques, dtype=object)
+    parsed = np.full(len(uniques), np.datetime64("NaT", "ns"), dtype="datetime64[ns]")
+    layout = fixed_width_layout(time_format)
+    if layout is not None and len(uniques) > 0:
+        parsed = parse_fixed_width(uniques, layout)
+    rest = np.flatnonzero(np.isnat(parsed))
+    if len(rest) > 0:
+        # Other formats, invalid values and typed cells mixed with strings
+        others = pd.Series(uniques[rest], dtype=object)
+        parsed[rest] = to_ns(pd.to_datetime(others, format=time_format, errors="coerce"))
+        typed = rest[np.isnat(parsed[rest]) & ~others.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)]
+        if len(typed) > 0:
+            parsed[typed] = to_ns(pd.to_datetime(pd.Series(uniques[typed], dtype=object), errors="coerce"))
+    result = np.where(codes >= 0, parsed[np.maximum(codes, 0)], np.datetime64("NaT", "ns"))
+    invalid = np.flatnonzero((codes >= 0) & np.isnat(result))
+    return pd.Series(result, index=values.index, name=values.name, dtype="datetime64[ns]"), invalid
+
+def unparseable_rows(values: pd.Series, invalid: np.ndarray) -> list[tuple[int, str]]:
+    """Index labels and original values of the rows that could not be parsed, kept in df.attrs["unparseable"]."""
+    return [(int(label), str(value)) for label, value in zip(values.index[invalid], values.iloc[invalid])]
+
+def overlaps(oldest, latest, start: pd.Timestamp | None, end: pd.Timestamp | None) -> bool:
+    """Whether readings from oldest to latest may lie in the range from start (inclusive) to end (exclusive), unknown bounds always may."""
+    oldest, latest = pd.Timestamp(oldest) if oldest is not None else pd.NaT, pd.Timestamp(latest) if latest is not None else pd.NaT
+    return (end is None or pd.isna(oldest) or oldest < end) and (start is None or pd.isna(latest) or latest >= start)
@@ -0,0 +1,57 @@
+import os
+import glob
+import time
+
+class FolderWatcher:
+    """
+    Poll a folder for new or changed sensor files matching the file search pattern.
+    Files are collected until nothing arrived or changed for settle_seconds, so a burst of uploads
+    is returned as one batch. Files still being written (size or modification time changing) are not returned.
+    A batch is only marked as seen once done() is called for it, after requeue() it is returned again once it settled.
+    """
+    def __init__(self, folder: str, pattern: str, settle_seconds: float, include_existing: bool = False):
+        self.folder = folder
+        self.pattern = pattern
+        self.settle_seconds = settle_seconds
+        self.__seen = {} if include_existing else self.__scan()
+        self.__pending = {}
+        self.__batch = {} # Returned by poll(), neither done nor requeued yet
+        self.__last_change = None
+
+    def __scan(self) -> dict[str, tuple[int, int]]:
+        files = {}
+        for path in glob.glob(os.path.join(self.folder, self.pattern)):
+            try: stat = os.stat(path)
+            except OSError: continue # Removed while scanning
+            files[path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def poll(self, now: float | None = None) -> list[str]:
+        """Scan the folder once, return the files of a settled batch or an empty list."""
+        now = time.monotonic() if now is None else now
+        for path, stamp in self.__scan().items():
+            if stamp in (self.__seen.get(path), self.__pending.get(path), self.__batch.get(path)):
+                continue
+            self.__pending[path] = stamp
+            self.__last_change = now
+        if not self.__pending or now - self.__last_change < self.settle_seconds:
+            return []
+        batch = sorted(self.__pending)
+        self.__batch.update(self.__pending)
+        self.__pending = {}
+        return batch
+
+    def done(self, batch: list[str]):
+        """Mark the files of a batch as seen after they were appended, they are only returned again once changed."""
+        for path in batch:
+            if path in self.__batch: self.__seen[path] = self.__batch.pop(path)
+
+    def requeue(self, batch: list[str]):
+        """Return the files of a batch again with the next settled batch, e.g. after the append failed."""
+        for path in batch:
+            self.__batch.pop(path, None)
+
+    @property
+    def pending(self) -> int:
+        """Number of files waiting for the current burst to settle."""
+        return len(self.__pending)
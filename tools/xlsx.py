@@ -0,0 +1,67 @@
+import datetime
+import importlib.util
+import numpy as np
+import pandas as pd
+
+XLSX_ENGINES = ("auto", "calamine", "openpyxl", "pandas")
+
+def calamine_available() -> bool:
+    return importlib.util.find_spec("python_calamine") is not None
+
+def resolve_engine(engine: str) -> str:
+    """
+    Engine actually used for reading: "auto" prefers calamine and streams with openpyxl otherwise,
+    a requested calamine engine that is not installed falls back to pandas' default reader.
+    """
+    if engine == "auto":
+        return "calamine" if calamine_available() else "openpyxl"
+    if engine == "calamine" and not calamine_available():
+        return "pandas"
+    return engine
+
+def timestamp_cells(cells: tuple) -> pd.Series:
+    """Timestamp column of the streaming reader, datetime64 if all cells are dates and the cells as they are otherwise."""
+    if all(v is None or isinstance(v, datetime.datetime) for v in cells):
+        return pd.Series(pd.to_datetime(list(cells)), dtype="datetime64[us]")
+    return pd.Series(cells, dtype=object)
+
+def read_xlsx(path: str, engine: str = "pandas", temperature_column: str | None = None, timestamp_column: str | None = None) -> pd.DataFrame:
+    """
+    Read the first sheet of a sensor export like pd.read_excel(path).
+    "calamine" uses the Rust based reader of python-calamine, "openpyxl" streams the rows in read-only mode
+    instead of loading every cell into the document model and converts every column to one typed array.
+    Columns whose name contains temperature_column are read as float, cells that are not numbers become NaN.
+    Columns whose name contains timestamp_column are datetime64 if all cells are dates, text cells are kept for
+    tools.timestamps.parse_timestamps, which reports the ones it can not parse.
+    """
+    engine = resolve_engine(engine)
+    if engine == "calamine":
+        return pd.read_excel(path, engine="calamine")
+    if engine == "pandas":
+        return pd.read_excel(path)
+
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        while header and header[-1] is None: header = header[:-1]
+        width = len(header)
+        # Rows without any value are skipped like pandas does, short rows are padded to the header
+        values = [row[:width] + (None,) * (width - len(row)) for row in rows if any(v is not None for v in row)]
+    finally:
+        wb.close()
+    columns = list(zip(*values)) if values else [()] * width
+    data = {}
+    for i, name in enumerate(header):
+        name = name if name is not None else f"Unnamed: {i}"
+        if temperature_column is not None and isinstance(name, str) and temperature_column in name:
+            try:
+                data[name] = np.array(columns[i], dtype=np.float64) # Empty cells become NaN
+            except (TypeError, ValueError):
+                data[name] = pd.to_numeric(pd.Series(columns[i], dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+        elif timestamp_column is not None and isinstance(name, str) and timestamp_column in name:
+            data[name] = timestamp_cells(columns[i])
+        else:
+            data[name] = pd.Series(columns[i], dtype=None if columns[i] else object)
+    return pd.DataFrame(data)